@@ -12,16 +12,72 @@ class Settings:
     # Paths
     BASE_DIR: Path = Path(__file__).parent.parent
     TEMP_DIR: Path = BASE_DIR / "temp"
+    LOCKS_DIRNAME: str = ".locks"  # Dentro de TEMP_DIR, ignorada pela limpeza
     
     # Cleanup
     CLEANUP_INTERVAL_MINUTES: int = 2
-    FILE_TTL_SECONDS: int = 300  # 5 minutos
+    FILE_TTL_SECONDS: int = 86400  # Entradas sem acesso há 24h são removidas
+    CACHE_MAX_BYTES: int = 5 * 1024 ** 3  # Orçamento em disco do TEMP_DIR (5 GB)
+    CACHE_PERSIST: bool = True  # Manifesto sqlite: o cache sobrevive a reinícios
+    CACHE_MANIFEST_FILENAME: str = ".manifest.sqlite3"
+    CLEANUP_ON_SHUTDOWN: bool = False  # Apagar TEMP_DIR inteiro ao desligar
     
     # Download
     SOCKET_TIMEOUT: int = 60
     RETRIES: int = 5
     FRAGMENT_RETRIES: int = 5
     
+    # Controle de admissão (/api/download e /api/download-stream)
+    MAX_IN_FLIGHT_DOWNLOADS: int = 8
+    MAX_QUEUED_DOWNLOADS: int = 32
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: int = 30
+    DEFAULT_RETRY_AFTER_SECONDS: int = 10
+    
+    # Intervalo de verificação de desconexão do cliente durante downloads
+    DISCONNECT_POLL_SECONDS: float = 1.0
+    
+    # Jobs assíncronos (/api/jobs)
+    JOB_TTL_SECONDS: int = 3600  # Tempo que um job finalizado continua consultável
+    JOB_SSE_KEEPALIVE_SECONDS: int = 15
+    
+    # Lotes (/api/batch): ZIP gerado enquanto as faixas ficam prontas
+    BATCH_MAX_URLS: int = 50  # Máximo de vídeos por lote (URLs ou itens da playlist)
+    BATCH_PARALLELISM: int = 3  # Downloads simultâneos de um mesmo lote
+    
+    # Pools dedicados por etapa (0 = número de núcleos)
+    METADATA_WORKERS: int = 8
+    DOWNLOAD_WORKERS: int = 4
+    TRANSCODE_WORKERS: int = 0
+    
+    # Processos yt-dlp de reserva (yt_dlp já importado) para os streams; 0 = CLI a cada stream
+    YTDLP_WARM_PROCESSES: int = 2
+    
+    # Cache de áudio (chave: ID do vídeo + formato + bitrate)
+    AUDIO_BITRATE: int = 192
+    
+    # Cache de metadados (extract_video_metadata)
+    METADATA_CACHE_SIZE: int = 1024
+    METADATA_CACHE_TTL_SECONDS: int = 600  # 10 minutos
+    
+    # Consulta em massa (POST /api/formats/bulk)
+    FORMATS_BULK_MAX_URLS: int = 50
+    FORMATS_BULK_CONCURRENCY: int = 8  # Extrações simultâneas de um mesmo pedido
+    
+    # URLs de mídia já resolvidas (googlevideo), válidas até o expire= da própria URL
+    RESOLVED_URL_CACHE_SIZE: int = 128
+    RESOLVED_URL_EXPIRY_MARGIN_SECONDS: int = 1800  # Folga para downloads longos terminarem
+    RESOLVED_INFO_DIRNAME: str = ".resolved"  # Em TEMP_DIR: info JSON passado ao yt-dlp CLI
+    
+    # Deduplicação de downloads entre workers (flock em TEMP_DIR/.locks)
+    CROSS_WORKER_LOCKS: bool = True
+    
+    # Coordenação entre workers do uvicorn
+    SHARED_STATE: bool = True  # Registro sqlite de produções, fixações e jobs
+    SHARED_STATE_FILENAME: str = ".state.sqlite3"
+    CLEANUP_LEADER_LOCK: str = "cleanup.leader"  # Em TEMP_DIR/.locks; só o líder limpa
+    SHARED_STATE_POLL_SECONDS: float = 0.5  # Espera por produções/jobs de outro worker
+    SHARED_STATE_READ_TIMEOUT_SECONDS: float = 0.1  # Leituras no event loop (escritas vão para uma thread)
+    
     def __init__(self):
         """Inicializar e criar diretórios necessários"""
         self.TEMP_DIR.mkdir(exist_ok=True)
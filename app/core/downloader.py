@@ -1,15 +1,91 @@
 import yt_dlp
+import mutagen
+import copy
 import os
-import time
+import asyncio
 import subprocess
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+from app.core.warm_workers import warm_pool
+from app.core.ydl_pool import ydl_pool
+from app.utils.helpers import ClipRange
 
-def download_audio(video_url: str, output_path: str = 'downloads') -> None:
+def download_audio(video_url: str, output_path: str = 'downloads', bitrate: int = 192) -> None:
     """
     Baixa o áudio de um vídeo do YouTube em formato MP3.
     
+    Executa as duas etapas (fetch_audio + convert_audio) na mesma thread.
+    O serviço da API chama as etapas separadamente, cada uma no seu pool.
+    
     Args:
         video_url: URL do vídeo do YouTube
         output_path: Caminho onde salvar o arquivo (padrão: 'downloads')
+        bitrate: Bitrate do MP3 em kbps (padrão: 192)
+    """
+    try:
+        info = fetch_audio(video_url, output_path)
+        convert_audio(info, bitrate)
+        print(f"Áudio baixado com sucesso: {info['title']}.mp3")
+    except Exception as e:
+        print(f"Erro ao baixar: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+
+def cancel_hook(cancel_event: threading.Event) -> Callable[[Dict[str, Any]], None]:
+    """
+    Hook de progresso/pós-processamento que interrompe o yt-dlp quando
+    cancel_event é sinalizado (ex: o cliente desconectou).
+    
+    O yt-dlp chama os hooks a cada bloco baixado, então o download para
+    em poucos milissegundos. A conversão não passa por hooks: convert_audio
+    recebe o mesmo cancel_event e mata o ffmpeg (ver run_ffmpeg).
+    """
+    def hook(d: Dict[str, Any]) -> None:
+        if cancel_event.is_set():
+            raise yt_dlp.utils.DownloadCancelled("Download cancelado")
+    
+    return hook
+
+
+# Formatos de saída que copiam o stream nativo do YouTube (sem reencodar):
+# seletor do yt-dlp que prefere a fonte já no codec de destino
+PASSTHROUGH_FORMATS = {
+    'm4a': 'bestaudio[ext=m4a]/bestaudio[acodec^=mp4a]/bestaudio/best',  # AAC
+    'opus': 'bestaudio[acodec=opus]/bestaudio/best',                     # Opus (webm)
+}
+
+def fetch_audio(
+    video_url: str,
+    output_path: str = 'downloads',
+    progress_hooks: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+    audio_format: str = 'mp3',
+    resolved_info: Optional[Dict[str, Any]] = None,
+    clip: Optional[ClipRange] = None
+) -> Dict[str, Any]:
+    """
+    Etapa de rede: baixa o melhor áudio disponível, sem converter.
+    
+    Com resolved_info (info de uma extração anterior, URLs ainda válidas) o
+    download vai direto às URLs de mídia, sem baixar a página do vídeo nem
+    resolver assinaturas/player JS. Se o YouTube recusar a URL (403), a
+    extração completa é feita como de costume.
+    
+    Args:
+        video_url: URL do vídeo do YouTube
+        output_path: Caminho onde salvar o arquivo original
+        progress_hooks: Callbacks de progresso do yt-dlp (chamados na thread do download)
+        audio_format: Formato de saída desejado (escolhe a fonte que evita reencodar)
+        resolved_info: Info já resolvida (sanitizada) do vídeo, se houver
+        clip: Trecho (início, fim) em segundos; o yt-dlp baixa só ele
+            (download_ranges: o ffmpeg busca o início direto na URL de mídia)
+    
+    Returns:
+        Info do yt-dlp, com 'filepath' apontando para o arquivo baixado
+    
+    Raises:
+        Exception: Se o download falhar
     """
     # Criar diretório se não existir
     if not os.path.exists(output_path):
@@ -17,48 +93,580 @@ def download_audio(video_url: str, output_path: str = 'downloads') -> None:
     
     # Configurar opções do yt-dlp com estratégias otimizadas
     ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
         'restrictfilenames': True,  # Sanitiza caracteres especiais no filename
         'noplaylist': True,          # Baixar apenas o vídeo, não playlist
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',  # 192kbps - boa qualidade e compatibilidade
-        }, {
-            'key': 'FFmpegMetadata',     # Adiciona metadados ao MP3
-            'add_metadata': True,
-        }],
-        'postprocessor_args': [
+        'writethumbnail': False,     # Não baixar thumbnail
+    }
+    # Instância reaproveitada: só o destino e o formato mudam a cada download
+    params = {
+        'format': PASSTHROUGH_FORMATS.get(audio_format, 'bestaudio/best'),
+        'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
+    }
+    if clip is not None:
+        start, end = clip
+        params['download_ranges'] = yt_dlp.utils.download_range_func(
+            None, [(start, float('inf') if end is None else end)]
+        )
+    
+    print(f"Baixando áudio de: {video_url}")
+    with ydl_pool.session('fetch', ydl_opts, params, progress_hooks=progress_hooks) as ydl:
+        info = None
+        if resolved_info is not None:
+            try:
+                # Mesmo caminho do --load-info-json: seleção de formato e download
+                info = ydl.process_ie_result(copy.deepcopy(resolved_info), download=True)
+            except yt_dlp.utils.DownloadError as e:
+                if not is_forbidden(e):
+                    raise
+                print(f"URL de mídia recusada (403), extraindo novamente: {video_url}")
+        if info is None:
+            info = ydl.extract_info(video_url, download=True)
+    
+    info['filepath'] = info['requested_downloads'][0]['filepath']
+    return info
+
+
+def is_forbidden(error: Exception) -> bool:
+    """Indica se o erro do yt-dlp veio de um HTTP 403 (URL de mídia expirada/recusada)"""
+    exc_info = getattr(error, 'exc_info', None)
+    cause = exc_info[1] if exc_info else None
+    if getattr(cause, 'status', None) == 403:
+        return True
+    return 'HTTP Error 403' in str(error)
+
+
+def convert_audio(
+    info: Dict[str, Any],
+    bitrate: int = 192,
+    postprocessor_hooks: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+    audio_format: str = 'mp3',
+    cancel_event: Optional[threading.Event] = None
+) -> None:
+    """
+    Etapa de CPU: converte o arquivo baixado por fetch_audio para MP3.
+    
+    Em m4a/opus o stream de áudio é só copiado para o container de destino
+    (ffmpeg -c:a copy, ou nada se já estiver nele), sem decodificar.
+    
+    As tags vão na mesma execução do ffmpeg que converte (-metadata), então
+    o arquivo é lido e gravado uma vez só. Quando não há conversão (fonte já
+    no container de destino) as tags são gravadas no próprio arquivo.
+    
+    O ffmpeg roda como processo filho acompanhado por esta thread: se
+    cancel_event for sinalizado, ele é encerrado na hora (ver run_ffmpeg).
+    Ao fim, info['filepath'] aponta para o arquivo convertido e o original
+    é removido.
+    
+    Args:
+        info: Info retornada por fetch_audio
+        bitrate: Bitrate do MP3 em kbps (padrão: 192)
+        postprocessor_hooks: Callbacks de início/fim da conversão
+            (mesmo formato dos postprocessor_hooks do yt-dlp)
+        audio_format: Formato de saída (mp3, m4a ou opus)
+        cancel_event: Sinalizado quando ninguém mais espera pela conversão
+    
+    Raises:
+        yt_dlp.utils.DownloadCancelled: Se cancel_event for sinalizado
+        Exception: Se a conversão falhar
+    """
+    tags = build_tags(info)
+    
+    if audio_format in PASSTHROUGH_FORMATS and info.get('ext') == audio_format:
+        # Nada a remuxar: o arquivo já está no container de destino
+        write_tags(info['filepath'], tags)
+        return
+    
+    source = info['filepath']
+    cmd, output = build_convert_command(info, bitrate, audio_format, tags)
+    
+    def notify(status: str) -> None:
+        for hook in postprocessor_hooks or []:
+            hook({'status': status, 'postprocessor': 'ExtractAudio', 'info_dict': info})
+    
+    notify('started')
+    run_ffmpeg(cmd, cancel_event)
+    if output != source:
+        # Como o keepvideo=False do yt-dlp: só o arquivo final fica na pasta
+        os.remove(source)
+    info['filepath'] = output
+    info['ext'] = audio_format
+    notify('finished')
+
+
+# Fonte compatível com o formato de cópia (prefixo do acodec) e o encoder
+# usado quando o melhor áudio disponível veio em outro codec
+PASSTHROUGH_CODECS = {
+    'm4a': ('mp4a', 'aac'),
+    'opus': ('opus', 'libopus'),
+}
+
+def build_convert_command(
+    info: Dict[str, Any],
+    bitrate: int,
+    audio_format: str,
+    tags: Dict[str, str]
+) -> Tuple[List[str], str]:
+    """
+    Monta o comando ffmpeg da conversão (os mesmos argumentos que o
+    FFmpegExtractAudio do yt-dlp usaria).
+    
+    Returns:
+        (comando, caminho do arquivo gerado)
+    """
+    source = info['filepath']
+    output = f"{os.path.splitext(source)[0]}.{audio_format}"
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-i', source, '-vn']
+    
+    if audio_format in PASSTHROUGH_CODECS:
+        codec_prefix, encoder = PASSTHROUGH_CODECS[audio_format]
+        if (info.get('acodec') or '').startswith(codec_prefix):
+            cmd += ['-c:a', 'copy']
+        else:
+            cmd += ['-c:a', encoder, '-b:a', f'{bitrate}k']
+        cmd += metadata_args(tags)
+    else:
+        cmd += [
+            '-c:a', 'libmp3lame',
             '-ar', '44100',              # Sample rate padrão (44.1kHz)
             '-ac', '2',                  # Estéreo (2 canais)
-            '-b:a', '192k',              # Bitrate constante 192kbps
-        ],
-        'prefer_ffmpeg': True,           # Preferir FFmpeg sobre avconv
-        'keepvideo': False,              # Deletar vídeo original após conversão
-        'writethumbnail': False,         # Não baixar thumbnail
-        'embedthumbnail': False,         # Não embutir thumbnail no MP3
-    }
+            '-b:a', f'{bitrate}k',       # Bitrate constante (padrão 192kbps)
+            *metadata_args(tags),        # Tags ID3 na mesma passada
+            '-write_id3v1', '1',         # ID3v1 também, para players antigos
+        ]
+    
+    return cmd + [output], output
+
+
+def run_ffmpeg(cmd: List[str], cancel_event: Optional[threading.Event] = None, poll_seconds: float = 0.2) -> None:
+    """
+    Executa o comando até o fim, na thread atual.
     
+    A cada poll_seconds confere cancel_event; se ele foi sinalizado, o
+    processo é morto (e esperado) antes de a exceção subir, então nada mais
+    escreve nos arquivos de saída depois que esta função retorna.
+    
+    Raises:
+        yt_dlp.utils.DownloadCancelled: Se cancel_event for sinalizado
+        Exception: Se o processo terminar com código diferente de zero
+    """
+    with subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE) as process:
+        try:
+            while True:
+                try:
+                    _, stderr = process.communicate(timeout=poll_seconds)
+                    break
+                except subprocess.TimeoutExpired:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise yt_dlp.utils.DownloadCancelled("Conversão cancelada")
+        finally:
+            if process.returncode is None:
+                process.kill()
+                process.wait()
+    
+    if process.returncode != 0:
+        message = stderr.decode('utf-8', errors='ignore').strip()[-2000:]
+        raise Exception(f"{cmd[0]} falhou com código {process.returncode}: {message}")
+
+
+# Tag de saída -> campos do info do yt-dlp, em ordem de preferência
+# (os mesmos que o FFmpegMetadata do yt-dlp usaria)
+TAG_FIELDS = {
+    'title': ('track', 'title'),
+    'artist': ('artist', 'artists', 'creator', 'uploader', 'uploader_id'),
+    'album': ('album',),
+    'genre': ('genre', 'genres'),
+    'date': ('upload_date',),
+    'comment': ('webpage_url',),
+}
+
+
+def build_tags(info: Dict[str, Any]) -> Dict[str, str]:
+    """Monta as tags do arquivo final a partir do info do yt-dlp"""
+    tags = {}
+    for name, fields in TAG_FIELDS.items():
+        value = next((info[field] for field in fields if info.get(field) not in (None, '', [])), None)
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ', '.join(map(str, value))
+        # NUL não passa pela linha de comando do ffmpeg
+        tags[name] = str(value).replace('\0', '')
+    return tags
+
+
+def metadata_args(tags: Dict[str, str]) -> List[str]:
+    """Argumentos -metadata do ffmpeg para as tags"""
+    args = []
+    for name, value in tags.items():
+        args += ['-metadata', f'{name}={value}']
+    return args
+
+
+def write_tags(path: str, tags: Dict[str, str]) -> None:
+    """
+    Grava as tags direto no arquivo com mutagen, sem reescrever o áudio.
+    
+    Falhas não interrompem o download: as tags são só informativas.
+    """
     try:
-        print(f"Baixando áudio de: {video_url}")
-        time.sleep(1)
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=True)
-            print(f"Áudio baixado com sucesso: {info['title']}.mp3")
-    except Exception as e:
-        print(f"Erro ao baixar: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        audio = mutagen.File(path, easy=True)
+        if audio is None:
+            return
+        if audio.tags is None:
+            audio.add_tags()
+        for name, value in tags.items():
+            try:
+                audio[name] = value
+            except (KeyError, ValueError):
+                # Tag sem equivalente no formato (ex: comment no EasyID3)
+                continue
+        audio.save()
+    except mutagen.MutagenError as e:
+        print(f"Não foi possível gravar as tags em {path}: {str(e)}")
 
-def stream_video(video_url: str, format_id: str, video_id: str):
+
+async def stream_process(cmd: List[str], video_id: str, chunk_size: int = 1024 * 64) -> AsyncIterator[bytes]:
+    """
+    Executa um processo e entrega seu stdout em chunks, sem bloquear threads.
+    
+    Atalho para stream_pipeline com um único comando.
+    """
+    async for chunk in stream_pipeline([cmd], video_id, chunk_size):
+        yield chunk
+
+
+def extra_input(index: int) -> str:
+    """Marcador, no último comando de stream_pipeline, da saída de extra_inputs[index]"""
+    return f'<extra-input-{index}>'
+
+
+async def stream_pipeline(
+    cmds: List[List[str]],
+    video_id: str,
+    chunk_size: int = 1024 * 64,
+    extra_inputs: Optional[List[List[str]]] = None
+) -> AsyncIterator[bytes]:
+    """
+    Executa uma cadeia de processos (cmd1 | cmd2 | ...) e entrega o stdout do último.
+    
+    - stderr de cada processo é drenado em paralelo (evita deadlock com
+      processos verbosos), guardando apenas o final para a mensagem de erro;
+    - o próximo read só acontece depois que o consumidor pediu outro chunk,
+      então a velocidade do socket do cliente controla a dos processos;
+    - se o consumidor parar (cliente desconectou), os processos são mortos;
+    - comandos 'yt-dlp' rodam em um processo pré-aquecido do warm_pool
+      (sem pagar o import do yt_dlp), quando o pool está habilitado;
+    - extra_inputs rodam em paralelo à cadeia e o stdout de cada um chega ao
+      último comando como um descritor herdado: o marcador extra_input(i) nos
+      argumentos dele vira 'pipe:<fd>' (ex: segunda entrada do ffmpeg).
+    
+    Args:
+        cmds: Comandos da cadeia; o stdout de cada um alimenta o stdin do próximo
+        video_id: ID único da sessão (usado nos logs)
+        chunk_size: Tamanho máximo de cada chunk
+        extra_inputs: Comandos cuja saída é lida pelo último comando da cadeia
+    
+    Yields:
+        Chunks do stdout do último processo
+    
+    Raises:
+        Exception: Se algum processo terminar com código diferente de zero
+    """
+    processes: List[asyncio.subprocess.Process] = []
+    # Comando de cada processo, na ordem em que foram iniciados
+    started: List[List[str]] = []
+    stderr_tails: List[Deque[bytes]] = []
+    stderr_tasks: List[asyncio.Future] = []
+    extra_fds: List[int] = []
+    output_transport: Optional[asyncio.BaseTransport] = None
+    finished = False
+    
+    async def drain_stderr(process: asyncio.subprocess.Process, tail: Deque[bytes]) -> None:
+        while True:
+            data = await process.stderr.read(4096)
+            if not data:
+                break
+            tail.append(data)
+    
+    def track(cmd: List[str], process: asyncio.subprocess.Process) -> None:
+        tail: Deque[bytes] = deque(maxlen=16)
+        processes.append(process)
+        started.append(cmd)
+        stderr_tails.append(tail)
+        stderr_tasks.append(asyncio.ensure_future(drain_stderr(process, tail)))
+    
+    try:
+        for cmd in extra_inputs or []:
+            process, read_fd = await _start_source(cmd)
+            extra_fds.append(read_fd)
+            track(cmd, process)
+        
+        stdin_fd = None
+        output = None
+        for index, cmd in enumerate(cmds):
+            is_last = index == len(cmds) - 1
+            if index == 0 and cmd[0] == 'yt-dlp' and warm_pool.enabled:
+                # Primeiro estágio já aquecido: o stdout dele é um pipe nosso
+                process, read_fd = await _start_source(cmd)
+                if is_last:
+                    output, output_transport = await _pipe_reader(read_fd, chunk_size)
+                    read_fd = None
+            else:
+                read_fd, write_fd = (None, None) if is_last else os.pipe()
+                pass_fds: List[int] = []
+                if is_last and extra_fds:
+                    markers = {extra_input(i): f'pipe:{fd}' for i, fd in enumerate(extra_fds)}
+                    cmd = [markers.get(arg, arg) for arg in cmd]
+                    pass_fds, extra_fds = extra_fds, []
+                try:
+                    process = await asyncio.create_subprocess_exec(
+                        *cmd,
+                        stdin=asyncio.subprocess.DEVNULL if stdin_fd is None else stdin_fd,
+                        stdout=asyncio.subprocess.PIPE if is_last else write_fd,
+                        stderr=asyncio.subprocess.PIPE,
+                        pass_fds=pass_fds
+                    )
+                except BaseException:
+                    if read_fd is not None:
+                        os.close(read_fd)
+                    raise
+                finally:
+                    # Os filhos já herdaram suas pontas do pipe
+                    if write_fd is not None:
+                        os.close(write_fd)
+                    if stdin_fd is not None:
+                        os.close(stdin_fd)
+                    for fd in pass_fds:
+                        os.close(fd)
+                if is_last:
+                    output = process.stdout
+            stdin_fd = read_fd
+            track(cmd, process)
+        
+        while True:
+            chunk = await output.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        
+        returncodes = [await process.wait() for process in processes]
+        await asyncio.gather(*stderr_tasks)
+        finished = True
+        
+        errors = []
+        for cmd, returncode, tail in zip(started, returncodes, stderr_tails):
+            if returncode != 0:
+                stderr = b''.join(tail).decode('utf-8', errors='ignore')
+                errors.append(f"{cmd[0]} falhou com código {returncode}: {stderr}")
+        if errors:
+            raise Exception("; ".join(errors))
+    finally:
+        if output_transport is not None:
+            output_transport.close()
+        for fd in extra_fds:
+            # Falha antes de o último comando herdar as entradas extras
+            os.close(fd)
+        if not finished:
+            # Consumidor desistiu (desconexão/cancelamento): não deixar órfãos.
+            # Sem await aqui: o escopo pode estar cancelado; o loop reaproveita os processos.
+            for cmd, process in zip(started, processes):
+                if process.returncode is None:
+                    try:
+                        process.kill()
+                    except ProcessLookupError:
+                        pass
+                    print(f"[{video_id}] Processo {cmd[0]} encerrado (stream interrompido)")
+            for task in stderr_tasks:
+                task.cancel()
+
+
+def build_mp3_pipeline(
+    video_url: str,
+    bitrate: int = 192,
+    metadata: Optional[Dict[str, str]] = None,
+    info_path: Optional[str] = None
+) -> List[List[str]]:
+    """
+    Monta a cadeia yt-dlp | ffmpeg que gera MP3 sem arquivos intermediários.
+    
+    Args:
+        video_url: URL do vídeo do YouTube
+        bitrate: Bitrate do MP3 em kbps
+        metadata: Tags ID3 (ex: {'title': ..., 'artist': ...})
+        info_path: Info JSON já resolvido (ver ytdlp_source)
+    
+    Returns:
+        Lista de comandos para stream_pipeline
+    """
+    ytdlp_cmd = [
+        'yt-dlp',
+        '-f', 'bestaudio/best',
+        '--no-playlist',
+        '--quiet',
+        '-o', '-',
+        *ytdlp_source(video_url, info_path),
+    ]
+    
+    ffmpeg_cmd = [
+        'ffmpeg',
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-i', 'pipe:0',
+        '-vn',
+        '-ar', '44100',              # Sample rate padrão (44.1kHz)
+        '-ac', '2',                  # Estéreo (2 canais)
+        '-b:a', f'{bitrate}k',       # Bitrate constante (padrão 192kbps)
+    ]
+    for key, value in (metadata or {}).items():
+        ffmpeg_cmd += ['-metadata', f'{key}={value}']
+    ffmpeg_cmd += ['-f', 'mp3', 'pipe:1']
+    
+    return [ytdlp_cmd, ffmpeg_cmd]
+
+
+async def _start_source(cmd: List[str]) -> Tuple[asyncio.subprocess.Process, int]:
+    """Inicia um comando sem stdin cuja saída vai para um os.pipe(); retorna a ponta de leitura"""
+    if cmd[0] == 'yt-dlp' and warm_pool.enabled:
+        worker = await warm_pool.start(cmd[1:])
+        return worker.process, worker.take_stdout()
+    
+    read_fd, write_fd = os.pipe()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=write_fd,
+            stderr=asyncio.subprocess.PIPE
+        )
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+    return process, read_fd
+
+
+def build_mux_pipeline(
+    video_url: str,
+    video_format: str,
+    audio_format: Optional[str] = None,
+    info_path: Optional[str] = None,
+    clip: Optional[ClipRange] = None
+) -> Tuple[List[List[str]], List[List[str]]]:
+    """
+    Monta o mux vídeo + áudio em MP4 fragmentado, sem arquivos intermediários.
+    
+    Dois yt-dlp baixam os streams em paralelo: o de vídeo alimenta o stdin do
+    ffmpeg e o de áudio chega como segunda entrada (extra_inputs). Com
+    frag_keyframe+empty_moov o ffmpeg não precisa voltar ao início do arquivo
+    para escrever o índice, então o MP4 sai em stream e o player começa a
+    reproduzir nos primeiros fragmentos. Sem audio_format, o único formato
+    só é reempacotado (usado pelos trechos, ver ytdlp_clip_args).
+    
+    Args:
+        video_url: URL do vídeo do YouTube
+        video_format: ID do formato de vídeo (ex: '137')
+        audio_format: ID do formato de áudio (ex: '140'), se houver
+        info_path: Info JSON já resolvido (ver ytdlp_source)
+        clip: Trecho (início, fim) em segundos
+    
+    Returns:
+        (cmds, extra_inputs) para stream_pipeline
+    """
+    def ytdlp_cmd(format_id: str) -> List[str]:
+        return [
+            'yt-dlp',
+            '-f', format_id,
+            '--no-playlist',
+            '--quiet',
+            *(ytdlp_clip_args(clip) if clip else []),
+            '-o', '-',
+            *ytdlp_source(video_url, info_path),
+        ]
+    
+    if audio_format is None:
+        inputs = ['-i', 'pipe:0', '-map', '0']
+    else:
+        inputs = ['-i', 'pipe:0', '-i', extra_input(0), '-map', '0:v:0', '-map', '1:a:0']
+    
+    ffmpeg_cmd = [
+        'ffmpeg',
+        '-hide_banner',
+        '-loglevel', 'error',
+        *inputs,
+        '-c', 'copy',
+        # default_base_moof: fragmentos que Media Source Extensions aceitam
+        '-movflags', 'frag_keyframe+empty_moov+default_base_moof',
+        '-f', 'mp4',
+        'pipe:1',
+    ]
+    
+    extra_inputs = [ytdlp_cmd(audio_format)] if audio_format else []
+    return [ytdlp_cmd(video_format), ffmpeg_cmd], extra_inputs
+
+
+def ytdlp_clip_args(clip: ClipRange) -> List[str]:
+    """
+    Argumentos da CLI do yt-dlp para baixar só um trecho.
+    
+    Com --download-sections o download é feito pelo ffmpeg, que busca o início
+    direto na URL de mídia (só os bytes do trecho trafegam). Para stdout, o
+    yt-dlp escolheria o contêiner pela extensão (m4a não sai em pipe), então
+    a saída é sempre Matroska, que o ffmpeg do mux reempacota.
+    """
+    start, end = clip
+    end_label = 'inf' if end is None else f'{end:g}'
+    return [
+        '--download-sections', f'*{start:g}-{end_label}',
+        '--downloader-args', 'ffmpeg_o:-f matroska',
+    ]
+
+
+async def _pipe_reader(fd: int, limit: int) -> Tuple[asyncio.StreamReader, asyncio.BaseTransport]:
+    """Lê a ponta de leitura de um os.pipe() pelo event loop (como o stdout de um processo)"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=limit, loop=loop)
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader, loop=loop),
+        os.fdopen(fd, 'rb', 0)
+    )
+    return reader, transport
+
+
+def ytdlp_source(video_url: str, info_path: Optional[str] = None) -> List[str]:
+    """
+    Argumentos da CLI do yt-dlp que indicam o que baixar.
+    
+    Com info_path, o yt-dlp carrega o info já resolvido (--load-info-json) e
+    vai direto às URLs de mídia; se elas falharem (ex: 403), ele mesmo refaz
+    a extração a partir da webpage_url guardada no info.
+    """
+    if info_path:
+        return ['--load-info-json', info_path]
+    return [video_url]
+
+
+async def stream_video(
+    video_url: str,
+    format_id: str,
+    video_id: str,
+    info_path: Optional[str] = None,
+    clip: Optional[ClipRange] = None
+) -> AsyncIterator[bytes]:
     """
     Faz stream direto de um vídeo do YouTube sem armazenar em disco.
     
+    IDs combinados ('137+140') são baixados em paralelo e unidos em MP4
+    fragmentado pelo ffmpeg (build_mux_pipeline) enquanto chegam; o yt-dlp
+    sozinho precisaria de arquivos temporários para o merge. Trechos (clip)
+    também saem em MP4 fragmentado, mesmo com um único formato.
+    
     Args:
         video_url: URL do vídeo do YouTube
         format_id: ID do formato desejado
         video_id: ID único da sessão
+        info_path: Info JSON já resolvido (ver ytdlp_source)
+        clip: Trecho (início, fim) em segundos
     
     Yields:
         Chunks de 64KB do arquivo de vídeo
@@ -66,33 +674,22 @@ def stream_video(video_url: str, format_id: str, video_id: str):
     Raises:
         Exception: Se o processo de download falhar
     """
-    chunk_size = 1024 * 64  # 64KB
-    
     try:
         print(f"[{video_id}] Iniciando stream de: {video_url}")
         
-        cmd = ['yt-dlp', '-f', format_id, '-o', '-', video_url]
-        
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+        parts = format_id.split('+')
+        if len(parts) == 2 or (clip and len(parts) == 1):
+            cmds, extra_inputs = build_mux_pipeline(video_url, *parts, info_path=info_path, clip=clip)
+            chunks = stream_pipeline(cmds, video_id, extra_inputs=extra_inputs)
+        else:
+            cmd = ['yt-dlp', '-f', format_id, '-o', '-', *ytdlp_source(video_url, info_path)]
+            chunks = stream_process(cmd, video_id)
         
-        while True:
-            chunk = process.stdout.read(chunk_size)
-            if not chunk:
-                break
+        async for chunk in chunks:
             yield chunk
         
-        # Verificar se o processo terminou com sucesso
-        returncode = process.wait()
-        if returncode != 0:
-            stderr = process.stderr.read().decode('utf-8', errors='ignore')
-            raise Exception(f"yt-dlp falhou com código {returncode}: {stderr}")
-        
         print(f"[{video_id}] Stream concluído com sucesso")
         
     except Exception as e:
         print(f"[{video_id}] Erro durante stream: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict
+from app.config import settings
+
+
+class StageExecutor:
+    """
+    Pool de threads limitado e dedicado a uma etapa (metadados, download, conversão).
+
+    Separar as etapas impede que downloads lentos ocupem as threads das
+    extrações de metadados, que são rápidas. Expõe fila e tempo de espera.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self._wait_times: Deque[float] = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-worker"
+        )
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Executa func(*args) no pool da etapa sem bloquear o event loop.
+
+        Returns:
+            O retorno de func
+        """
+        submitted_at = time.monotonic()
+        started = False
+
+        def job() -> Any:
+            nonlocal started
+            with self._lock:
+                started = True
+                self.queued -= 1
+                self.running += 1
+                self._wait_times.append(time.monotonic() - submitted_at)
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        with self._lock:
+            self.queued += 1
+
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(self._executor, job)
+        except asyncio.CancelledError:
+            # Cancelado ainda na fila: o job nunca vai rodar
+            with self._lock:
+                if not started:
+                    self.queued -= 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Ocupação e tempos de espera na fila (em ms)"""
+        with self._lock:
+            waits = list(self._wait_times)
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                "max_wait_ms": round(max(waits) * 1000, 1) if waits else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        """Encerra o pool sem esperar tarefas pendentes"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Extração de metadados: chamadas curtas, não podem esperar atrás de downloads
+metadata_executor = StageExecutor("metadata", settings.METADATA_WORKERS)
+
+# Download de rede (yt-dlp)
+download_executor = StageExecutor("download", settings.DOWNLOAD_WORKERS)
+
+# Conversão com ffmpeg (CPU): limitada ao número de núcleos. O ffmpeg já roda
+# em processo próprio, então threads bastam para limitar a concorrência.
+transcode_executor = StageExecutor(
+    "transcode",
+    settings.TRANSCODE_WORKERS or os.cpu_count() or 1
+)
+
+
+def executors_stats() -> Dict[str, Dict[str, Any]]:
+    """Estatísticas de todos os pools"""
+    return {
+        executor.name: executor.stats()
+        for executor in (metadata_executor, download_executor, transcode_executor)
+    }
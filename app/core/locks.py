@@ -0,0 +1,102 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem flock, lock entre workers fica desativado
+    fcntl = None
+
+
+class FileLock:
+    """
+    Lock exclusivo entre processos baseado em flock.
+
+    Usado para que workers diferentes do uvicorn não façam o mesmo
+    trabalho ao mesmo tempo. Em plataformas sem fcntl vira um no-op.
+
+    Com remove_on_release, o arquivo é apagado ao liberar (locks por chave
+    do cache, que senão se acumulariam). Quem esperava no arquivo apagado
+    percebe, ao obter o lock, que o caminho já não aponta para ele e tenta
+    de novo no arquivo atual: dois donos ao mesmo tempo continuam impossíveis.
+    """
+
+    def __init__(self, path: Path, remove_on_release: bool = False):
+        self.path = Path(path)
+        self.remove_on_release = remove_on_release
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> None:
+        """Bloqueia até obter o lock"""
+        if fcntl is None or self._fd is not None:
+            return
+        while not self._lock(fcntl.LOCK_EX):
+            pass
+
+    def try_acquire(self) -> bool:
+        """
+        Tenta obter o lock sem esperar.
+
+        Returns:
+            True se o lock foi obtido (ou já pertencia a este objeto)
+        """
+        if fcntl is None or self._fd is not None:
+            return True
+        while True:
+            try:
+                if self._lock(fcntl.LOCK_EX | fcntl.LOCK_NB):
+                    return True
+            except BlockingIOError:
+                return False
+
+    def _lock(self, operation: int) -> bool:
+        """Abre e trava o arquivo; False se ele foi apagado/recriado enquanto isso"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+            if not self._is_current(fd):
+                os.close(fd)
+                return False
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+
+    def _is_current(self, fd: int) -> bool:
+        """Indica se o caminho ainda aponta para o arquivo aberto em fd"""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(fd)
+        return (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino)
+
+    @property
+    def held(self) -> bool:
+        """Indica se este objeto detém o lock"""
+        return fcntl is None or self._fd is not None
+
+    def release(self) -> None:
+        """Libera o lock (seguro chamar mais de uma vez)"""
+        if self._fd is None:
+            return
+        try:
+            if self.remove_on_release:
+                # Ainda com o lock: ninguém mais trava este arquivo depois disso
+                try:
+                    os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
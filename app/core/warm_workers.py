@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import sys
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Set
+from app.config import settings
+
+# Script executado por cada processo do pool
+WORKER_SCRIPT = str(Path(__file__).with_name("ytdlp_worker.py"))
+
+
+class WarmProcess:
+    """
+    Processo yt-dlp do pool.
+
+    O stdout é a ponta de escrita de um os.pipe(); a ponta de leitura
+    (stdout_fd) fica com quem recebe o processo, que pode repassá-la como
+    stdin do próximo comando (ex: ffmpeg) ou lê-la diretamente.
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process, stdout_fd: int):
+        self.process = process
+        self.stdout_fd: Optional[int] = stdout_fd
+
+    def take_stdout(self) -> int:
+        """Transfere a ponta de leitura do stdout para quem chamou"""
+        fd, self.stdout_fd = self.stdout_fd, None
+        return fd
+
+    def kill(self) -> None:
+        """Encerra o processo e fecha o pipe, se ainda não foi transferido"""
+        if self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+        if self.stdout_fd is not None:
+            os.close(self.stdout_fd)
+            self.stdout_fd = None
+
+
+class WarmProcessPool:
+    """
+    Processos yt-dlp de reserva, já com o yt_dlp importado.
+
+    Iniciar a CLI do yt-dlp a cada stream custa um interpretador novo e o
+    import completo do yt_dlp (centenas de ms) antes do primeiro byte. Aqui
+    até `size` processos ficam prontos, esperando os argumentos no stdin.
+    Cada pedido consome um processo de reserva (que termina com o pedido,
+    como a CLI) e outro é iniciado em segundo plano para repor a reserva.
+    Sem reserva disponível, um processo novo é iniciado na hora.
+
+    Os processos ficam presos ao event loop que os criou; se o loop mudar
+    (ex: testes), a reserva antiga é descartada.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.warm_starts = 0
+        self.cold_starts = 0
+        self._idle: Deque[WarmProcess] = deque()
+        self._spawning: Set[asyncio.Future] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    async def start(self, args: List[str]) -> WarmProcess:
+        """
+        Executa o yt-dlp com args em um processo da reserva.
+
+        Args:
+            args: Argumentos de linha de comando (sem o 'yt-dlp')
+
+        Returns:
+            O processo em execução; o chamador passa a ser dono dele
+        """
+        self._bind_loop()
+        worker = self._take_idle()
+        if worker is None:
+            self.cold_starts += 1
+            worker = await self._spawn()
+        else:
+            self.warm_starts += 1
+        self.fill()
+
+        try:
+            worker.process.stdin.write(json.dumps(args).encode() + b"\n")
+            await worker.process.stdin.drain()
+            worker.process.stdin.close()
+        except BaseException:
+            worker.kill()
+            raise
+        return worker
+
+    def fill(self) -> None:
+        """Inicia, em segundo plano, os processos que faltam na reserva"""
+        if self._closed:
+            return
+        self._bind_loop()
+        missing = self.size - len(self._idle) - len(self._spawning)
+        for _ in range(max(missing, 0)):
+            task = asyncio.ensure_future(self._spawn_idle())
+            self._spawning.add(task)
+            task.add_done_callback(self._spawning.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        """Reserva e quantos pedidos pegaram processo pronto ou frio"""
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "warm_starts": self.warm_starts,
+            "cold_starts": self.cold_starts,
+        }
+
+    async def close(self) -> None:
+        """Encerra os processos da reserva e espera eles terminarem (desligamento)"""
+        self._closed = True
+        if self._spawning:
+            await asyncio.gather(*self._spawning, return_exceptions=True)
+        idle = list(self._idle)
+        self._discard_idle()
+        for worker in idle:
+            await worker.process.wait()
+
+    def _take_idle(self) -> Optional[WarmProcess]:
+        while self._idle:
+            worker = self._idle.popleft()
+            if worker.process.returncode is None:
+                return worker
+            # Morreu enquanto esperava (ex: OOM killer)
+            worker.kill()
+        return None
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Processos e tarefas do loop antigo não podem ser usados neste
+            self._discard_idle()
+            self._spawning = set()
+            self._loop = loop
+
+    def _discard_idle(self) -> None:
+        while self._idle:
+            self._idle.popleft().kill()
+
+    async def _spawn_idle(self) -> None:
+        loop = self._loop
+        try:
+            worker = await self._spawn()
+        except Exception as e:
+            print(f"[workers] Falha ao iniciar processo yt-dlp: {str(e)}")
+            return
+        if loop is not self._loop:
+            worker.kill()
+            return
+        # Mesmo com o pool fechando: close() encerra e espera a reserva
+        self._idle.append(worker)
+
+    async def _spawn(self) -> WarmProcess:
+        read_fd, write_fd = os.pipe()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, WORKER_SCRIPT,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=write_fd,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except BaseException:
+            os.close(read_fd)
+            raise
+        finally:
+            # O filho já herdou a ponta de escrita
+            os.close(write_fd)
+        return WarmProcess(process, read_fd)
+
+
+# Reserva de processos yt-dlp usada por stream_pipeline
+warm_pool = WarmProcessPool(settings.YTDLP_WARM_PROCESSES)
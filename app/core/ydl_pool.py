@@ -0,0 +1,147 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+import yt_dlp
+
+Hook = Callable[[Dict[str, Any]], None]
+
+
+class _PooledYoutubeDL:
+    """Instância do yt-dlp com hooks trocáveis a cada chamada"""
+
+    def __init__(self, opts: Dict[str, Any]):
+        self.progress_hooks: List[Hook] = []
+        self.postprocessor_hooks: List[Hook] = []
+        self.ydl = yt_dlp.YoutubeDL(dict(opts))
+        self._selectors: Dict[Any, Any] = {}
+        # Hooks fixos que repassam para os da chamada atual
+        self.ydl.add_progress_hook(lambda d: self._dispatch(self.progress_hooks, d))
+        self.ydl.add_postprocessor_hook(lambda d: self._dispatch(self.postprocessor_hooks, d))
+
+    def format_selector(self, spec: Any) -> Any:
+        """
+        Seletor compilado para spec, como o YoutubeDL faz no __init__.
+        
+        O yt-dlp só lê params['format'] ao ser criado (compila em
+        format_selector); trocar o parâmetro depois não muda a escolha.
+        """
+        if spec in (None, '-') or callable(spec):
+            return spec
+        if spec not in self._selectors:
+            self._selectors[spec] = self.ydl.build_format_selector(spec)
+        return self._selectors[spec]
+
+    @staticmethod
+    def _dispatch(hooks: List[Hook], d: Dict[str, Any]) -> None:
+        for hook in list(hooks):
+            hook(d)
+
+
+class YoutubeDLPool:
+    """
+    Instâncias de yt_dlp.YoutubeDL pré-configuradas e reaproveitadas.
+
+    Criar um YoutubeDL por pedido repete a leitura das opções, o registro
+    dos extractors e pós-processadores, a checagem do ffmpeg e as conexões
+    HTTP. Aqui cada thread dos pools de etapa mantém uma instância por perfil
+    (chave + opções base) e a reaproveita nos pedidos seguintes.
+
+    YoutubeDL não é thread-safe, então as instâncias nunca são compartilhadas
+    entre threads. Em cada chamada podem ser trocados parâmetros lidos em
+    tempo de execução (outtmpl, format, postprocessor_args...) e os hooks;
+    tudo volta ao original ao fim da chamada. 'format' também recompila o
+    seletor da instância (o YoutubeDL só o compila ao ser criado).
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.reused = 0
+        self._local = threading.local()
+        self._all: List[_PooledYoutubeDL] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(
+        self,
+        key: Hashable,
+        opts: Dict[str, Any],
+        params: Optional[Dict[str, Any]] = None,
+        progress_hooks: Optional[List[Hook]] = None,
+        postprocessor_hooks: Optional[List[Hook]] = None
+    ) -> Iterator[yt_dlp.YoutubeDL]:
+        """
+        Empresta a instância da thread atual para o perfil key.
+
+        Args:
+            key: Identifica o perfil; opções que só valem na criação (ex:
+                'postprocessors') devem fazer parte da chave
+            opts: Opções base, usadas apenas quando a instância é criada
+            params: Parâmetros trocados só durante esta chamada
+            progress_hooks: Hooks de progresso desta chamada
+            postprocessor_hooks: Hooks de pós-processamento desta chamada
+
+        Yields:
+            O YoutubeDL pronto para uso
+        """
+        pooled = self._instance(key, opts)
+        ydl = pooled.ydl
+        missing = object()
+        saved = {name: ydl.params.get(name, missing) for name in (params or {})}
+        saved_selector = ydl.format_selector
+        for name, value in (params or {}).items():
+            if name == 'outtmpl' and not isinstance(value, dict):
+                # Mantém os outros templates que o yt-dlp preencheu na criação
+                value = {**ydl.params.get('outtmpl', {}), 'default': value}
+            ydl.params[name] = value
+        if 'format' in (params or {}):
+            ydl.format_selector = pooled.format_selector(params['format'])
+        pooled.progress_hooks = list(progress_hooks or [])
+        pooled.postprocessor_hooks = list(postprocessor_hooks or [])
+        try:
+            yield ydl
+        finally:
+            pooled.progress_hooks = []
+            pooled.postprocessor_hooks = []
+            for name, value in saved.items():
+                if value is missing:
+                    ydl.params.pop(name, None)
+                else:
+                    ydl.params[name] = value
+            ydl.format_selector = saved_selector
+
+    def stats(self) -> Dict[str, Any]:
+        """Instâncias criadas e reaproveitadas"""
+        with self._lock:
+            return {
+                "instances": len(self._all),
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+    def close(self) -> None:
+        """Fecha todas as instâncias (desligamento)"""
+        with self._lock:
+            instances, self._all = self._all, []
+        for pooled in instances:
+            pooled.ydl.close()
+        # Threads que continuarem vivas criam instâncias novas
+        self._local = threading.local()
+
+    def _instance(self, key: Hashable, opts: Dict[str, Any]) -> _PooledYoutubeDL:
+        instances = getattr(self._local, "instances", None)
+        if instances is None:
+            instances = self._local.instances = {}
+        pooled = instances.get(key)
+        if pooled is not None:
+            with self._lock:
+                self.reused += 1
+            return pooled
+        pooled = instances[key] = _PooledYoutubeDL(opts)
+        with self._lock:
+            self.created += 1
+            self._all.append(pooled)
+        return pooled
+
+
+# Pool compartilhado pelas etapas de metadados e download
+ydl_pool = YoutubeDLPool()
@@ -0,0 +1,33 @@
+"""
+Processo yt-dlp pré-aquecido, iniciado pelo WarmProcessPool.
+
+Antes de receber trabalho, importa o yt_dlp e compila as expressões de URL
+dos extractors (o yt-dlp testa quase todos antes de chegar ao do YouTube, o
+passo mais caro da inicialização). Depois lê do stdin uma linha JSON com os
+argumentos de linha de comando e executa o yt-dlp exatamente como o
+executável faria (ex: -o - escreve no stdout). Cada processo atende um
+único pedido e termina.
+"""
+import json
+import sys
+
+import yt_dlp
+from yt_dlp.extractor import gen_extractor_classes
+
+# URL de referência para o aquecimento (só o formato importa)
+WARMUP_URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+
+def warm_up() -> None:
+    """Percorre os extractors na mesma ordem do yt-dlp até o que aceita a URL"""
+    for ie in gen_extractor_classes():
+        if ie.suitable(WARMUP_URL):
+            break
+
+
+if __name__ == '__main__':
+    warm_up()
+    line = sys.stdin.readline()
+    if line:
+        # Termina com o mesmo código de saída da CLI (SystemExit)
+        yt_dlp.main(json.loads(line))
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.schemas.batch import BatchDownloadRequest
+from app.services.batch import stream_batch_zip
+from app.services.youtube import expand_playlist
+from app.utils.helpers import generate_video_id
+from app.utils.validators import extract_playlist_id, validate_youtube_url
+
+router = APIRouter(prefix="/api", tags=["batch"])
+
+
+@router.post("/batch")
+async def download_batch(request: BatchDownloadRequest):
+    """
+    Baixa vários vídeos em paralelo e entrega um ZIP montado enquanto as faixas ficam prontas.
+    
+    **Request:**
+    - urls: URLs dos vídeos (até BATCH_MAX_URLS)
+    - playlist_url: ou uma playlist, expandida nos seus primeiros BATCH_MAX_URLS vídeos
+    - format: mp3 (padrão), m4a ou opus
+    
+    **Response:**
+    - ZIP sem compressão, enviado em stream (sem Content-Length nem Range);
+      cada faixa entra assim que termina, com a posição no lote no nome, e
+      as falhas ficam listadas em erros.txt
+    """
+    
+    if request.playlist_url is not None:
+        playlist_url = str(request.playlist_url)
+        if extract_playlist_id(playlist_url) is None:
+            raise HTTPException(
+                status_code=400,
+                detail="URL inválida ou não é uma playlist do YouTube"
+            )
+        try:
+            urls = await expand_playlist(playlist_url, settings.BATCH_MAX_URLS)
+        except Exception as e:
+            print(f"[batch] Erro ao listar playlist: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Erro ao listar playlist: {str(e)}"
+            )
+        if not urls:
+            raise HTTPException(status_code=404, detail="Playlist vazia ou indisponível")
+    else:
+        urls = [str(url) for url in request.urls]
+        invalid = [url for url in urls if not validate_youtube_url(url)]
+        if invalid:
+            raise HTTPException(
+                status_code=400,
+                detail=f"URLs inválidas ou que não são vídeos do YouTube: {', '.join(invalid)}"
+            )
+    
+    batch_id = generate_video_id(str(request.playlist_url or urls[0]))
+    print(f"[batch {batch_id}] Iniciando lote com {len(urls)} vídeos ({request.format})")
+    
+    return StreamingResponse(
+        stream_batch_zip(urls, batch_id, request.format),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="youtube-{batch_id}.zip"',
+            # ZIP montado ao vivo: não há como atender Range
+            "Accept-Ranges": "none",
+        }
+    )
@@ -1,15 +1,46 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse, StreamingResponse
+import asyncio
+from typing import Any, Awaitable, Callable
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from urllib.parse import quote
 
-from app.schemas.download import DownloadRequest, DownloadRequestWithFormat, VideoMetadata
+from app.config import settings
+
+from app.schemas.download import (
+    AudioFormat,
+    BulkFormatsItem,
+    BulkFormatsRequest,
+    BulkFormatsResponse,
+    DownloadRequest,
+    DownloadRequestWithFormat,
+    VideoMetadata,
+)
 from app.utils.validators import validate_youtube_url
-from app.utils.helpers import sanitize_filename, generate_video_id
-from app.services.youtube import download_youtube_audio, extract_video_metadata
-from app.core.downloader import stream_video
+from app.utils.helpers import ClipRange, clip_range, sanitize_filename, generate_video_id
+from app.services.youtube import (
+    audio_requires_work,
+    download_youtube_audio,
+    extract_metadata_many,
+    extract_video_metadata,
+    should_stream_audio,
+    stream_youtube_audio,
+    stream_youtube_video,
+    video_stream_requires_work,
+)
+from app.services.admission import download_admission, release_when_done, OverloadedError
+from app.services.formats import select_format
+from app.routes.responses import CachedFileResponse
 
 router = APIRouter(prefix="/api", tags=["download"])
 
+# Content-Type de cada formato de /api/download
+AUDIO_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "m4a": "audio/mp4",
+    "opus": "audio/ogg",
+}
+
 
 @router.get("/formats", response_model=VideoMetadata)
 async def get_formats(url: str):
@@ -24,6 +55,7 @@ async def get_formats(url: str):
     - duration: Duração em segundos
     - uploader: Nome do uploader
     - formats: Lista de formatos disponíveis com informações técnicas
+      (vídeos por altura, depois os formatos só de áudio por bitrate)
     """
     
     # Validar URL
@@ -46,6 +78,45 @@ async def get_formats(url: str):
         )
 
 
+@router.post("/formats/bulk", response_model=BulkFormatsResponse)
+async def get_formats_bulk(request: BulkFormatsRequest):
+    """
+    Extrai metadados e formatos de vários vídeos em um só pedido.
+    
+    As extrações rodam em paralelo (até FORMATS_BULK_CONCURRENCY por vez),
+    então o pedido leva perto do tempo do vídeo mais lento. URLs inválidas ou
+    que falharem não derrubam o pedido: o item correspondente traz `error`.
+    
+    **Request Body:**
+    - urls: URLs dos vídeos (até FORMATS_BULK_MAX_URLS)
+    - stream: Se true, responde em NDJSON (application/x-ndjson), uma linha
+      por vídeo assim que cada um termina, na ordem de conclusão
+    
+    **Response:**
+    - results: Um item por URL, na ordem do pedido, com index, url e
+      metadata (mesmo formato de GET /api/formats) ou error
+    """
+    urls = request.urls
+    print(f"[formats] Extraindo metadados de {len(urls)} vídeos")
+    results = extract_metadata_many(urls, settings.FORMATS_BULK_CONCURRENCY)
+    
+    if request.stream:
+        async def lines():
+            async for index, metadata, error in results:
+                item = BulkFormatsItem(index=index, url=urls[index], metadata=metadata, error=error)
+                yield item.model_dump_json() + "\n"
+        
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    items = [None] * len(urls)
+    async for index, metadata, error in results:
+        items[index] = BulkFormatsItem(index=index, url=urls[index], metadata=metadata, error=error)
+    failed = sum(1 for item in items if item.error is not None)
+    if failed:
+        print(f"[formats] {failed} de {len(urls)} vídeos com erro")
+    return BulkFormatsResponse(results=items)
+
+
 @router.post("/download-stream")
 async def download_stream(request: DownloadRequestWithFormat):
     """
@@ -54,13 +125,21 @@ async def download_stream(request: DownloadRequestWithFormat):
     **Request:**
     - url: URL do vídeo do YouTube
     - format_id: ID do formato desejado (obtido via GET /api/formats)
+    - select: ou uma regra resolvida pelo servidor, ex: menor áudio com 128 kbps
+      ou mais ({"kind": "audio", "min_abr": 128, "prefer": "smallest"}) ou
+      melhor vídeo até 50 MB ({"kind": "video", "max_filesize": 52428800})
+    - start/end: trecho em segundos (opcionais); só o intervalo é baixado e o
+      resultado sai em MP4 fragmentado
     
     **Response:**
-    - Streaming de vídeo/áudio com chunks de 64KB
+    - Streaming de vídeo/áudio com chunks de 64KB (sem suporte a Range)
+    - Header X-Format-Id com o formato enviado
+    - 422 se nenhum formato atender à regra
     """
     
     url = str(request.url)
     format_id = request.format_id
+    clip = request.clip
     
     # Validar URL
     if not validate_youtube_url(url):
@@ -71,8 +150,32 @@ async def download_stream(request: DownloadRequestWithFormat):
     
     # Gerar ID único
     video_id = generate_video_id(url)
+    ticket = None
+    
+    if request.select is not None:
+        # A regra precisa dos formatos (em cache na maioria dos casos)
+        try:
+            metadata = await extract_video_metadata(url)
+        except Exception as e:
+            print(f"[{video_id}] Erro ao extrair metadados: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Erro ao fazer streaming: {str(e)}"
+            )
+        selected = select_format(metadata.get('formats', []), request.select)
+        if selected is None:
+            raise HTTPException(
+                status_code=422,
+                detail="Nenhum formato atende aos critérios de seleção"
+            )
+        format_id = selected['format_id']
+        print(f"[{video_id}] Formato selecionado pela regra: {format_id}")
     
     try:
+        # Só um novo yt-dlp ocupa vaga; quem se anexa a um stream existente entra direto
+        if video_stream_requires_work(url, format_id, clip):
+            ticket = await download_admission.acquire()
+        
         print(f"[{video_id}] Iniciando streaming de {url} com formato {format_id}")
         
         # Buscar metadados para obter extensão do formato
@@ -84,6 +187,9 @@ async def download_stream(request: DownloadRequestWithFormat):
         for fmt in metadata.get('formats', []):
             if fmt.get('format_id') == format_id:
                 ext = fmt.get('ext', 'mp4')
+                if clip is not None:
+                    # Trechos são reempacotados em MP4 fragmentado
+                    ext = 'm4a' if fmt.get('vcodec') == 'none' else 'mp4'
                 break
         
         # Usar título do vídeo normalizado como nome do arquivo
@@ -93,37 +199,137 @@ async def download_stream(request: DownloadRequestWithFormat):
         filename = f"{video_title}.{ext}"
         filename_encoded = quote(filename)
         
+        # Pedidos simultâneos do mesmo vídeo/formato compartilham um único yt-dlp
+        chunks = stream_youtube_video(url, format_id, video_id, clip)
+        
+        # A vaga fica ocupada até o fim do stream
+        if ticket:
+            chunks = release_when_done(chunks, ticket)
+            ticket = None
+        
         # Retornar stream
         return StreamingResponse(
-            stream_video(url, format_id, video_id),
+            chunks,
             media_type="application/octet-stream",
             headers={
                 "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}",
-                "Accept-Ranges": "bytes",
+                # Stream ao vivo do yt-dlp: não há como atender Range
+                "Accept-Ranges": "none",
+                "X-Format-Id": format_id,
             }
         )
         
+    except OverloadedError as e:
+        raise _overloaded(video_id, e)
+        
     except Exception as e:
         print(f"[{video_id}] Erro ao fazer streaming: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao fazer streaming: {str(e)}"
         )
+    
+    finally:
+        if ticket:
+            ticket.release()
 
 
 @router.post("/download", response_class=FileResponse)
-async def download(request: DownloadRequest):
+async def download(request: DownloadRequest, http_request: Request):
     """
     Baixa áudio de um vídeo do YouTube e retorna como MP3.
     
     **Request:**
     - url: URL do vídeo do YouTube
+    - stream: se true, envia o MP3 enquanto é convertido (primeiro byte em
+      segundos); o arquivo também é gravado no cache para os próximos pedidos
+    - format: mp3 (padrão, reencodado), m4a (AAC) ou opus (Ogg); m4a e opus
+      entregam o áudio original do YouTube sem reencode, bem mais rápido
+    - start/end: trecho em segundos (opcionais); só o intervalo é baixado e
+      convertido, e fica em cache separado do áudio completo
     
     **Response:**
-    - Audio stream em formato MP3
+    - Audio stream no formato pedido (suporta Range/If-Range, ETag e
+      Last-Modified quando servido do cache ou após o download completo)
     """
     
-    url = str(request.url)
+    return await _serve_audio(http_request, str(request.url), request.stream, request.format, request.clip)
+
+
+@router.get("/download", response_class=FileResponse)
+async def download_get(
+    http_request: Request,
+    url: str,
+    stream: bool = False,
+    format: AudioFormat = "mp3",
+    start: Optional[float] = Query(None, ge=0),
+    end: Optional[float] = Query(None, gt=0)
+):
+    """
+    Variante GET de POST /api/download, para players e gerenciadores de download.
+    
+    Clientes que perderam a conexão podem retomar com `Range: bytes=N-`
+    (e `If-Range` com o ETag recebido) e recebem 206 só com o que falta.
+    
+    **Query Parameters:**
+    - url: URL do vídeo do YouTube (obrigatório)
+    - stream: enviar o MP3 enquanto é convertido (padrão: false)
+    - format: mp3 (padrão), m4a ou opus
+    - start/end: trecho em segundos (opcionais)
+    
+    **Response:**
+    - Audio stream no formato pedido
+    """
+    
+    if end is not None and end <= (start or 0):
+        raise HTTPException(status_code=422, detail="end deve ser maior que start")
+    
+    return await _serve_audio(http_request, url, stream, format, clip_range(start, end))
+
+
+class ClientDisconnected(Exception):
+    """O cliente fechou a conexão antes da resposta ficar pronta"""
+
+
+async def _cancel_on_disconnect(
+    http_request: Request,
+    awaitable: Awaitable[Any],
+    on_discard: Optional[Callable[[Any], None]] = None
+) -> Any:
+    """
+    Aguarda awaitable, cancelando-o se o cliente desconectar no meio.
+    
+    O cancelamento chega ao download (que interrompe o yt-dlp e descarta a
+    pasta temporária) a menos que outro pedido ainda espere pelo resultado.
+    Se o awaitable terminar enquanto a desconexão é verificada, o resultado
+    não chega a quem chamou: on_discard o recebe para liberá-lo (ex: vaga).
+    
+    Raises:
+        ClientDisconnected: Se o cliente desconectou antes do fim
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                if task.done() and not task.cancelled() and task.exception() is None and on_discard:
+                    on_discard(task.result())
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def _serve_audio(
+    http_request: Request,
+    url: str,
+    stream: bool = False,
+    audio_format: str = "mp3",
+    clip: Optional[ClipRange] = None
+):
+    """Valida a URL, obtém o áudio (cache, pipeline ou download) e monta a resposta"""
     
     # Validar URL
     if not validate_youtube_url(url):
@@ -134,26 +340,80 @@ async def download(request: DownloadRequest):
     
     # Gerar ID único
     video_id = generate_video_id(url)
+    ticket = None
     
     try:
-        # Fazer download
-        mp3_file = await download_youtube_audio(url, video_id)
+        # Cache e produções em andamento não passam pelo controle de admissão
+        if audio_requires_work(url, audio_format, clip):
+            ticket = await _cancel_on_disconnect(
+                http_request,
+                download_admission.acquire(),
+                on_discard=lambda granted: granted.release()
+            )
+        
+        # Pipeline: quando pedido ou já em andamento (e sem arquivo pronto no cache)
+        if should_stream_audio(url, stream, audio_format, clip):
+            filename, chunks = await stream_youtube_audio(url, video_id)
+            if ticket:
+                chunks = release_when_done(chunks, ticket)
+                ticket = None
+            filename_encoded = quote(filename)
+            return StreamingResponse(
+                chunks,
+                media_type="audio/mpeg",
+                headers={
+                    "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}",
+                    # Saída ao vivo do ffmpeg: Range só após publicado no cache
+                    "Accept-Ranges": "none",
+                }
+            )
+        
+        # Fazer download (cancelado se o cliente desistir)
+        audio_file = await _cancel_on_disconnect(
+            http_request,
+            download_youtube_audio(url, video_id, audio_format=audio_format, clip=clip)
+        )
         
         # Retornar arquivo com stream
-        # Nota: O arquivo será deletado automaticamente pelo scheduler
-        filename_encoded = quote(mp3_file.name)
-        return FileResponse(
-            path=mp3_file,
-            filename=mp3_file.name,
-            media_type="audio/mpeg",
+        # FileResponse trata Range (206, inclusive multipart/byteranges),
+        # If-Range e gera ETag/Last-Modified a partir do stat do arquivo
+        # Nota: O arquivo será removido pela limpeza (TTL/orçamento do cache)
+        filename_encoded = quote(audio_file.name)
+        # Entrada fixada no índice: a limpeza não a remove durante o envio
+        return CachedFileResponse(
+            path=audio_file,
+            filename=audio_file.name,
+            media_type=AUDIO_MEDIA_TYPES[audio_format],
             headers={
                 "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}"
             }
         )
         
+    except OverloadedError as e:
+        raise _overloaded(video_id, e)
+        
+    except ClientDisconnected:
+        # 499 (Client Closed Request): só aparece em logs, o cliente já foi embora
+        print(f"[{video_id}] Cliente desconectou: download cancelado")
+        return Response(status_code=499)
+        
     except Exception as e:
         print(f"[{video_id}] Erro ao baixar: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao baixar vídeo: {str(e)}"
         )
+    
+    finally:
+        if ticket:
+            ticket.release()
+
+
+def _overloaded(video_id: str, error: OverloadedError) -> HTTPException:
+    """Resposta 429 com Retry-After para quando não há vaga"""
+    print(f"[{video_id}] Recusado por sobrecarga (Retry-After: {error.retry_after}s)")
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
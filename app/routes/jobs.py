@@ -0,0 +1,113 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from urllib.parse import quote
+
+from app.schemas.jobs import JobCreateRequest, JobStatus
+from app.routes.responses import CachedFileResponse
+from app.services.jobs import job_manager, Job, JOB_DONE
+from app.utils.validators import validate_youtube_url
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+@router.post("", response_model=JobStatus, status_code=202)
+async def create_job(request: JobCreateRequest):
+    """
+    Inicia o download/conversão em segundo plano e retorna o ID do job na hora.
+    
+    **Request:**
+    - url: URL do vídeo do YouTube
+    
+    **Response (202):**
+    - Estado inicial do job; acompanhe via GET /api/jobs/{id} ou
+      GET /api/jobs/{id}/events (SSE) e baixe em GET /api/jobs/{id}/file
+    """
+    
+    url = str(request.url)
+    
+    # Validar URL
+    if not validate_youtube_url(url):
+        raise HTTPException(
+            status_code=400,
+            detail="URL inválida ou não é um vídeo do YouTube"
+        )
+    
+    job = job_manager.create(url)
+    print(f"[job {job.id}] Criado para {url}")
+    return job.to_dict()
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """
+    Retorna o estado do job (queued, downloading, converting, done, error)
+    com bytes baixados, porcentagem, velocidade e ETA.
+    """
+    return _get_job_or_404(job_id).to_dict()
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-Sent Events com o progresso do job.
+    
+    **Eventos:**
+    - progress: estado atual (bytes, porcentagem, ETA)
+    - done: job concluído (inclui file_url)
+    - error: job falhou (inclui error)
+    """
+    job = _get_job_or_404(job_id)
+    return StreamingResponse(
+        job_manager.events(job),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Desativa buffering no nginx
+        }
+    )
+
+
+@router.get("/{job_id}/file", response_class=FileResponse)
+async def job_file(job_id: str):
+    """
+    Baixa o MP3 de um job concluído (suporta Range/If-Range).
+    
+    **Response:**
+    - 200/206: arquivo MP3
+    - 409: job ainda não concluído
+    - 410: arquivo já removido pela limpeza
+    """
+    job = _get_job_or_404(job_id)
+    
+    if job.state != JOB_DONE:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job ainda não concluído (estado: {job.state})"
+        )
+    
+    if not job.file_path or not job.file_path.exists():
+        raise HTTPException(
+            status_code=410,
+            detail="Arquivo não está mais disponível; crie um novo job"
+        )
+    
+    filename_encoded = quote(job.file_path.name)
+    # Entrada fixada no índice: a limpeza não a remove durante o envio
+    return CachedFileResponse(
+        path=job.file_path,
+        filename=job.file_path.name,
+        media_type="audio/mpeg",
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}"
+        }
+    )
+
+
+def _get_job_or_404(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Job não encontrado"
+        )
+    return job
@@ -0,0 +1,24 @@
+from fastapi.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+from app.services.cache import pin_cached_file
+
+
+class CachedFileResponse(FileResponse):
+    """
+    FileResponse de um arquivo do cache, fixado no índice até o fim do envio.
+
+    A fixação é feita ao montar a resposta e liberada ao fim de __call__,
+    qualquer que seja o desfecho: o FileResponse responde 416 ou 400 (Range
+    fora do arquivo ou malformado) sem executar as background tasks, então
+    liberar por uma BackgroundTask deixaria a entrada fixada para sempre.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._unpin = pin_cached_file(self.path)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._unpin()
@@ -0,0 +1,50 @@
+from fastapi import APIRouter
+
+from app.core.executors import executors_stats
+from app.core.warm_workers import warm_pool
+from app.core.ydl_pool import ydl_pool
+from app.services.admission import download_admission
+from app.services.cache_index import cache_index
+from app.services.cleanup import cleanup_leader_held
+from app.services.jobs import job_manager
+from app.services.registry import shared_registry
+from app.services.youtube import metadata_cache, resolved_cache, download_flight, audio_fanout, video_fanout
+
+router = APIRouter(prefix="/api", tags=["stats"])
+
+
+@router.get("/stats")
+async def get_stats():
+    """
+    Retorna contadores internos para monitoramento.
+    
+    **Response:**
+    - metadata_cache: tamanho, hits, misses e taxa de acerto do cache de metadados
+    - resolved_urls: info com URLs de mídia ainda válidas (downloads sem nova extração)
+    - audio_cache: entradas, bytes em disco, orçamento, fixadas e removidas
+    - in_progress: downloads, pipelines MP3 e streams em andamento
+    - cluster: produções em andamento em todos os workers e se este é o líder da limpeza
+    - executors: fila, threads ocupadas e tempo de espera de cada pool
+    - ydl_pool: instâncias do yt-dlp criadas e reaproveitadas
+    - warm_workers: processos yt-dlp de reserva e streams que os usaram
+    - admission: vagas ocupadas, fila e pedidos recusados (429)
+    """
+    return {
+        "metadata_cache": metadata_cache.stats(),
+        "resolved_urls": resolved_cache.stats(),
+        "audio_cache": cache_index.stats(),
+        "in_progress": {
+            "downloads": download_flight.in_flight(),
+            "audio_streams": audio_fanout.active_count(),
+            "video_streams": video_fanout.active_count(),
+            "jobs": job_manager.active_count(),
+        },
+        "cluster": {
+            "in_flight": shared_registry.active_count(),
+            "cleanup_leader": cleanup_leader_held(),
+        },
+        "executors": executors_stats(),
+        "ydl_pool": ydl_pool.stats(),
+        "warm_workers": warm_pool.stats(),
+        "admission": download_admission.stats(),
+    }
@@ -0,0 +1,28 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field, HttpUrl, model_validator
+from app.config import settings
+from app.schemas.download import AudioFormat
+
+
+class BatchDownloadRequest(BaseModel):
+    """Schema para download em lote (ZIP): lista de URLs ou uma playlist"""
+    urls: List[HttpUrl] = Field(default_factory=list, max_length=settings.BATCH_MAX_URLS)
+    playlist_url: Optional[HttpUrl] = None
+    format: AudioFormat = "mp3"
+    
+    @model_validator(mode="after")
+    def check_source(self) -> "BatchDownloadRequest":
+        if bool(self.urls) == (self.playlist_url is not None):
+            raise ValueError("Informe urls ou playlist_url (apenas um)")
+        return self
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "urls": [
+                    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+                    "https://youtu.be/9bZkp7q19f0"
+                ],
+                "format": "mp3"
+            }
+        }
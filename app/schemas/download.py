@@ -1,6 +1,7 @@
-from typing import Optional, List
-from pydantic import BaseModel, HttpUrl, computed_field
-from app.utils.helpers import format_duration, format_filesize
+from typing import Optional, List, Literal
+from pydantic import BaseModel, Field, HttpUrl, computed_field, model_validator
+from app.config import settings
+from app.utils.helpers import ClipRange, clip_range, format_duration, format_filesize
 
 class FormatInfo(BaseModel):
     """Informações de um formato específico"""
@@ -8,15 +9,26 @@ class FormatInfo(BaseModel):
     ext: str
     height: Optional[float] = None
     width: Optional[float] = None
-    filesize: Optional[float] = None
+    filesize: Optional[float] = None  # Exato ou estimado pelo bitrate
     fps: Optional[float] = None
+    vcodec: Optional[str] = None
+    acodec: Optional[str] = None
+    abr: Optional[float] = None
+    
+    @computed_field
+    @property
+    def audio_only(self) -> bool:
+        """Formato só de áudio (sem vídeo)"""
+        return self.vcodec == 'none'
     
     @computed_field
     @property
     def quality_label(self) -> str:
-        """Retorna um nome amigável para o formato (ex: '720p')"""
+        """Retorna um nome amigável para o formato (ex: '720p', '128kbps')"""
         if self.height:
             return f"{int(self.height)}p"
+        if self.audio_only and self.abr:
+            return f"{round(self.abr)}kbps"
         return "Unknown"
     
     @computed_field
@@ -41,22 +53,98 @@ class VideoMetadata(BaseModel):
     formats: List[FormatInfo]
 
 
-class DownloadRequest(BaseModel):
+class BulkFormatsRequest(BaseModel):
+    """Schema para consulta de formatos de vários vídeos de uma vez"""
+    urls: List[str] = Field(..., min_length=1, max_length=settings.FORMATS_BULK_MAX_URLS)
+    stream: bool = False  # NDJSON: uma linha por vídeo, assim que cada um termina
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "urls": [
+                    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+                    "https://youtu.be/9bZkp7q19f0"
+                ],
+                "stream": False
+            }
+        }
+
+
+class BulkFormatsItem(BaseModel):
+    """Resultado de um vídeo da consulta em massa (metadados ou erro)"""
+    index: int  # Posição da URL no pedido
+    url: str
+    metadata: Optional[VideoMetadata] = None
+    error: Optional[str] = None
+
+
+class BulkFormatsResponse(BaseModel):
+    """Resultados da consulta em massa, na ordem das URLs pedidas"""
+    results: List[BulkFormatsItem]
+
+
+# mp3 é convertido pelo FFmpeg; m4a e opus são o stream original do YouTube
+AudioFormat = Literal["mp3", "m4a", "opus"]
+
+
+class ClipFields(BaseModel):
+    """Trecho opcional do vídeo, em segundos (start/end ausentes = vídeo inteiro)"""
+    start: Optional[float] = Field(None, ge=0)
+    end: Optional[float] = Field(None, gt=0)
+    
+    @model_validator(mode="after")
+    def check_clip(self) -> "ClipFields":
+        if self.end is not None and self.end <= (self.start or 0):
+            raise ValueError("end deve ser maior que start")
+        return self
+    
+    @property
+    def clip(self) -> Optional[ClipRange]:
+        return clip_range(self.start, self.end)
+
+
+class DownloadRequest(ClipFields):
     """Schema para requisição de download"""
     url: HttpUrl
+    stream: bool = False  # Enviar o MP3 enquanto é convertido (pipeline)
+    format: AudioFormat = "mp3"
     
     class Config:
         json_schema_extra = {
             "example": {
-                "url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+                "url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+                "stream": False,
+                "format": "mp3"
             }
         }
 
 
-class DownloadRequestWithFormat(BaseModel):
+class FormatSelector(BaseModel):
+    """
+    Regra para o servidor escolher o formato (em vez de um format_id fixo).
+    
+    Exemplos: menor áudio com pelo menos 128 kbps
+    ({"kind": "audio", "min_abr": 128, "prefer": "smallest"}) ou melhor vídeo
+    com até 50 MB ({"kind": "video", "max_filesize": 52428800}).
+    """
+    kind: Literal["audio", "video"]
+    prefer: Literal["best", "smallest"] = "best"
+    min_abr: Optional[float] = Field(None, gt=0)  # kbps
+    max_height: Optional[int] = Field(None, gt=0)
+    max_filesize: Optional[int] = Field(None, gt=0)  # bytes
+
+
+class DownloadRequestWithFormat(ClipFields):
     """Schema para requisição de download com seleção de formato"""
     url: HttpUrl
-    format_id: str
+    format_id: Optional[str] = None
+    select: Optional[FormatSelector] = None
+    
+    @model_validator(mode="after")
+    def check_format_choice(self) -> "DownloadRequestWithFormat":
+        if (self.format_id is None) == (self.select is None):
+            raise ValueError("Informe format_id ou select (apenas um)")
+        return self
     
     class Config:
         json_schema_extra = {
@@ -0,0 +1,29 @@
+from typing import Optional
+from pydantic import BaseModel, HttpUrl
+
+
+class JobCreateRequest(BaseModel):
+    """Schema para criação de um job de download"""
+    url: HttpUrl
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+            }
+        }
+
+
+class JobStatus(BaseModel):
+    """Estado e progresso de um job de download"""
+    id: str
+    url: str
+    state: str  # queued | downloading | converting | done | error
+    downloaded_bytes: Optional[int] = None
+    total_bytes: Optional[int] = None
+    percent: Optional[float] = None
+    speed: Optional[float] = None
+    eta: Optional[int] = None
+    error: Optional[str] = None
+    filename: Optional[str] = None
+    file_url: Optional[str] = None
@@ -0,0 +1,150 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional, Union
+from starlette.concurrency import iterate_in_threadpool
+from app.config import settings
+
+
+class OverloadedError(Exception):
+    """Servidor sem capacidade: o cliente deve tentar de novo após retry_after segundos"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Servidor ocupado, tente novamente em {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """Vaga obtida no AdmissionController; deve ser liberada ao fim do trabalho"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        """Libera a vaga (seguro chamar mais de uma vez)"""
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(time.monotonic() - self._started_at)
+
+
+class AdmissionController:
+    """
+    Limita trabalhos pesados simultâneos (download/conversão/stream).
+
+    Até max_in_flight trabalhos rodam ao mesmo tempo; os seguintes esperam
+    em uma fila FIFO limitada por até queue_timeout segundos. Com a fila
+    cheia (ou o prazo estourado) o pedido é recusado na hora com
+    OverloadedError, cujo retry_after é estimado pela duração dos últimos
+    trabalhos e pelo tamanho da fila.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._durations: Deque[float] = deque(maxlen=50)
+
+    @property
+    def queued(self) -> int:
+        """Pedidos aguardando vaga"""
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    async def acquire(self) -> AdmissionTicket:
+        """
+        Obtém uma vaga, esperando na fila se necessário.
+
+        Raises:
+            OverloadedError: Se a fila estiver cheia ou o prazo de espera acabar
+        """
+        if self.in_flight < self.max_in_flight and self.queued == 0:
+            self.in_flight += 1
+            self.admitted += 1
+            return AdmissionTicket(self)
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise OverloadedError(self.retry_after())
+
+        loop = asyncio.get_event_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                self.rejected += 1
+                raise OverloadedError(self.retry_after())
+        except asyncio.CancelledError:
+            # Vaga pode ter sido entregue no mesmo instante do cancelamento
+            if waiter.done() and not waiter.cancelled():
+                self._release(None)
+            else:
+                waiter.cancel()
+            raise
+
+        self.admitted += 1
+        return AdmissionTicket(self)
+
+    def retry_after(self) -> int:
+        """Estimativa (em segundos) de quando haverá vaga"""
+        if not self._durations:
+            return settings.DEFAULT_RETRY_AFTER_SECONDS
+        average = sum(self._durations) / len(self._durations)
+        rounds = (self.queued + 1) / max(self.max_in_flight, 1)
+        return max(1, math.ceil(average * rounds))
+
+    def stats(self) -> Dict[str, Any]:
+        """Ocupação e contadores para monitoramento"""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "retry_after": self.retry_after(),
+        }
+
+    def _release(self, duration: Optional[float]) -> None:
+        if duration is not None:
+            self._durations.append(duration)
+
+        # Passa a vaga direto para o próximo da fila (sem decrementar in_flight)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+async def release_when_done(
+    chunks: Union[AsyncIterator[bytes], Iterator[bytes]],
+    ticket: AdmissionTicket
+) -> AsyncIterator[bytes]:
+    """Repassa um stream e libera a vaga quando ele terminar ou for interrompido"""
+    if not hasattr(chunks, '__aiter__'):
+        # Iteradores síncronos rodam no threadpool, como faz o StreamingResponse
+        chunks = iterate_in_threadpool(chunks)
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        ticket.release()
+
+
+# Controle de admissão compartilhado por /api/download e /api/download-stream
+download_admission = AdmissionController(
+    max_in_flight=settings.MAX_IN_FLIGHT_DOWNLOADS,
+    max_queue=settings.MAX_QUEUED_DOWNLOADS,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+)
@@ -0,0 +1,129 @@
+import asyncio
+import io
+import zipfile
+from pathlib import Path
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+from app.config import settings
+from app.services.admission import download_admission
+from app.services.cache import pin_cached_file
+from app.services.youtube import audio_requires_work, download_youtube_audio
+
+# Nome, no ZIP, da lista de vídeos que falharam (só existe se algum falhar)
+ERRORS_FILENAME = "erros.txt"
+
+# (posição no lote, URL, arquivo pronto, libera a fixação, erro)
+BatchResult = Tuple[int, str, Optional[Path], Optional[Callable[[], None]], Optional[str]]
+
+
+class _ZipSink(io.RawIOBase):
+    """
+    Destino do zipfile que só acumula os bytes escritos até o próximo drain().
+
+    Não é "seekable": o zipfile grava tamanho e CRC de cada arquivo depois
+    dos dados (data descriptor), então nada precisa ser reescrito e o ZIP
+    pode ir para a resposta aos pedaços.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_batch_zip(
+    urls: List[str],
+    batch_id: str,
+    audio_format: str = "mp3",
+    chunk_size: int = 1024 * 64
+) -> AsyncIterator[bytes]:
+    """
+    Baixa os vídeos do lote em paralelo e entrega um ZIP (sem compressão)
+    montado enquanto as faixas ficam prontas.
+
+    Até BATCH_PARALLELISM downloads do lote rodam ao mesmo tempo, cada um
+    pelo controle de admissão como um pedido avulso; o cache e a
+    deduplicação valem como em /api/download. Cada faixa entra no ZIP assim
+    que termina (na ordem de conclusão, com a posição no lote no nome), lida
+    do cache em chunks: nem o ZIP nem as faixas são montados em memória ou
+    em pasta temporária. Falhas não interrompem o lote e são listadas em
+    ERRORS_FILENAME ao final. Se o cliente desconectar, os downloads
+    pendentes são cancelados.
+
+    Args:
+        urls: URLs dos vídeos, na ordem do lote
+        batch_id: ID único do lote (usado em logs e pastas temporárias)
+        audio_format: mp3, m4a ou opus
+        chunk_size: Tamanho da leitura de cada faixa
+
+    Yields:
+        Pedaços do arquivo ZIP
+    """
+    semaphore = asyncio.Semaphore(settings.BATCH_PARALLELISM)
+    results: "asyncio.Queue[BatchResult]" = asyncio.Queue()
+    width = len(str(len(urls)))
+
+    async def fetch(index: int, url: str) -> None:
+        async with semaphore:
+            ticket = None
+            try:
+                if audio_requires_work(url, audio_format):
+                    ticket = await download_admission.acquire()
+                path = await download_youtube_audio(url, f"{batch_id}-{index + 1}", audio_format=audio_format)
+                # Fixada até entrar no ZIP: a limpeza não a remove enquanto espera
+                await results.put((index, url, path, pin_cached_file(path), None))
+            except Exception as e:
+                print(f"[batch {batch_id}] Erro em {url}: {str(e)}")
+                await results.put((index, url, None, None, str(e)))
+            finally:
+                if ticket:
+                    ticket.release()
+
+    tasks = [asyncio.ensure_future(fetch(index, url)) for index, url in enumerate(urls)]
+    sink = _ZipSink()
+    errors: List[str] = []
+    try:
+        with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+            for _ in range(len(tasks)):
+                index, url, path, unpin, error = await results.get()
+                if error is not None:
+                    errors.append(f"{index + 1}. {url}: {error}")
+                    continue
+                try:
+                    arcname = f"{index + 1:0{width}d}_{path.name}"
+                    info = zipfile.ZipInfo.from_file(path, arcname)
+                    # Leituras de 64KB vêm do page cache; não compensa uma thread por chunk
+                    with open(path, 'rb') as source, archive.open(info, 'w') as target:
+                        while True:
+                            chunk = source.read(chunk_size)
+                            if not chunk:
+                                break
+                            target.write(chunk)
+                            yield sink.drain()
+                    yield sink.drain()
+                finally:
+                    unpin()
+
+            if errors:
+                archive.writestr(ERRORS_FILENAME, "\n".join(errors) + "\n")
+        # Diretório central, escrito ao fechar o ZIP
+        yield sink.drain()
+        print(f"[batch {batch_id}] Concluído: {len(urls) - len(errors)} de {len(urls)} faixas")
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Faixas prontas que não chegaram a entrar no ZIP (cliente desconectou)
+        while not results.empty():
+            _, _, _, unpin, _ = results.get_nowait()
+            if unpin:
+                unpin()
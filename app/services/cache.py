@@ -0,0 +1,111 @@
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, Optional
+from app.config import settings
+from app.services.cache_index import cache_index
+from app.services.cleanup import cleanup_leader_held, request_cleanup
+
+
+def get_cache_dir(cache_key: str) -> Path:
+    """Retorna a pasta definitiva de uma entrada do cache"""
+    return settings.TEMP_DIR / cache_key
+
+
+def lookup_cached_audio(cache_key: str, ext: str = "mp3") -> Optional[Path]:
+    """
+    Procura um áudio já convertido no cache.
+
+    Em caso de acerto, a entrada vai para o fim da fila LRU do índice e o
+    mtime da pasta é renovado, para que a limpeza (por orçamento ou por
+    tempo sem acesso) não remova arquivos que continuam sendo pedidos.
+
+    Args:
+        cache_key: Chave gerada por build_cache_key
+        ext: Extensão do arquivo esperado
+
+    Returns:
+        Path do arquivo em cache, ou None se não existir
+    """
+    cache_dir = get_cache_dir(cache_key)
+    if not cache_dir.is_dir():
+        return None
+
+    files = list(cache_dir.glob(f"*.{ext}"))
+    if not files:
+        return None
+
+    try:
+        os.utime(cache_dir)
+    except OSError:
+        # Pasta removida pela limpeza entre o glob e o utime
+        return None
+    cache_index.touch(cache_key)
+
+    return files[0]
+
+
+def create_staging_dir(cache_key: str, session_id: str) -> Path:
+    """
+    Cria uma pasta temporária onde o download é feito antes de ser publicado.
+
+    O sufixo .part impede que um arquivo incompleto seja servido como acerto.
+    A pasta fica fixada no índice (não é removida pela limpeza) até o
+    commit ou o descarte.
+    """
+    staging_dir = settings.TEMP_DIR / f"{cache_key}.{session_id}.part"
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    cache_index.pin(staging_dir.name)
+    return staging_dir
+
+
+def commit_staging_dir(staging_dir: Path, cache_key: str) -> Path:
+    """
+    Publica a pasta temporária como entrada definitiva do cache.
+
+    O rename é atômico; se outro request publicou a mesma chave antes,
+    a pasta temporária é descartada e a entrada existente é mantida.
+
+    Returns:
+        Path da pasta definitiva do cache
+    """
+    cache_dir = get_cache_dir(cache_key)
+    try:
+        os.rename(staging_dir, cache_dir)
+    except OSError:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    cache_index.remove(staging_dir.name)
+    cache_index.add(cache_key)
+    
+    # Não esperar a próxima limpeza periódica para voltar ao orçamento; só
+    # o líder remove, então os outros workers nem agendam
+    if cache_index.over_budget() and cleanup_leader_held():
+        request_cleanup()
+    return cache_dir
+
+
+def discard_staging_dir(staging_dir: Path) -> None:
+    """Remove uma pasta temporária de download que falhou"""
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    cache_index.remove(staging_dir.name)
+
+
+def cache_entry_name(path: Path) -> str:
+    """Nome da pasta de TEMP_DIR que contém path (chave no índice do cache)"""
+    return Path(path).relative_to(settings.TEMP_DIR).parts[0]
+
+
+def pin_cached_file(path: Path) -> Callable[[], None]:
+    """
+    Fixa a entrada que contém path enquanto ela é servida.
+    
+    Returns:
+        Função que libera a fixação (chamar ao fim da resposta)
+    """
+    try:
+        name = cache_entry_name(path)
+    except ValueError:
+        # Fora do TEMP_DIR: não é gerenciado pela limpeza
+        return lambda: None
+    cache_index.pin(name)
+    return lambda: cache_index.unpin(name)
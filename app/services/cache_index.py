@@ -0,0 +1,382 @@
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.manifest import CacheManifest
+from app.services.registry import shared_registry
+
+# Pastas .part/.stream sem escrita há mais que isso são restos de um processo que morreu
+PARTIAL_GRACE_SECONDS = 120
+
+
+class CacheEntry:
+    """Pasta de TEMP_DIR acompanhada pelo índice (entrada do cache ou download)"""
+
+    __slots__ = ("name", "size", "last_access", "persistent")
+
+    def __init__(self, name: str, size: int, last_access: float, persistent: bool = False):
+        self.name = name
+        self.size = size
+        self.last_access = last_access
+        # Entradas publicadas no cache ficam no manifesto e sobrevivem a reinícios
+        self.persistent = persistent
+
+
+class CacheIndex:
+    """
+    Índice em memória das pastas de TEMP_DIR, em ordem de último acesso (LRU).
+
+    Substitui a varredura completa do diretório a cada limpeza: a remoção
+    percorre só o início da fila (as entradas mais antigas) até que não haja
+    entradas expiradas (sem acesso há mais de ttl_seconds) e o total em disco
+    caiba em max_bytes. Entradas fixadas (sendo gravadas ou servidas) nunca
+    são removidas.
+
+    O índice é carregado uma única vez por worker, na inicialização (load)
+    ou quando settings.TEMP_DIR muda, a partir do manifesto persistido
+    (CacheManifest) e de uma listagem do diretório; depois é mantido pelas
+    operações do cache. _lock protege só o estado em memória: leituras do
+    sqlite e varreduras do disco são feitas sem ele, e as escritas no
+    manifesto vão para a thread de escrita dele.
+    Com vários workers, o manifesto e as fixações são compartilhados: o líder
+    da limpeza incorpora as entradas dos outros com reload() antes de remover.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.total_bytes = 0
+        self.evicted = 0
+        self._root: Optional[Path] = None
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._manifest: Optional[CacheManifest] = None
+        # Últimos acessos ainda não gravados no manifesto (gravados em lote)
+        self._dirty: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # Serializa carga e fechamento (I/O feito sem segurar _lock)
+        self._load_lock = threading.Lock()
+
+    def add(self, name: str) -> None:
+        """Registra uma entrada publicada no cache como recém-acessada"""
+        self._ensure_root()
+        size = _dir_size(self._root / name)
+        with self._lock:
+            entry = self._put(name, size, time.time(), persistent=True)
+            if self._manifest:
+                self._manifest.upsert(name, entry.size, entry.last_access)
+                self._dirty.pop(name, None)
+
+    def touch(self, name: str) -> None:
+        """Marca um acesso à entrada (move para o fim da fila LRU)"""
+        self._ensure_root()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry.last_access = time.time()
+                self._entries.move_to_end(name)
+                if entry.persistent:
+                    self._dirty[name] = entry.last_access
+                return
+        # Criada por outro processo: passa a ser acompanhada aqui
+        size = _dir_size(self._root / name)
+        with self._lock:
+            entry = self._put(name, size, time.time(), persistent=True)
+            if self._manifest:
+                self._manifest.upsert(name, entry.size, entry.last_access)
+
+    def remove(self, name: str) -> None:
+        """Esquece uma entrada (a pasta já foi removida ou renomeada)"""
+        self._ensure_root()
+        with self._lock:
+            entry = self._drop(name)
+            pins = self._pins.pop(name, 0)
+            if entry is not None and entry.persistent and self._manifest:
+                self._manifest.delete([name])
+        # Fixações ainda abertas (ex: pasta .part de create_staging_dir) também saem do registro
+        for _ in range(pins):
+            shared_registry.unpin(name)
+
+    def pin(self, name: str) -> None:
+        """Impede a remoção da entrada enquanto ela é gravada ou servida"""
+        self._ensure_root()
+        with self._lock:
+            self._pins[name] = self._pins.get(name, 0) + 1
+            if name not in self._entries:
+                self._put(name, 0, time.time())
+        shared_registry.pin(name)
+
+    def unpin(self, name: str) -> None:
+        """Libera uma fixação feita por pin() e atualiza o tamanho da entrada"""
+        self._ensure_root()
+        size = _dir_size(self._root / name)
+        with self._lock:
+            count = self._pins.get(name, 0) - 1
+            if count > 0:
+                self._pins[name] = count
+            else:
+                self._pins.pop(name, None)
+            entry = self._entries.get(name)
+            if entry is not None:
+                # Mantém a posição na fila: só o tamanho muda
+                self.total_bytes += size - entry.size
+                entry.size = size
+        shared_registry.unpin(name)
+
+    def over_budget(self) -> bool:
+        """Indica se o total em disco passou de max_bytes"""
+        self._ensure_root()
+        with self._lock:
+            return self.total_bytes > self.max_bytes
+
+    def evict(self) -> List[str]:
+        """
+        Remove entradas expiradas e, se preciso, as menos usadas até caber no orçamento.
+
+        Returns:
+            Nomes das pastas removidas
+        """
+        self._ensure_root()
+        pinned_elsewhere = shared_registry.pinned_by_others()
+        with self._lock:
+            root = self._root
+            limit = time.time() - self.ttl_seconds
+            victims: List[str] = []
+            remaining = self.total_bytes
+            for entry in list(self._entries.values()):
+                if entry.last_access >= limit and remaining <= self.max_bytes:
+                    break
+                if self._pins.get(entry.name) or entry.name in pinned_elsewhere:
+                    continue
+                victims.append(entry.name)
+                remaining -= entry.size
+                self._drop(entry.name)
+            self.evicted += len(victims)
+            if victims and self._manifest:
+                self._manifest.delete(victims)
+
+        # Remoção do disco fora do lock: o índice já não aponta para as vítimas
+        for name in victims:
+            shutil.rmtree(root / name, ignore_errors=True)
+        return victims
+
+    def load(self) -> None:
+        """
+        Carrega o índice do TEMP_DIR atual, se ainda não foi carregado.
+
+        Chamado na inicialização de cada worker, antes de atender requests:
+        a listagem do diretório e a leitura do manifesto não passam pelo
+        event loop. Se TEMP_DIR mudar depois (testes), a primeira operação
+        seguinte recarrega.
+        """
+        with self._load_lock:
+            root = settings.TEMP_DIR
+            if root == self._root:
+                return
+            manifest, entries, total = self._scan(root)
+            with self._lock:
+                previous = self._manifest
+                self._root = root
+                self._manifest = manifest
+                self._entries = entries
+                self._pins.clear()
+                self._dirty.clear()
+                self.total_bytes = total
+        if previous:
+            previous.close()
+
+    def reload(self) -> None:
+        """
+        Incorpora ao índice as entradas e acessos gravados no manifesto por
+        outros workers (o manifesto é compartilhado; o índice não).
+        """
+        self._ensure_root()
+        with self._lock:
+            manifest = self._manifest
+            self._flush()
+        if not manifest:
+            return
+        # Leitura do sqlite sem o lock: o event loop segue usando o índice
+        known = manifest.load()
+        with self._lock:
+            if manifest is not self._manifest:
+                return
+            changed = False
+            for name, (size, last_access) in known.items():
+                entry = self._entries.get(name)
+                if entry is None:
+                    if (self._root / name).is_dir():
+                        self._put(name, size, last_access, persistent=True)
+                        changed = True
+                elif last_access > entry.last_access:
+                    entry.last_access = last_access
+                    changed = True
+            if changed:
+                ordered = sorted(self._entries.values(), key=lambda e: e.last_access)
+                self._entries = OrderedDict((entry.name, entry) for entry in ordered)
+
+    def flush(self) -> None:
+        """Grava no manifesto os últimos acessos acumulados e espera a gravação"""
+        with self._lock:
+            manifest = self._manifest
+            self._flush()
+        if manifest:
+            manifest.flush()
+
+    def close(self) -> None:
+        """Grava os acessos pendentes e fecha o manifesto (desligamento)"""
+        with self._load_lock:
+            with self._lock:
+                self._flush()
+                manifest = self._detach_manifest()
+        if manifest:
+            manifest.close()
+
+    def clear(self) -> None:
+        """Esquece tudo (ex: antes de apagar TEMP_DIR inteiro)"""
+        with self._load_lock:
+            with self._lock:
+                manifest = self._detach_manifest()
+                self._entries.clear()
+                self._pins.clear()
+                self._dirty.clear()
+                self.total_bytes = 0
+        if manifest:
+            manifest.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Ocupação do cache em disco para monitoramento"""
+        self._ensure_root()
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "pinned": len(self._pins),
+                "evicted": self.evicted,
+            }
+
+    def _ensure_root(self) -> None:
+        if settings.TEMP_DIR != self._root:
+            self.load()
+
+    def _scan(self, root: Path) -> Tuple[Optional[CacheManifest], "OrderedDict[str, CacheEntry]", int]:
+        """
+        Monta o índice a partir do manifesto e de uma listagem do diretório.
+
+        Entradas do manifesto cujo tamanho em disco não confere (ou cuja pasta
+        sumiu) são descartadas, assim como pastas .part/.stream abandonadas.
+        Outras pastas fora do manifesto entram com o mtime como último acesso.
+
+        Returns:
+            (manifesto aberto, entradas em ordem LRU, total em bytes)
+        """
+        entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        if not root.is_dir():
+            return None, entries, 0
+
+        manifest: Optional[CacheManifest] = None
+        known: Dict[str, Any] = {}
+        if settings.CACHE_PERSIST:
+            manifest = CacheManifest(root / settings.CACHE_MANIFEST_FILENAME)
+            known = manifest.load()
+
+        found: List[CacheEntry] = []
+        dropped: List[str] = []
+        with os.scandir(root) as it:
+            for item in it:
+                # Pastas internas (ex: .locks) não são entradas de vídeo
+                if item.name.startswith('.') or not item.is_dir(follow_symlinks=False):
+                    continue
+                path = Path(item.path)
+                if item.name in known:
+                    size, last_access = known.pop(item.name)
+                    if size > 0 and _dir_size(path) == size:
+                        found.append(CacheEntry(item.name, size, last_access, persistent=True))
+                    else:
+                        dropped.append(item.name)
+                elif item.name.endswith(('.part', '.stream')) and _is_abandoned(path):
+                    dropped.append(item.name)
+                else:
+                    try:
+                        mtime = item.stat().st_mtime
+                    except OSError:
+                        continue
+                    found.append(CacheEntry(item.name, _dir_size(path), mtime))
+
+        for name in dropped:
+            print(f"[CACHE] Entrada incompleta ou corrompida descartada: {name}")
+            shutil.rmtree(root / name, ignore_errors=True)
+        if manifest and (dropped or known):
+            # known agora só tem entradas cuja pasta não existe mais
+            manifest.delete([*dropped, *known])
+
+        total = 0
+        for entry in sorted(found, key=lambda e: e.last_access):
+            entries[entry.name] = entry
+            total += entry.size
+        return manifest, entries, total
+
+    def _flush(self) -> None:
+        if self._dirty and self._manifest:
+            self._manifest.update_access(self._dirty.items())
+        self._dirty.clear()
+
+    def _detach_manifest(self) -> Optional[CacheManifest]:
+        """Desliga o manifesto do índice; quem chama fecha fora do lock"""
+        manifest, self._manifest = self._manifest, None
+        self._root = None
+        return manifest
+
+    def _put(self, name: str, size: int, last_access: float, persistent: bool = False) -> CacheEntry:
+        self._drop(name)
+        entry = CacheEntry(name, size, last_access, persistent)
+        self._entries[name] = entry
+        self.total_bytes += size
+        return entry
+
+    def _drop(self, name: str) -> Optional[CacheEntry]:
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+            self._dirty.pop(name, None)
+        return entry
+
+
+def _is_abandoned(path: Path) -> bool:
+    """Indica se nada foi escrito na pasta (nem nos arquivos dela) recentemente"""
+    limit = time.time() - PARTIAL_GRACE_SECONDS
+    try:
+        if path.stat().st_mtime > limit:
+            return False
+        with os.scandir(path) as it:
+            return all(item.stat().st_mtime <= limit for item in it)
+    except OSError:
+        return True
+
+
+def _dir_size(path: Path) -> int:
+    """Soma o tamanho dos arquivos de uma pasta de entrada (não recursivo)"""
+    total = 0
+    try:
+        with os.scandir(path) as it:
+            for item in it:
+                try:
+                    if item.is_file(follow_symlinks=False):
+                        total += item.stat().st_size
+                except OSError:
+                    continue
+    except OSError:
+        return 0
+    return total
+
+
+# Índice compartilhado pelo cache, pela limpeza periódica e pelas rotas
+cache_index = CacheIndex(
+    max_bytes=settings.CACHE_MAX_BYTES,
+    ttl_seconds=settings.FILE_TTL_SECONDS
+)
@@ -1,35 +1,104 @@
+import os
 import shutil
-from pathlib import Path
-from datetime import datetime
+import threading
+import time
+from typing import Optional
 from app.config import settings
+from app.core.locks import FileLock
+from app.services.cache_index import cache_index
+from app.services.registry import shared_registry
+
+# Lock mantido enquanto este worker for o líder da limpeza
+_leader_lock: Optional[FileLock] = None
+
+# Ocupado enquanto uma limpeza pedida por request_cleanup está rodando
+_cleanup_running = threading.Lock()
+
+def is_cleanup_leader() -> bool:
+    """
+    Tenta se tornar (ou confirma que é) o líder da limpeza entre os workers.
+    
+    O líder mantém um flock em TEMP_DIR/.locks durante toda a vida do
+    processo; se ele morrer, o lock é liberado e outro worker assume na
+    próxima rodada do scheduler.
+    """
+    global _leader_lock
+    path = settings.TEMP_DIR / settings.LOCKS_DIRNAME / settings.CLEANUP_LEADER_LOCK
+    if _leader_lock is None or _leader_lock.path != path:
+        if _leader_lock is not None:
+            _leader_lock.release()
+        _leader_lock = FileLock(path)
+    if _leader_lock.held:
+        return True
+    if not _leader_lock.try_acquire():
+        return False
+    print(f"[CLEANUP] Worker {os.getpid()} assumiu a limpeza (líder)")
+    return True
+
+def cleanup_leader_held() -> bool:
+    """Indica, sem tentar obter o lock, se este worker é o líder"""
+    return _leader_lock is not None and _leader_lock.held
 
 def cleanup_old_files() -> None:
-    """Remove arquivos e pastas temporárias com mais de X minutos"""
+    """
+    Remove pastas sem acesso há mais de FILE_TTL_SECONDS e, se o TEMP_DIR
+    passar de CACHE_MAX_BYTES, as menos usadas (LRU) até caber no orçamento.
+    
+    Usa o índice em memória (sem varrer o diretório); pastas sendo gravadas
+    ou servidas (em qualquer worker) nunca são removidas. Só o líder da
+    limpeza executa; nos outros workers a chamada apenas grava os acessos.
+    """
     if not settings.TEMP_DIR.exists():
         return
     
-    current_time = datetime.now().timestamp()
-    deleted_count = 0
-    
-    # Deletar pastas antigas (cada pasta contém um vídeo)
-    for folder in settings.TEMP_DIR.iterdir():
-        if folder.is_dir():
-            folder_age = current_time - folder.stat().st_mtime
-            if folder_age > settings.FILE_TTL_SECONDS:
-                try:
-                    shutil.rmtree(folder)
-                    deleted_count += 1
-                    print(f"[CLEANUP] Pasta deletada: {folder.name}")
-                except Exception as e:
-                    print(f"[CLEANUP] Erro ao deletar pasta {folder.name}: {str(e)}")
-    
-    if deleted_count > 0:
-        print(f"[CLEANUP] Total de pastas limpas: {deleted_count}")
+    # Últimos acessos vão para o manifesto em lote, não a cada acerto
+    cache_index.flush()
+    if not is_cleanup_leader():
+        return
+    
+    # Entradas publicadas e acessadas pelos outros workers
+    cache_index.reload()
+    deleted = cache_index.evict()
+    shared_registry.purge_dead()
+    shared_registry.prune_jobs(time.time() - settings.JOB_TTL_SECONDS)
+    for name in deleted:
+        print(f"[CLEANUP] Pasta deletada: {name}")
+    
+    if deleted:
+        print(f"[CLEANUP] Total de pastas limpas: {len(deleted)}")
+
+def request_cleanup() -> None:
+    """
+    Agenda cleanup_old_files em uma thread, sem bloquear o event loop.
+    
+    Pedidos feitos enquanto uma limpeza já está rodando são descartados:
+    ela já vai devolver o cache ao orçamento.
+    """
+    if not _cleanup_running.acquire(blocking=False):
+        return
+    
+    def run() -> None:
+        try:
+            cleanup_old_files()
+        except Exception as e:
+            print(f"[CLEANUP] Erro na limpeza agendada: {str(e)}")
+        finally:
+            _cleanup_running.release()
+    
+    threading.Thread(target=run, name="cache-cleanup", daemon=True).start()
 
 def cleanup_all_temp_files() -> None:
     """Remove todos os arquivos temporários"""
+    global _leader_lock
     if settings.TEMP_DIR.exists():
         try:
+            # O arquivo de lock também será apagado: liderança recomeça do zero
+            if _leader_lock is not None:
+                _leader_lock.release()
+                _leader_lock = None
+            # Fecha os bancos sqlite antes de apagá-los junto com o diretório
+            cache_index.clear()
+            shared_registry.close()
             shutil.rmtree(settings.TEMP_DIR)
             settings.TEMP_DIR.mkdir(exist_ok=True)
             print("[CLEANUP] Todos os arquivos temporários foram removidos")
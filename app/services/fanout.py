@@ -0,0 +1,159 @@
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class GrowingFile:
+    """
+    Arquivo escrito por um produtor e lido, ao mesmo tempo, por vários clientes.
+
+    Cada leitor começa do byte 0, lê o que já foi gravado e depois segue os
+    novos bytes (estilo tail -f) até o produtor terminar. As leituras usam um
+    descritor aberto na criação, então renomear ou apagar o arquivo no meio
+    do caminho (publicação no cache, limpeza) não afeta quem já está lendo.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.size = 0
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.readers = 0
+        self._writer = open(path, 'wb', buffering=0)
+        self._reader = open(path, 'rb')
+        self._changed = asyncio.Event()
+
+    def append(self, chunk: bytes) -> None:
+        """Grava um chunk e acorda os leitores"""
+        self._writer.write(chunk)
+        self.size += len(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Marca o fim da escrita (com sucesso ou erro)"""
+        if not self._writer.closed:
+            self._writer.close()
+        self.done = True
+        self.error = error
+        self._notify()
+        self._close_if_unused()
+
+    def detach(self) -> None:
+        """Descontabiliza um leitor (fecha o arquivo se ninguém mais usa)"""
+        self.readers -= 1
+        self._close_if_unused()
+
+    async def follow(self, chunk_size: int = 1024 * 64) -> AsyncIterator[bytes]:
+        """
+        Entrega o conteúdo desde o início, acompanhando o crescimento.
+
+        Deve ser obtido via FanOut.subscribe, que contabiliza o leitor.
+        """
+        position = 0
+        while True:
+            if position < self.size:
+                # Sem await entre seek e read: leitores não se atrapalham
+                self._reader.seek(position)
+                chunk = self._reader.read(min(chunk_size, self.size - position))
+                position += len(chunk)
+                yield chunk
+            elif self.done:
+                if self.error is not None:
+                    raise Exception(f"Produtor falhou: {self.error}")
+                return
+            else:
+                await self._changed.wait()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _close_if_unused(self) -> None:
+        if self.done and self.readers <= 0 and not self._reader.closed:
+            self._reader.close()
+
+
+class FanOut:
+    """
+    Registro de produções em andamento, indexado por chave.
+
+    O primeiro pedido de uma chave inicia o produtor em uma tarefa própria;
+    pedidos seguintes se anexam ao mesmo GrowingFile. Quando o último leitor
+    desiste antes do fim, o produtor é cancelado (mata yt-dlp/ffmpeg).
+    """
+
+    def __init__(self):
+        self._active: Dict[str, Tuple[GrowingFile, asyncio.Task]] = {}
+
+    def is_active(self, key: str) -> bool:
+        """Indica se há produção em andamento para a chave"""
+        return key in self._active
+
+    def active_count(self) -> int:
+        """Quantidade de produções em andamento"""
+        return len(self._active)
+
+    def subscribe(
+        self,
+        key: str,
+        path_factory: Callable[[], Path],
+        produce: Callable[[GrowingFile], Awaitable[None]],
+        chunk_size: int = 1024 * 64
+    ) -> AsyncIterator[bytes]:
+        """
+        Anexa um leitor à produção da chave, iniciando-a se necessário.
+
+        Args:
+            key: Chave da produção (ex: chave do cache)
+            path_factory: Cria o caminho do arquivo (chamado só para novas produções)
+            produce: Corrotina que grava no GrowingFile; ao retornar com sucesso,
+                o resultado é considerado completo
+            chunk_size: Tamanho máximo dos chunks entregues ao leitor
+
+        Returns:
+            Iterador assíncrono com os bytes da produção
+        """
+        entry = self._active.get(key)
+        if entry is None:
+            growing = GrowingFile(path_factory())
+            task = asyncio.ensure_future(self._run(key, growing, produce))
+            self._active[key] = (growing, task)
+        else:
+            growing, task = entry
+            print(f"[fanout] Novo leitor anexado a {key} ({growing.size} bytes já gravados)")
+
+        growing.readers += 1
+        return self._follow(growing, task, chunk_size)
+
+    async def _run(
+        self,
+        key: str,
+        growing: GrowingFile,
+        produce: Callable[[GrowingFile], Awaitable[None]]
+    ) -> None:
+        try:
+            await produce(growing)
+        except BaseException as e:
+            growing.finish(error=e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            growing.finish()
+        finally:
+            if self._active.get(key, (None,))[0] is growing:
+                del self._active[key]
+
+    async def _follow(
+        self,
+        growing: GrowingFile,
+        task: asyncio.Task,
+        chunk_size: int
+    ) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in growing.follow(chunk_size):
+                yield chunk
+        finally:
+            growing.detach()
+            if growing.readers <= 0 and not task.done():
+                print(f"[fanout] Sem leitores: cancelando produção de {growing.path.name}")
+                task.cancel()
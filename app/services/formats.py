@@ -0,0 +1,50 @@
+import math
+from typing import Any, Dict, List, Optional
+from app.schemas.download import FormatSelector
+
+
+def estimate_filesize(fmt: Dict[str, Any], duration: Optional[float]) -> Optional[float]:
+    """
+    Tamanho do formato em bytes: exato, aproximado pelo YouTube ou estimado
+    pelo bitrate total (tbr, em kbps) e pela duração.
+    """
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return size
+    tbr = fmt.get('tbr') or fmt.get('abr')
+    if tbr and duration:
+        return tbr * 1000 / 8 * duration
+    return None
+
+
+def select_format(formats: List[Dict[str, Any]], selector: FormatSelector) -> Optional[Dict[str, Any]]:
+    """
+    Escolhe, entre os formatos de extract_video_metadata, o que atende à regra.
+
+    Com limite de tamanho, formatos de tamanho desconhecido são ignorados.
+    'best' prefere maior resolução (vídeo) ou bitrate (áudio); 'smallest',
+    o menor arquivo (ou bitrate, se o tamanho não for conhecido).
+
+    Returns:
+        O formato escolhido, ou None se nenhum atender
+    """
+    candidates = []
+    for fmt in formats:
+        audio_only = fmt.get('vcodec') == 'none'
+        if audio_only != (selector.kind == "audio"):
+            continue
+        if selector.min_abr is not None and (fmt.get('abr') or 0) < selector.min_abr:
+            continue
+        if selector.max_height is not None and (fmt.get('height') or 0) > selector.max_height:
+            continue
+        if selector.max_filesize is not None:
+            size = fmt.get('filesize')
+            if size is None or size > selector.max_filesize:
+                continue
+        candidates.append(fmt)
+
+    if not candidates:
+        return None
+    if selector.prefer == "smallest":
+        return min(candidates, key=lambda f: (f.get('filesize') or math.inf, f.get('abr') or 0, f.get('height') or 0))
+    return max(candidates, key=lambda f: (f.get('height') or 0, f.get('abr') or 0, f.get('filesize') or 0))
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from app.config import settings
+from app.services.admission import download_admission, OverloadedError
+from app.services.registry import shared_registry
+from app.services.youtube import download_youtube_audio, audio_requires_work
+
+# Estados possíveis de um job
+JOB_QUEUED = "queued"
+JOB_DOWNLOADING = "downloading"
+JOB_CONVERTING = "converting"
+JOB_DONE = "done"
+JOB_ERROR = "error"
+
+FINAL_STATES = (JOB_DONE, JOB_ERROR)
+
+
+class Job:
+    """Download assíncrono de um MP3, acompanhado por polling ou SSE"""
+
+    def __init__(self, url: str):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.state = JOB_QUEUED
+        self.downloaded_bytes: Optional[int] = None
+        self.total_bytes: Optional[int] = None
+        self.percent: Optional[float] = None
+        self.speed: Optional[float] = None
+        self.eta: Optional[int] = None
+        self.error: Optional[str] = None
+        self.file_path: Optional[Path] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINAL_STATES
+
+    def update(self, **fields: Any) -> None:
+        """Atualiza campos e acorda quem acompanha o job (chamar no event loop)"""
+        if self.finished:
+            return
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.updated_at = time.time()
+        self.publish()
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self) -> None:
+        """Grava o estado no registro compartilhado (visível aos outros workers)"""
+        shared_registry.save_job(
+            self.id,
+            self.to_dict(),
+            str(self.file_path) if self.file_path else None
+        )
+
+    @classmethod
+    def from_shared(cls, data: Dict[str, Any], file_path: Optional[str], owner_alive: bool) -> "Job":
+        """Cópia somente leitura de um job executado por outro worker"""
+        job = cls(data["url"])
+        job.id = data["id"]
+        for name in ("state", "downloaded_bytes", "total_bytes", "percent", "speed", "eta", "error"):
+            setattr(job, name, data.get(name))
+        job.file_path = Path(file_path) if file_path else None
+        if not owner_alive and not job.finished:
+            job.state = JOB_ERROR
+            job.error = "Worker que executava o job foi encerrado; crie um novo job"
+        return job
+
+    async def wait_for_change(self, timeout: float) -> bool:
+        """Espera a próxima atualização; retorna False se o tempo acabar"""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Representação compatível com o schema JobStatus"""
+        return {
+            "id": self.id,
+            "url": self.url,
+            "state": self.state,
+            "downloaded_bytes": self.downloaded_bytes,
+            "total_bytes": self.total_bytes,
+            "percent": self.percent,
+            "speed": self.speed,
+            "eta": self.eta,
+            "error": self.error,
+            "filename": self.file_path.name if self.file_path else None,
+            "file_url": f"/api/jobs/{self.id}/file" if self.state == JOB_DONE else None,
+        }
+
+
+class JobManager:
+    """
+    Cria, executa e guarda jobs em memória (por worker).
+
+    O estado de cada job também é publicado no registro compartilhado, então
+    qualquer worker responde por GET /api/jobs/{id}, mesmo sem sticky sessions.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+
+    def create(self, url: str) -> Job:
+        """Cria o job e inicia o download em segundo plano"""
+        self._prune()
+        job = Job(url)
+        self._jobs[job.id] = job
+        job.publish()
+        job.task = asyncio.ensure_future(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Job deste worker ou, se não houver, a cópia publicada por outro worker"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        shared = shared_registry.load_job(job_id)
+        if shared is None:
+            return None
+        return Job.from_shared(*shared)
+
+    def active_count(self) -> int:
+        """Jobs ainda não finalizados"""
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    async def events(self, job: Job) -> AsyncIterator[str]:
+        """
+        Eventos SSE com o progresso do job até ele terminar.
+
+        Envia o estado atual de imediato, depois uma atualização por mudança
+        e comentários de keepalive para proxies não fecharem a conexão.
+        Jobs de outro worker são acompanhados pelo registro compartilhado.
+        """
+        while True:
+            event = "progress" if not job.finished else job.state
+            yield f"event: {event}\ndata: {json.dumps(job.to_dict())}\n\n"
+            if job.finished:
+                return
+            if job.id in self._jobs:
+                while not await job.wait_for_change(settings.JOB_SSE_KEEPALIVE_SECONDS):
+                    yield ": keepalive\n\n"
+                continue
+            
+            # Job de outro worker: acompanhar pelo registro compartilhado
+            waited = 0.0
+            while True:
+                await asyncio.sleep(settings.SHARED_STATE_POLL_SECONDS)
+                latest = self.get(job.id)
+                if latest is None:
+                    return
+                if latest.to_dict() != job.to_dict():
+                    job = latest
+                    break
+                waited += settings.SHARED_STATE_POLL_SECONDS
+                if waited >= settings.JOB_SSE_KEEPALIVE_SECONDS:
+                    waited = 0.0
+                    yield ": keepalive\n\n"
+
+    async def _run(self, job: Job) -> None:
+        loop = asyncio.get_event_loop()
+        ticket = None
+        try:
+            if audio_requires_work(job.url):
+                ticket = await download_admission.acquire()
+
+            job.update(state=JOB_DOWNLOADING)
+            file_path = await download_youtube_audio(
+                job.url,
+                job.id,
+                progress_hooks=[_progress_hook(loop, job)],
+                postprocessor_hooks=[_postprocessor_hook(loop, job)]
+            )
+            job.update(state=JOB_DONE, file_path=file_path, percent=100.0, eta=0)
+            print(f"[job {job.id}] Concluído: {file_path.name}")
+        except OverloadedError as e:
+            job.update(state=JOB_ERROR, error=str(e))
+        except Exception as e:
+            print(f"[job {job.id}] Erro: {str(e)}")
+            job.update(state=JOB_ERROR, error=str(e))
+        finally:
+            if ticket:
+                ticket.release()
+
+    def _prune(self) -> None:
+        """Esquece jobs finalizados há mais de JOB_TTL_SECONDS"""
+        limit = time.time() - settings.JOB_TTL_SECONDS
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.updated_at < limit
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+def _progress_hook(loop: asyncio.AbstractEventLoop, job: Job) -> Callable[[Dict[str, Any]], None]:
+    """Converte os progress_hooks do yt-dlp (thread do download) em updates do job"""
+    last_sent = [0.0]
+
+    def hook(d: Dict[str, Any]) -> None:
+        if d.get('status') != 'downloading':
+            return
+        # yt-dlp chama o hook a cada bloco; limitar a ~4 atualizações por segundo
+        now = time.monotonic()
+        if now - last_sent[0] < 0.25:
+            return
+        last_sent[0] = now
+
+        downloaded = d.get('downloaded_bytes')
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        total = int(total) if total else None
+        percent = round(downloaded / total * 100, 1) if downloaded and total else None
+        loop.call_soon_threadsafe(
+            lambda: job.update(
+                downloaded_bytes=downloaded,
+                total_bytes=total,
+                percent=percent,
+                speed=d.get('speed'),
+                eta=d.get('eta'),
+            )
+        )
+
+    return hook
+
+
+def _postprocessor_hook(loop: asyncio.AbstractEventLoop, job: Job) -> Callable[[Dict[str, Any]], None]:
+    """Marca o job como em conversão quando o ffmpeg começa"""
+    def hook(d: Dict[str, Any]) -> None:
+        if d.get('status') == 'started':
+            loop.call_soon_threadsafe(lambda: job.update(state=JOB_CONVERTING, eta=None, speed=None))
+
+    return hook
+
+
+job_manager = JobManager()
@@ -0,0 +1,176 @@
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+# Espera pelo lock de escrita do sqlite (só na thread de escrita)
+WRITE_TIMEOUT_SECONDS = 5
+
+
+class _Flush:
+    """Marcador na fila de escritas: sinaliza done quando as anteriores foram gravadas"""
+
+    def __init__(self, close: bool = False):
+        self.done = threading.Event()
+        # Encerra também a thread de escrita (o manifesto está sendo fechado)
+        self.close = close
+
+
+# (SQL, linhas para executemany)
+_Write = Tuple[str, List[tuple]]
+
+
+class CacheManifest:
+    """
+    Registro persistente (sqlite) das entradas completas do cache de áudio.
+
+    Só entradas publicadas (commit_staging_dir) são gravadas, com o tamanho
+    em disco e o último acesso. Na inicialização do worker o índice do cache
+    é reconstruído a partir daqui e da listagem de TEMP_DIR, e entradas cujo
+    tamanho não confere com o disco são tratadas como corrompidas.
+
+    As escritas vêm do event loop (publicação e remoção de entradas), então
+    nenhuma espera pelo lock de escrita do sqlite: vão para uma fila e são
+    gravadas em lote por uma thread própria, como no SharedRegistry. Leituras
+    (load) usam outra conexão e são feitas fora do event loop.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._conn = self._open(path)
+        self._read_lock = threading.Lock()
+        self._writes: "queue.Queue[Union[_Write, _Flush]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    def load(self) -> Dict[str, Tuple[int, float]]:
+        """Retorna {nome da pasta: (tamanho em bytes, último acesso)}"""
+        with self._read_lock:
+            try:
+                rows = self._conn.execute("SELECT name, size, last_access FROM entries").fetchall()
+            except sqlite3.Error as e:
+                print(f"[CACHE] Falha ao ler o manifesto: {str(e)}")
+                return {}
+        return {name: (size, last_access) for name, size, last_access in rows}
+
+    def upsert(self, name: str, size: int, last_access: float) -> None:
+        """Registra uma entrada completa (ou atualiza a existente)"""
+        self._execute(
+            "INSERT OR REPLACE INTO entries (name, size, last_access) VALUES (?, ?, ?)",
+            [(name, size, last_access)]
+        )
+
+    def update_access(self, items: Iterable[Tuple[str, float]]) -> None:
+        """Grava em lote os últimos acessos acumulados em memória"""
+        self._execute(
+            "UPDATE entries SET last_access = ? WHERE name = ?",
+            [(last_access, name) for name, last_access in items]
+        )
+
+    def delete(self, names: Iterable[str]) -> None:
+        """Remove entradas do registro"""
+        self._execute("DELETE FROM entries WHERE name = ?", [(name,) for name in names])
+
+    def flush(self) -> None:
+        """Espera as escritas enfileiradas até agora serem gravadas"""
+        self._wait_writes(_Flush())
+
+    def close(self) -> None:
+        """Grava as escritas pendentes e fecha as conexões"""
+        self._wait_writes(_Flush(close=True))
+        with self._read_lock:
+            self._conn.close()
+
+    def _execute(self, sql: str, rows: List[tuple]) -> None:
+        """Enfileira a escrita para a thread de escrita, sem esperar o sqlite"""
+        if not rows:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="manifest-writer", daemon=True)
+                self._writer.start()
+        self._writes.put((sql, rows))
+
+    def _wait_writes(self, marker: _Flush) -> None:
+        with self._writer_lock:
+            if self._writer is None:
+                return
+            if marker.close:
+                # Escritas depois do fechamento abririam outra thread
+                self._writer = None
+        self._writes.put(marker)
+        marker.done.wait()
+
+    def _write_loop(self) -> None:
+        conn: Optional[sqlite3.Connection] = None
+        try:
+            conn = _connect(self.path, WRITE_TIMEOUT_SECONDS)
+        except sqlite3.Error as e:
+            print(f"[CACHE] Falha ao abrir o manifesto: {str(e)}")
+        while True:
+            # Tudo o que acumulou enquanto a última transação gravava vai junto
+            batch = [self._writes.get()]
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in batch:
+                if isinstance(item, _Flush):
+                    _commit(conn)
+                    if item.close:
+                        if conn is not None:
+                            conn.close()
+                        item.done.set()
+                        return
+                    item.done.set()
+                    continue
+                if conn is None:
+                    continue
+                sql, rows = item
+                try:
+                    conn.executemany(sql, rows)
+                except sqlite3.Error as e:
+                    print(f"[CACHE] Falha ao gravar o manifesto: {str(e)}")
+            _commit(conn)
+
+    @staticmethod
+    def _open(path: Path) -> sqlite3.Connection:
+        try:
+            conn = _connect(path)
+            conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            return conn
+        except sqlite3.DatabaseError as e:
+            # Arquivo corrompido: o cache em disco é revalidado pela varredura
+            print(f"[CACHE] Manifesto inválido, recriando: {str(e)}")
+            for suffix in ("", "-wal", "-shm"):
+                Path(f"{path}{suffix}").unlink(missing_ok=True)
+            return _connect(path)
+
+
+def _commit(conn: Optional[sqlite3.Connection]) -> None:
+    """Confirma a transação aberta pelas escritas do lote, se houver"""
+    if conn is None or not conn.in_transaction:
+        return
+    try:
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"[CACHE] Falha ao gravar o manifesto: {str(e)}")
+        conn.rollback()
+
+
+def _connect(path: Path, timeout: float = WRITE_TIMEOUT_SECONDS) -> sqlite3.Connection:
+    # Cada conexão tem um só usuário por vez: leituras sob o lock de leitura,
+    # escritas na thread de escrita
+    conn = sqlite3.connect(str(path), check_same_thread=False, timeout=timeout)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entries ("
+        " name TEXT PRIMARY KEY,"
+        " size INTEGER NOT NULL,"
+        " last_access REAL NOT NULL)"
+    )
+    return conn
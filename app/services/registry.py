@@ -0,0 +1,276 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple, Union
+from app.config import settings
+
+# Espera pelo lock de escrita do sqlite (só na thread de escrita)
+WRITE_TIMEOUT_SECONDS = 5
+
+
+class _Flush:
+    """Marcador na fila de escritas: sinaliza done quando as anteriores foram gravadas"""
+
+    def __init__(self, close: bool = False):
+        self.done = threading.Event()
+        # Fecha também a conexão de escrita (o banco vai ser apagado)
+        self.close = close
+
+
+# (TEMP_DIR no momento da chamada, SQL, parâmetros)
+_Write = Tuple[Path, str, tuple]
+
+
+class SharedRegistry:
+    """
+    Estado compartilhado entre os workers do uvicorn (sqlite WAL em TEMP_DIR).
+
+    Cada worker mantém seus registros em memória (single-flight, fan-out,
+    jobs, índice do cache); aqui ficam as cópias que os outros precisam ver:
+    produções em andamento, entradas do cache fixadas e o estado dos jobs.
+    Linhas de processos que morreram são ignoradas e removidas pela limpeza.
+
+    As chamadas vêm do event loop em caminhos quentes (fixação de cada
+    arquivo servido, progresso dos jobs), então nenhuma espera pelo lock de
+    escrita do sqlite: escritas vão para uma fila e são gravadas em lote por
+    uma thread própria, na ordem em que foram feitas. Leituras usam outra
+    conexão; no modo WAL não esperam escritores, e o busy timeout curto
+    (SHARED_STATE_READ_TIMEOUT_SECONDS) limita os casos raros em que esperam.
+    Uma escrita fica visível para os outros workers alguns milissegundos
+    depois da chamada; flush() espera a fila esvaziar.
+
+    Com SHARED_STATE desativado, todas as operações viram no-op.
+    """
+
+    def __init__(self):
+        self._root: Optional[Path] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes: "queue.Queue[Union[_Write, _Flush]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    # Produções em andamento (download ou pipeline de uma chave do cache)
+
+    def register(self, key: str, kind: str) -> None:
+        """Anuncia que este worker está produzindo a chave"""
+        self._execute(
+            "INSERT OR REPLACE INTO inflight (key, pid, kind, started_at) VALUES (?, ?, ?, ?)",
+            (key, os.getpid(), kind, time.time())
+        )
+
+    def unregister(self, key: str) -> None:
+        self._execute("DELETE FROM inflight WHERE key = ? AND pid = ?", (key, os.getpid()))
+
+    def is_active(self, key: str) -> bool:
+        """Indica se algum worker vivo está produzindo a chave"""
+        rows = self._query("SELECT pid FROM inflight WHERE key = ?", (key,))
+        return any(_pid_alive(pid) for pid, in rows)
+
+    def active_count(self) -> int:
+        """Produções em andamento em todos os workers"""
+        rows = self._query("SELECT pid FROM inflight", ())
+        return sum(1 for pid, in rows if _pid_alive(pid))
+
+    # Entradas do cache fixadas (sendo gravadas ou servidas)
+
+    def pin(self, name: str) -> None:
+        self._execute(
+            "INSERT INTO pins (name, pid, count) VALUES (?, ?, 1)"
+            " ON CONFLICT (name, pid) DO UPDATE SET count = count + 1",
+            (name, os.getpid())
+        )
+
+    def unpin(self, name: str) -> None:
+        pid = os.getpid()
+        self._execute("UPDATE pins SET count = count - 1 WHERE name = ? AND pid = ?", (name, pid))
+        self._execute("DELETE FROM pins WHERE name = ? AND pid = ? AND count <= 0", (name, pid))
+
+    def pinned_by_others(self) -> Set[str]:
+        """Entradas fixadas por outros workers vivos"""
+        rows = self._query("SELECT name, pid FROM pins WHERE pid != ?", (os.getpid(),))
+        return {name for name, pid in rows if _pid_alive(pid)}
+
+    # Jobs (/api/jobs): qualquer worker responde pelo estado de qualquer job
+
+    def save_job(self, job_id: str, data: Dict[str, Any], file_path: Optional[str]) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO jobs (id, pid, data, file_path, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, os.getpid(), json.dumps(data), file_path, time.time())
+        )
+
+    def load_job(self, job_id: str) -> Optional[Tuple[Dict[str, Any], Optional[str], bool]]:
+        """
+        Returns:
+            (estado do job, caminho do arquivo, worker dono ainda vivo) ou None
+        """
+        rows = self._query("SELECT data, file_path, pid FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        data, file_path, pid = rows[0]
+        return json.loads(data), file_path, _pid_alive(pid)
+
+    def prune_jobs(self, older_than: float) -> None:
+        """Esquece jobs sem atualização desde older_than (timestamp)"""
+        self._execute("DELETE FROM jobs WHERE updated_at < ?", (older_than,))
+
+    # Manutenção
+
+    def purge_dead(self) -> None:
+        """Remove produções e fixações de workers que morreram"""
+        for table in ("inflight", "pins"):
+            rows = self._query(f"SELECT DISTINCT pid FROM {table}", ())
+            for pid, in rows:
+                if not _pid_alive(pid):
+                    self._execute(f"DELETE FROM {table} WHERE pid = ?", (pid,))
+
+    def flush(self) -> None:
+        """Espera as escritas enfileiradas até agora serem gravadas"""
+        self._wait_writes(_Flush())
+
+    def close(self) -> None:
+        """Grava as escritas pendentes e fecha as conexões (o banco pode ser apagado)"""
+        self._wait_writes(_Flush(close=True))
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self._root = None
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        """Enfileira a escrita para a thread de escrita, sem esperar o sqlite"""
+        if not settings.SHARED_STATE:
+            return
+        self._ensure_writer()
+        self._writes.put((settings.TEMP_DIR, sql, params))
+
+    def _query(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return []
+            return conn.execute(sql, params).fetchall()
+
+    def _wait_writes(self, marker: _Flush) -> None:
+        with self._writer_lock:
+            if self._writer is None:
+                return
+        self._writes.put(marker)
+        marker.done.wait()
+
+    def _ensure_writer(self) -> None:
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="registry-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        conn: Optional[sqlite3.Connection] = None
+        root: Optional[Path] = None
+        while True:
+            # Tudo o que acumulou enquanto a última transação gravava vai junto
+            batch = [self._writes.get()]
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            
+            for item in batch:
+                if isinstance(item, _Flush):
+                    _commit(conn)
+                    if item.close and conn is not None:
+                        conn.close()
+                        conn, root = None, None
+                    item.done.set()
+                    continue
+                item_root, sql, params = item
+                if item_root != root:
+                    _commit(conn)
+                    if conn is not None:
+                        conn.close()
+                    conn, root = None, item_root
+                    if root.is_dir():
+                        try:
+                            conn = _connect(root / settings.SHARED_STATE_FILENAME, WRITE_TIMEOUT_SECONDS)
+                        except sqlite3.Error as e:
+                            print(f"[registry] Falha ao abrir o estado compartilhado: {str(e)}")
+                if conn is None:
+                    continue
+                try:
+                    conn.execute(sql, params)
+                except sqlite3.Error as e:
+                    print(f"[registry] Falha ao gravar estado compartilhado: {str(e)}")
+            _commit(conn)
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if not settings.SHARED_STATE:
+            return None
+        root = settings.TEMP_DIR
+        if root != self._root:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self._root = root
+            if root.is_dir():
+                self._conn = _connect(root / settings.SHARED_STATE_FILENAME, WRITE_TIMEOUT_SECONDS)
+                # Depois de criar as tabelas: leituras não seguram o event loop
+                self._conn.execute(f"PRAGMA busy_timeout = {int(settings.SHARED_STATE_READ_TIMEOUT_SECONDS * 1000)}")
+        return self._conn
+
+
+def _commit(conn: Optional[sqlite3.Connection]) -> None:
+    """Confirma a transação aberta pelas escritas do lote, se houver"""
+    if conn is None or not conn.in_transaction:
+        return
+    try:
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"[registry] Falha ao gravar estado compartilhado: {str(e)}")
+        conn.rollback()
+
+
+def _connect(path: Path, timeout: float) -> sqlite3.Connection:
+    # Cada conexão tem um só usuário por vez: leituras sob o lock do registro,
+    # escritas na thread de escrita
+    conn = sqlite3.connect(str(path), check_same_thread=False, timeout=timeout)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS inflight ("
+            " key TEXT NOT NULL, pid INTEGER NOT NULL, kind TEXT NOT NULL,"
+            " started_at REAL NOT NULL, PRIMARY KEY (key, pid))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pins ("
+            " name TEXT NOT NULL, pid INTEGER NOT NULL, count INTEGER NOT NULL,"
+            " PRIMARY KEY (name, pid))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, pid INTEGER NOT NULL, data TEXT NOT NULL,"
+            " file_path TEXT, updated_at REAL NOT NULL)"
+        )
+    return conn
+
+
+def _pid_alive(pid: int) -> bool:
+    """Indica se o processo ainda existe"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Registro compartilhado por todos os módulos do worker
+shared_registry = SharedRegistry()
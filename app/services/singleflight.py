@@ -0,0 +1,128 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+Hook = Callable[[Dict[str, Any]], None]
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas concorrentes com a mesma chave em uma única execução.
+
+    A primeira chamada cria a tarefa; as seguintes aguardam o mesmo
+    resultado (ou a mesma exceção) em vez de repetir o trabalho. Se todos
+    os interessados desistirem antes do fim, a tarefa é cancelada.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Executa func() uma única vez por chave enquanto houver execução em andamento.
+
+        Args:
+            key: Chave de deduplicação (ex: chave do cache)
+            func: Fábrica da corrotina que faz o trabalho
+
+        Returns:
+            O resultado compartilhado da execução
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            self._waiters[task] = 0
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            print(f"[singleflight] Aguardando execução em andamento: {key}")
+
+        self._waiters[task] += 1
+        try:
+            # shield: o cancelamento de um cliente não cancela o trabalho dos outros
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(task) == 1:
+                print(f"[singleflight] Sem interessados: cancelando {key}")
+                task.cancel()
+            raise
+        finally:
+            if task in self._waiters:
+                self._waiters[task] -= 1
+
+    def is_active(self, key: str) -> bool:
+        """Indica se há execução em andamento para a chave"""
+        return key in self._inflight
+
+    def in_flight(self) -> int:
+        """Quantidade de chaves sendo processadas"""
+        return len(self._inflight)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self._waiters.pop(task, None)
+        # Marca a exceção como lida mesmo se todos os clientes desistiram
+        if not task.cancelled():
+            task.exception()
+
+
+class FlightHooks:
+    """
+    Hooks de progresso compartilhados pelos interessados em uma chave do SingleFlight.
+
+    A execução é criada por quem chegou primeiro, com os hooks dele; quem se
+    junta depois não teria progresso até o resultado sair. Aqui cada chamada
+    registra seus hooks na chave (attach) e a execução recebe um único hook
+    (dispatcher) que repassa cada evento a todos os registrados naquele
+    momento. Quem chega no meio recebe na hora o último evento da chave.
+
+    O dispatcher roda na thread do download; attach, no event loop.
+    """
+
+    def __init__(self):
+        self._hooks: Dict[str, List[Hook]] = {}
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def attach(self, key: str, hooks: Optional[List[Hook]]) -> Iterator[None]:
+        """Recebe os eventos da chave enquanto o bloco durar"""
+        hooks = list(hooks or [])
+        with self._lock:
+            self._hooks.setdefault(key, []).extend(hooks)
+            last = self._last.get(key)
+        if last is not None:
+            _call_all(hooks, last)
+        try:
+            yield
+        finally:
+            with self._lock:
+                registered = self._hooks.get(key, [])
+                for hook in hooks:
+                    registered.remove(hook)
+                if not registered:
+                    self._hooks.pop(key, None)
+                    self._last.pop(key, None)
+
+    def dispatcher(self, key: str) -> Hook:
+        """Hook a passar para a execução: repassa cada evento aos registrados"""
+        def dispatch(d: Dict[str, Any]) -> None:
+            with self._lock:
+                hooks = list(self._hooks.get(key, []))
+                if key in self._hooks:
+                    self._last[key] = d
+            _call_all(hooks, d)
+
+        return dispatch
+
+
+def _call_all(hooks: List[Hook], d: Dict[str, Any]) -> None:
+    # Um interessado com problema não pode interromper o trabalho compartilhado
+    for hook in hooks:
+        try:
+            hook(d)
+        except Exception as e:
+            print(f"[singleflight] Erro em hook de progresso: {str(e)}")
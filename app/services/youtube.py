@@ -1,16 +1,78 @@
 import asyncio
+import json
+import shutil
+import threading
+import time
+import yt_dlp
 from pathlib import Path
-from typing import Dict, Any, List
+from pydantic import ValidationError
+from typing import Dict, Any, List, AsyncIterator, Callable, Optional, Tuple
 from app.config import settings
-from app.core.downloader import download_audio
+from app.core.downloader import (
+    fetch_audio,
+    convert_audio,
+    cancel_hook,
+    PASSTHROUGH_FORMATS,
+    build_mp3_pipeline,
+    stream_pipeline,
+    stream_video,
+)
+from app.core.executors import StageExecutor, metadata_executor, download_executor, transcode_executor
+from app.core.locks import FileLock
+from app.core.ydl_pool import ydl_pool
 from app.schemas.download import FormatInfo, VideoMetadata
-import yt_dlp
+from app.services.cache import (
+    lookup_cached_audio,
+    create_staging_dir,
+    commit_staging_dir,
+    discard_staging_dir,
+)
+from app.services.cache_index import cache_index
+from app.services.fanout import FanOut, GrowingFile
+from app.services.formats import estimate_filesize
+from app.services.registry import shared_registry
+from app.services.singleflight import FlightHooks, SingleFlight
+from app.utils.helpers import ClipRange, build_cache_key, clip_suffix, parse_url_expiry, sanitize_filename
+from app.utils.ttl_cache import TTLCache
+from app.utils.validators import extract_playlist_id, extract_video_id
+
+
+# Downloads concorrentes do mesmo vídeo compartilham uma única execução
+# (e o progresso dela, para todos que esperam)
+download_flight = SingleFlight()
+download_progress = FlightHooks()
+download_postprocess = FlightHooks()
+
+# Metadados por ID canônico do vídeo (usado por /formats e /download-stream)
+metadata_cache = TTLCache(
+    maxsize=settings.METADATA_CACHE_SIZE,
+    ttl_seconds=settings.METADATA_CACHE_TTL_SECONDS
+)
+metadata_flight = SingleFlight()
+
+# Info do yt-dlp com as URLs de mídia já resolvidas, por ID canônico do vídeo.
+# Cada item vale até o expire= mais próximo entre as URLs (menos a folga).
+resolved_cache = TTLCache(
+    maxsize=settings.RESOLVED_URL_CACHE_SIZE,
+    ttl_seconds=0
+)
+
+# Campos do info que não servem para baixar e só ocupam memória
+RESOLVED_DROP_KEYS = ('automatic_captions', 'subtitles', 'thumbnails', 'heatmap', 'chapters', 'description')
+
+# Produções em andamento que aceitam novos leitores (pipeline MP3 e streams)
+audio_fanout = FanOut()
+video_fanout = FanOut()
 
 
 async def extract_video_metadata(url: str) -> Dict[str, Any]:
     """
     Extrai metadados de um vídeo do YouTube sem fazer download.
     
+    O resultado fica em cache (TTL + LRU) por ID canônico do vídeo, então
+    GET /api/formats seguido de /api/download-stream extrai uma vez só.
+    O dict retornado é compartilhado: não deve ser modificado.
+    
     Args:
         url: URL do vídeo do YouTube
     
@@ -27,6 +89,71 @@ async def extract_video_metadata(url: str) -> Dict[str, Any]:
         Exception: Se a extração de metadados falhar
     """
     
+    youtube_id = extract_video_id(url)
+    if youtube_id is None:
+        return await _extract_video_metadata(url)
+    
+    metadata = metadata_cache.get(youtube_id)
+    if metadata is not None:
+        print(f"[extract] Metadados em cache para {youtube_id}")
+        return metadata
+    
+    async def _extract_and_cache() -> Dict[str, Any]:
+        result = await _extract_video_metadata(url)
+        metadata_cache.set(youtube_id, result)
+        return result
+    
+    return await metadata_flight.do(youtube_id, _extract_and_cache)
+
+
+async def extract_metadata_many(
+    urls: List[str],
+    concurrency: int
+) -> AsyncIterator[Tuple[int, Optional[VideoMetadata], Optional[str]]]:
+    """
+    Extrai os metadados de várias URLs em paralelo, entregando cada uma ao terminar.
+    
+    Até concurrency extrações rodam ao mesmo tempo (cada uma pelo cache e
+    single-flight de extract_video_metadata). Uma falha não interrompe as
+    outras: vira a mensagem de erro do item, inclusive metadados que não
+    cabem em VideoMetadata (ex: lives, sem duração). Se o consumidor parar,
+    as extrações pendentes são canceladas.
+    
+    Args:
+        urls: URLs dos vídeos
+        concurrency: Máximo de extrações simultâneas
+    
+    Yields:
+        (posição em urls, metadados validados ou None, erro ou None), na ordem de conclusão
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def extract(index: int, url: str) -> Tuple[int, Optional[VideoMetadata], Optional[str]]:
+        if extract_video_id(url) is None:
+            return index, None, "URL inválida ou não é um vídeo do YouTube"
+        async with semaphore:
+            try:
+                metadata = await extract_video_metadata(url)
+            except Exception as e:
+                return index, None, str(e)
+        try:
+            return index, VideoMetadata.model_validate(metadata), None
+        except ValidationError as e:
+            fields = ", ".join(".".join(map(str, error["loc"])) for error in e.errors())
+            return index, None, f"Metadados incompletos: {fields}"
+    
+    tasks = [asyncio.ensure_future(extract(index, url)) for index, url in enumerate(urls)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _extract_video_metadata(url: str) -> Dict[str, Any]:
+    """Extrai os metadados via yt-dlp (sem cache)"""
+    
     print(f"[extract] Extraindo metadados de {url}")
     
     def _extract():
@@ -39,12 +166,18 @@ async def extract_video_metadata(url: str) -> Dict[str, Any]:
         }
         
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with ydl_pool.session('metadata', ydl_opts) as ydl:
                 info = ydl.extract_info(url, download=False)
             
+            youtube_id = extract_video_id(url)
+            if youtube_id:
+                remember_resolved(youtube_id, info)
+            
             # Extrair formatos disponíveis
             # Estratégia: combinar video-only + audio-only para máximas opções
+            # e listar também cada audio-only (ex: Opus 48 kbps para pouca banda)
             formats_list: List[Dict[str, Any]] = []
+            duration = info.get('duration')
             
             # Pré-processar: agrupar formatos
             video_only_by_height: Dict[int, Dict[str, Any]] = {}  # height -> melhor video-only
@@ -68,8 +201,8 @@ async def extract_video_metadata(url: str) -> Dict[str, Any]:
                                 video_only_by_height[height] = fmt
                             else:
                                 # Preferir maior bitrate/filesize
-                                current_size = fmt.get('filesize') or 0
-                                best_size = video_only_by_height[height].get('filesize') or 0
+                                current_size = estimate_filesize(fmt, duration) or 0
+                                best_size = estimate_filesize(video_only_by_height[height], duration) or 0
                                 if current_size > best_size:
                                     video_only_by_height[height] = fmt
                     
@@ -94,13 +227,13 @@ async def extract_video_metadata(url: str) -> Dict[str, Any]:
                     combined_id = f"{video_fmt.get('format_id')}+{best_audio.get('format_id')}"
                     
                     # Estimar tamanho combinado
-                    video_size = video_fmt.get('filesize') or 0
-                    audio_size = best_audio.get('filesize') or 0
+                    video_size = estimate_filesize(video_fmt, duration) or 0
+                    audio_size = estimate_filesize(best_audio, duration) or 0
                     combined_size = video_size + audio_size if video_size and audio_size else None
                     
                     format_info = {
                         'format_id': combined_id,
-                        'ext': video_fmt.get('ext', ''),
+                        'ext': 'mp4',  # O stream une os dois em MP4 fragmentado
                         'height': height,
                         'width': video_fmt.get('width'),
                         'filesize': combined_size,
@@ -118,7 +251,7 @@ async def extract_video_metadata(url: str) -> Dict[str, Any]:
                         'ext': video_fmt.get('ext', ''),
                         'height': height,
                         'width': video_fmt.get('width'),
-                        'filesize': video_fmt.get('filesize'),
+                        'filesize': estimate_filesize(video_fmt, duration),
                         'fps': video_fmt.get('fps'),
                         'vcodec': video_fmt.get('vcodec'),
                         'acodec': 'none',
@@ -130,6 +263,21 @@ async def extract_video_metadata(url: str) -> Dict[str, Any]:
             # Ordenar por altura crescente
             formats_list.sort(key=lambda f: f.get('height') or 0)
             
+            # Áudios sozinhos ao final, por bitrate crescente
+            for audio_fmt in sorted(audio_only_formats, key=lambda f: f.get('abr') or 0):
+                formats_list.append({
+                    'format_id': audio_fmt.get('format_id', ''),
+                    'ext': audio_fmt.get('ext', ''),
+                    'height': None,
+                    'width': None,
+                    'filesize': estimate_filesize(audio_fmt, duration),
+                    'fps': None,
+                    'vcodec': 'none',
+                    'acodec': audio_fmt.get('acodec'),
+                    'abr': audio_fmt.get('abr'),
+                    'vbr': None,
+                })
+            
             metadata = {
                 'title': info.get('title', 'Unknown'),
                 'duration': info.get('duration', 0),
@@ -143,48 +291,527 @@ async def extract_video_metadata(url: str) -> Dict[str, Any]:
         except Exception as e:
             raise Exception(f"Erro ao extrair metadados do YouTube: {str(e)}")
     
-    # Executar extração em thread separada (não bloqueia event loop)
-    loop = asyncio.get_event_loop()
-    metadata = await loop.run_in_executor(None, _extract)
+    # Executar extração no pool de metadados (não bloqueia event loop nem espera downloads)
+    metadata = await metadata_executor.run(_extract)
     
     return metadata
 
 
-async def download_youtube_audio(url: str, video_id: str) -> Path:
+async def expand_playlist(url: str, limit: int) -> List[str]:
+    """
+    Lista as URLs dos vídeos de uma playlist, sem extrair cada vídeo.
+    
+    Usa extract_flat: uma única requisição à playlist, sem resolver formatos
+    (cada vídeo é extraído depois, pelo próprio download).
+    
+    Args:
+        url: URL da playlist (ou de um vídeo aberto dentro dela)
+        limit: Máximo de vídeos retornados (os primeiros da playlist)
+    
+    Returns:
+        URLs canônicas dos vídeos, na ordem da playlist
+        
+    Raises:
+        Exception: Se a URL não tiver playlist ou a extração falhar
+    """
+    playlist_id = extract_playlist_id(url)
+    if playlist_id is None:
+        raise Exception("Não foi possível identificar a playlist na URL")
+    
+    print(f"[extract] Listando playlist {playlist_id}")
+    
+    def _expand() -> List[str]:
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',
+            'socket_timeout': 30,
+            'retries': 3,
+        }
+        params = {'playlistend': limit}
+        with ydl_pool.session('playlist', ydl_opts, params) as ydl:
+            info = ydl.extract_info(f"https://www.youtube.com/playlist?list={playlist_id}", download=False)
+        
+        urls = []
+        for entry in info.get('entries') or []:
+            video_id = (entry or {}).get('id')
+            if video_id:
+                urls.append(f"https://www.youtube.com/watch?v={video_id}")
+        return urls[:limit]
+    
+    return await metadata_executor.run(_expand)
+
+
+def remember_resolved(youtube_id: str, info: Dict[str, Any]) -> None:
+    """
+    Guarda o info de uma extração para baixar de novo sem resolver a página.
+    
+    O YouTube assina as URLs de mídia (googlevideo) com um expire=; o item
+    vale até a primeira delas expirar, menos RESOLVED_URL_EXPIRY_MARGIN_SECONDS
+    para que downloads longos terminem antes. Sem expire nas URLs, nada é
+    guardado. Guardar de novo não estende o prazo (ele vem das próprias URLs).
     """
-    Baixa áudio do YouTube usando yt-dlp.
+    formats = [
+        fmt for fmt in info.get('formats') or []
+        if fmt.get('url') and fmt.get('protocol') != 'mhtml'  # storyboards
+    ]
+    if not formats:
+        return
+    
+    expiries = [parse_url_expiry(fmt['url']) for fmt in formats]
+    if None in expiries:
+        return
+    ttl = min(expiries) - time.time() - settings.RESOLVED_URL_EXPIRY_MARGIN_SECONDS
+    if ttl <= 0:
+        return
+    
+    slim = {key: value for key, value in info.items() if key not in RESOLVED_DROP_KEYS}
+    slim['formats'] = formats
+    # Sem chaves privadas (requested_*, filepath...): o info é processado de novo do zero
+    resolved_cache.set(youtube_id, yt_dlp.YoutubeDL.sanitize_info(slim, remove_private_keys=True), ttl_seconds=ttl)
+
+
+def resolved_info(youtube_id: Optional[str], format_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Info com URLs de mídia ainda válidas para o vídeo, se houver.
+    
+    Com format_id (ex: '137+140'), só retorna se todos os formatos pedidos
+    estiverem entre os resolvidos. O dict é compartilhado: não modificar.
+    """
+    if youtube_id is None:
+        return None
+    info = resolved_cache.get(youtube_id)
+    if info is None or format_id is None:
+        return info
+    available = {fmt.get('format_id') for fmt in info['formats']}
+    if all(part in available for part in format_id.split('+')):
+        return info
+    return None
+
+
+def _write_resolved_info(youtube_id: str, video_id: str, format_id: Optional[str] = None) -> Optional[Path]:
+    """Grava o info resolvido para o yt-dlp CLI (--load-info-json), se houver"""
+    info = resolved_info(youtube_id, format_id)
+    if info is None:
+        return None
+    info_dir = settings.TEMP_DIR / settings.RESOLVED_INFO_DIRNAME
+    info_dir.mkdir(parents=True, exist_ok=True)
+    info_path = info_dir / f"{youtube_id}.{video_id}.json"
+    info_path.write_text(json.dumps(info), encoding='utf-8')
+    return info_path
+
+
+async def download_youtube_audio(
+    url: str,
+    video_id: str,
+    progress_hooks: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+    postprocessor_hooks: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+    audio_format: str = "mp3",
+    clip: Optional[ClipRange] = None
+) -> Path:
+    """
+    Baixa áudio do YouTube usando yt-dlp, reaproveitando o cache quando possível.
+    
+    O cache é indexado pelo ID canônico do vídeo + codec + bitrate, então
+    pedidos repetidos do mesmo vídeo são servidos sem yt-dlp nem FFmpeg.
+    Trechos (clip) têm entradas próprias e só baixam/convertem o intervalo.
     
     Args:
         url: URL do vídeo do YouTube
-        video_id: ID único para organizar os arquivos
+        video_id: ID único da requisição (usado em logs e pastas temporárias)
+        progress_hooks: Callbacks de progresso do download (yt-dlp progress_hooks)
+        postprocessor_hooks: Callbacks da conversão (yt-dlp postprocessor_hooks)
+        audio_format: mp3 (convertido) ou m4a/opus (stream nativo, sem reencodar)
+        clip: Trecho (início, fim) em segundos, ou None para o vídeo inteiro
     
     Returns:
-        Path: Caminho do arquivo MP3 gerado
+        Path: Caminho do arquivo de áudio gerado
         
     Raises:
         Exception: Se o download ou processamento falhar
     """
-    output_dir = settings.TEMP_DIR / video_id
-    output_dir.mkdir(exist_ok=True)
+    youtube_id = extract_video_id(url)
+    
+    # URL sem ID reconhecível: não há como indexar no cache
+    if youtube_id is None:
+        output_dir = settings.TEMP_DIR / video_id
+        output_dir.mkdir(exist_ok=True)
+        cache_index.pin(output_dir.name)
+        try:
+            return await _download_to_dir(
+                url, video_id, output_dir, progress_hooks, postprocessor_hooks, audio_format, clip
+            )
+        except asyncio.CancelledError:
+            discard_staging_dir(output_dir)
+            raise
+        finally:
+            cache_index.unpin(output_dir.name)
+    
+    cache_key = audio_cache_key(youtube_id, audio_format, clip)
+    
+    cached_file = lookup_cached_audio(cache_key, audio_format)
+    if cached_file:
+        print(f"[{video_id}] Cache hit ({cache_key}): {cached_file.name}")
+        return cached_file
+    
+    # Quem se junta a um download em andamento também recebe o progresso dele
+    with download_progress.attach(cache_key, progress_hooks), \
+         download_postprocess.attach(cache_key, postprocessor_hooks):
+        return await download_flight.do(
+            cache_key,
+            lambda: _download_and_cache(
+                url, video_id, cache_key,
+                [download_progress.dispatcher(cache_key)],
+                [download_postprocess.dispatcher(cache_key)],
+                audio_format, clip
+            )
+        )
+
+
+def audio_cache_key(youtube_id: str, audio_format: str = "mp3", clip: Optional[ClipRange] = None) -> str:
+    """
+    Chave do cache: o MP3 inclui codec e bitrate; m4a/opus são cópias da fonte.
+    Trechos ganham o intervalo na chave (ex: dQw4w9WgXcQ_mp3_192_clip30000-60000).
+    """
+    if audio_format in PASSTHROUGH_FORMATS:
+        key = build_cache_key(youtube_id, audio_format, "copy")
+    else:
+        key = build_cache_key(youtube_id, audio_format, settings.AUDIO_BITRATE)
+    if clip is not None:
+        key = f"{key}_{clip_suffix(clip)}"
+    return key
+
+
+async def _download_and_cache(
+    url: str,
+    video_id: str,
+    cache_key: str,
+    progress_hooks: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+    postprocessor_hooks: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+    audio_format: str = "mp3",
+    clip: Optional[ClipRange] = None
+) -> Path:
+    """Baixa o áudio para uma pasta temporária e publica no cache"""
+    lock = None
+    if settings.CROSS_WORKER_LOCKS:
+        # Outro worker pode estar baixando a mesma chave: esperar por ele
+        lock = FileLock(settings.TEMP_DIR / settings.LOCKS_DIRNAME / f"{cache_key}.lock", remove_on_release=True)
+        loop = asyncio.get_event_loop()
+        acquiring = loop.run_in_executor(None, lock.acquire)
+        try:
+            await acquiring
+        except asyncio.CancelledError:
+            # A thread ainda pode obter o lock depois do cancelamento
+            acquiring.add_done_callback(lambda _: lock.release())
+            raise
     
+    try:
+        # Pipelines MP3 (em qualquer worker) não usam o lock: esperar a publicação
+        while shared_registry.is_active(cache_key):
+            await asyncio.sleep(settings.SHARED_STATE_POLL_SECONDS)
+        
+        cached_file = lookup_cached_audio(cache_key, audio_format)
+        if cached_file:
+            print(f"[{video_id}] Cache preenchido por outro worker ({cache_key})")
+            return cached_file
+        
+        staging_dir = create_staging_dir(cache_key, video_id)
+        shared_registry.register(cache_key, "download")
+        try:
+            audio_file = await _download_to_dir(
+                url, video_id, staging_dir, progress_hooks, postprocessor_hooks, audio_format, clip
+            )
+        except BaseException:
+            # Inclui cancelamento: ninguém mais espera por este download
+            discard_staging_dir(staging_dir)
+            raise
+        finally:
+            shared_registry.unregister(cache_key)
+        
+        cache_dir = commit_staging_dir(staging_dir, cache_key)
+        return lookup_cached_audio(cache_key, audio_format) or cache_dir / audio_file.name
+    finally:
+        if lock:
+            lock.release()
+
+
+async def _download_to_dir(
+    url: str,
+    video_id: str,
+    output_dir: Path,
+    progress_hooks: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+    postprocessor_hooks: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+    audio_format: str = "mp3",
+    clip: Optional[ClipRange] = None
+) -> Path:
+    """
+    Executa o download em output_dir e retorna o arquivo de áudio gerado.
+    
+    Se a tarefa for cancelada, o yt-dlp é interrompido pelo cancel_hook
+    no próximo bloco baixado e o ffmpeg da conversão é encerrado; o
+    cancelamento só é repassado depois que a thread da etapa terminou.
+    """
     print(f"[{video_id}] Iniciando download: {url}")
     
-    # Executar download em thread separada (não bloqueia event loop)
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(
-        None,
-        download_audio,
-        url,
-        str(output_dir)
+    cancel_event = threading.Event()
+    progress_hooks = [*(progress_hooks or []), cancel_hook(cancel_event)]
+    postprocessor_hooks = [*(postprocessor_hooks or []), cancel_hook(cancel_event)]
+    
+    # Download (rede) e conversão (CPU) em pools separados e limitados
+    youtube_id = extract_video_id(url)
+    resolved = resolved_info(youtube_id)
+    if resolved is not None:
+        print(f"[{video_id}] URLs de mídia já resolvidas: pulando a extração")
+    
+    info = await _run_stage(
+        video_id, cancel_event, download_executor,
+        fetch_audio, url, str(output_dir), progress_hooks, audio_format, resolved, clip
+    )
+    if youtube_id:
+        remember_resolved(youtube_id, info)
+    await _run_stage(
+        video_id, cancel_event, transcode_executor,
+        convert_audio, info, settings.AUDIO_BITRATE, postprocessor_hooks, audio_format, cancel_event
     )
     
-    # Procurar o arquivo MP3 gerado
-    mp3_files = list(output_dir.glob("*.mp3"))
+    # Procurar o arquivo gerado
+    audio_files = list(output_dir.glob(f"*.{audio_format}"))
+    
+    if not audio_files:
+        raise Exception(f"Arquivo {audio_format.upper()} não foi gerado após o download")
+    
+    audio_file = audio_files[0]
+    print(f"[{video_id}] Download concluído: {audio_file.name}")
+    
+    return audio_file
+
+
+async def _run_stage(
+    video_id: str,
+    cancel_event: threading.Event,
+    executor: StageExecutor,
+    func: Callable[..., Any],
+    *args: Any
+) -> Any:
+    """
+    Executa uma etapa do download no pool, interrompível por cancel_event.
+    
+    Se a tarefa for cancelada, cancel_event é sinalizado e a thread da etapa
+    é esperada antes de o cancelamento subir: quem descarta a pasta de
+    saída não corre o risco de a thread ainda estar gravando nela.
+    """
+    started = threading.Event()
+    finished = threading.Event()
+    
+    def guarded(*call_args: Any) -> Any:
+        started.set()
+        try:
+            if cancel_event.is_set():
+                # Cancelado antes de a etapa começar: nada a interromper
+                raise yt_dlp.utils.DownloadCancelled("Download cancelado")
+            return func(*call_args)
+        finally:
+            finished.set()
+    
+    stage = asyncio.ensure_future(executor.run(guarded, *args))
+    try:
+        return await asyncio.shield(stage)
+    except asyncio.CancelledError:
+        cancel_event.set()
+        if not started.is_set():
+            # Ainda na fila: se a thread começar agora, verá cancel_event e sai sem gravar
+            stage.cancel()
+            raise
+        print(f"[{video_id}] Download cancelado: interrompendo {executor.name}")
+        # Espera a thread, não a tarefa: novos cancelamentos (ex: desligamento)
+        # não encurtam a espera, e a etapa já foi interrompida
+        while not finished.is_set():
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                pass
+        # Erro da etapa interrompida (ex: DownloadCancelled): ninguém mais o lê
+        stage.add_done_callback(lambda t: t.cancelled() or t.exception())
+        raise
+
+
+def audio_requires_work(url: str, audio_format: str = "mp3", clip: Optional[ClipRange] = None) -> bool:
+    """
+    Indica se servir a URL exige trabalho novo (download/conversão).
+    
+    Falso quando o áudio já está no cache ou sendo produzido por outro pedido.
+    """
+    youtube_id = extract_video_id(url)
+    if youtube_id is None:
+        return True
+    
+    cache_key = audio_cache_key(youtube_id, audio_format, clip)
+    if lookup_cached_audio(cache_key, audio_format):
+        return False
+    if audio_fanout.is_active(cache_key) or download_flight.is_active(cache_key):
+        return False
+    # Produção em outro worker: o download aqui espera por ela e lê do cache
+    return not shared_registry.is_active(cache_key)
+
+
+def video_stream_requires_work(url: str, format_id: str, clip: Optional[ClipRange] = None) -> bool:
+    """Indica se o stream exige um novo yt-dlp (falso se já há um para se anexar)"""
+    youtube_id = extract_video_id(url)
+    if youtube_id is None:
+        return True
+    return not video_fanout.is_active(_video_stream_key(youtube_id, format_id, clip))
+
+
+def _video_stream_key(youtube_id: str, format_id: str, clip: Optional[ClipRange] = None) -> str:
+    key = f"{youtube_id}_{sanitize_filename(format_id)}"
+    if clip is not None:
+        key = f"{key}_{clip_suffix(clip)}"
+    return key
+
+
+def should_stream_audio(
+    url: str,
+    requested: bool,
+    audio_format: str = "mp3",
+    clip: Optional[ClipRange] = None
+) -> bool:
+    """
+    Decide entre pipeline (stream) e download completo para /api/download.
+    
+    Quem chega enquanto o MP3 está sendo produzido se junta à produção em
+    andamento, seja qual for o modo pedido, em vez de começar do zero.
+    Produção em outro worker vai pelo download, que espera por ela e lê do
+    cache (como em audio_requires_work, sem ticket de admissão).
+    O pipeline só produz MP3 do vídeo inteiro; os formatos sem reencode e
+    os trechos (curtos, baixados só no intervalo) usam o download.
+    """
+    youtube_id = extract_video_id(url)
+    if youtube_id is None or audio_format != "mp3" or clip is not None:
+        return False
+    
+    cache_key = audio_cache_key(youtube_id)
+    if lookup_cached_audio(cache_key):
+        return False
+    if audio_fanout.is_active(cache_key):
+        return True
+    if download_flight.is_active(cache_key) or shared_registry.is_active(cache_key):
+        return False
+    return requested
+
+
+async def stream_youtube_audio(url: str, video_id: str) -> Tuple[str, AsyncIterator[bytes]]:
+    """
+    Converte para MP3 em pipeline (yt-dlp | ffmpeg) enviando os bytes ao cliente
+    enquanto são gerados, e grava a mesma saída no cache.
+    
+    O primeiro byte chega em segundos em vez de após o download e a conversão
+    completos. Pedidos do mesmo vídeo durante a conversão leem o arquivo em
+    crescimento (sem novo yt-dlp/ffmpeg). Se a produção terminar com sucesso,
+    o arquivo é publicado no cache; se falhar ou todos os clientes
+    desconectarem, a gravação parcial é descartada.
+    
+    Args:
+        url: URL do vídeo do YouTube
+        video_id: ID único da requisição
+    
+    Returns:
+        Tupla (nome do arquivo, iterador assíncrono de chunks do MP3)
+        
+    Raises:
+        Exception: Se a URL não tiver ID de vídeo ou os metadados falharem
+    """
+    youtube_id = extract_video_id(url)
+    if youtube_id is None:
+        raise Exception("Não foi possível identificar o vídeo na URL")
+    
+    cache_key = audio_cache_key(youtube_id)
+    
+    # Metadados (em cache na maioria dos casos) dão o nome do arquivo e as tags ID3
+    metadata = await extract_video_metadata(url)
+    title = metadata.get('title') or youtube_id
+    filename = f"{sanitize_filename(title) or youtube_id}.mp3"
+    staging_dir = None
     
-    if not mp3_files:
-        raise Exception("Arquivo MP3 não foi gerado após o download")
+    def create_output() -> Path:
+        nonlocal staging_dir
+        staging_dir = create_staging_dir(cache_key, video_id)
+        return staging_dir / filename
     
-    mp3_file = mp3_files[0]
-    print(f"[{video_id}] Download concluído: {mp3_file.name}")
+    async def produce(growing: GrowingFile) -> None:
+        info_path = _write_resolved_info(youtube_id, video_id)
+        cmds = build_mp3_pipeline(
+            url,
+            settings.AUDIO_BITRATE,
+            {'title': title, 'artist': metadata.get('uploader') or ''},
+            str(info_path) if info_path else None
+        )
+        completed = False
+        print(f"[{video_id}] Iniciando pipeline MP3: {url}")
+        shared_registry.register(cache_key, "audio_stream")
+        try:
+            # Escritas de 64KB vão para o page cache; não compensa uma thread por chunk
+            async for chunk in stream_pipeline(cmds, video_id):
+                growing.append(chunk)
+            completed = True
+        finally:
+            shared_registry.unregister(cache_key)
+            if info_path:
+                info_path.unlink(missing_ok=True)
+            if completed:
+                commit_staging_dir(staging_dir, cache_key)
+                print(f"[{video_id}] Pipeline concluído e publicado no cache: {filename}")
+            else:
+                discard_staging_dir(staging_dir)
+    
+    return filename, audio_fanout.subscribe(cache_key, create_output, produce)
+
+
+def stream_youtube_video(
+    url: str,
+    format_id: str,
+    video_id: str,
+    clip: Optional[ClipRange] = None
+) -> AsyncIterator[bytes]:
+    """
+    Stream de vídeo/áudio compartilhado entre pedidos simultâneos.
+    
+    O primeiro pedido de (vídeo, formato) inicia o yt-dlp; os seguintes leem
+    o spool em crescimento desde o byte 0. O spool é apagado ao fim da
+    produção (leitores já conectados continuam pelo descritor aberto).
+    
+    Args:
+        url: URL do vídeo do YouTube
+        format_id: ID do formato desejado
+        video_id: ID único da requisição
+        clip: Trecho (início, fim) em segundos, ou None para o vídeo inteiro
+    
+    Returns:
+        Iterador assíncrono de chunks
+        
+    Raises:
+        Exception: Se a URL não tiver ID de vídeo
+    """
+    youtube_id = extract_video_id(url)
+    if youtube_id is None:
+        raise Exception("Não foi possível identificar o vídeo na URL")
+    
+    stream_key = _video_stream_key(youtube_id, format_id, clip)
+    spool_dir = settings.TEMP_DIR / f"{stream_key}.{video_id}.stream"
+    
+    def create_spool() -> Path:
+        spool_dir.mkdir(parents=True, exist_ok=True)
+        return spool_dir / "data"
+    
+    async def produce(growing: GrowingFile) -> None:
+        info_path = _write_resolved_info(youtube_id, video_id, format_id)
+        try:
+            async for chunk in stream_video(
+                url, format_id, video_id, str(info_path) if info_path else None, clip
+            ):
+                growing.append(chunk)
+        finally:
+            if info_path:
+                info_path.unlink(missing_ok=True)
+            shutil.rmtree(spool_dir, ignore_errors=True)
     
-    return mp3_file
+    return video_fanout.subscribe(stream_key, create_spool, produce)
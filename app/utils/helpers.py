@@ -1,7 +1,9 @@
-from typing import Optional
+from typing import Optional, Tuple, Union
 import re
 import hashlib
 from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+from app.utils.validators import extract_video_id
 
 def sanitize_filename(filename: str) -> str:
     """
@@ -60,7 +62,51 @@ def format_filesize(bytes_size: Optional[float]) -> Optional[str]:
     return f"{size:.1f}PB"
 
 def generate_video_id(url: str) -> str:
-    """Gera ID único usando timestamp + hash da URL"""
+    """Gera ID único usando timestamp + hash do vídeo (ID canônico, ou a URL)"""
     timestamp = int(datetime.now().timestamp() * 1000)
-    url_hash = hashlib.md5(str(url).encode()).hexdigest()[:8]
-    return f"{timestamp}_{url_hash}"
\ No newline at end of file
+    url_hash = hashlib.md5(str(extract_video_id(url) or url).encode()).hexdigest()[:8]
+    return f"{timestamp}_{url_hash}"
+
+
+def build_cache_key(youtube_id: str, codec: str, bitrate: Union[int, str]) -> str:
+    """Gera a chave de cache de um áudio (ex: dQw4w9WgXcQ_mp3_192, dQw4w9WgXcQ_m4a_copy)"""
+    return f"{youtube_id}_{codec}_{bitrate}"
+
+
+# Trecho (início, fim) em segundos; fim None = até o final do vídeo
+ClipRange = Tuple[float, Optional[float]]
+
+
+def clip_range(start: Optional[float], end: Optional[float]) -> Optional[ClipRange]:
+    """Normaliza start/end de um pedido; None quando o vídeo inteiro foi pedido"""
+    if not start and end is None:
+        return None
+    return (start or 0.0, end)
+
+
+def clip_suffix(clip: ClipRange) -> str:
+    """Sufixo da chave de cache de um trecho, em milissegundos (ex: clip30000-60000)"""
+    start, end = clip
+    end_label = "end" if end is None else str(round(end * 1000))
+    return f"clip{round(start * 1000)}-{end_label}"
+
+
+def parse_url_expiry(url: str) -> Optional[float]:
+    """
+    Extrai o instante de expiração (epoch) de uma URL de mídia do YouTube.
+    
+    URLs do googlevideo trazem `expire=<epoch>` na query; manifests DASH/HLS
+    trazem `/expire/<epoch>/` no caminho.
+    
+    Returns:
+        Timestamp de expiração, ou None se a URL não informar
+    """
+    parsed = urlparse(url)
+    values = parse_qs(parsed.query).get('expire')
+    if not values:
+        match = re.search(r'/expire/(\d+)', parsed.path)
+        values = [match.group(1)] if match else None
+    try:
+        return float(values[0]) if values else None
+    except ValueError:
+        return None
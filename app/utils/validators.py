@@ -1,5 +1,61 @@
+import re
+from typing import Optional
+
+# Todas as formas de URL de vídeo aceitas, com o ID de 11 caracteres no grupo 1:
+#   youtube.com/watch?v=ID (v em qualquer posição da query), /shorts/ID,
+#   /embed/ID, /live/ID, /v/ID (www., m. e music.), youtube-nocookie.com/embed/ID
+#   e youtu.be/ID. O ID precisa terminar a URL ou ser seguido de / ? & ou #.
+YOUTUBE_URL_PATTERN = re.compile(
+    r'^(?:https?://)?'
+    r'(?:'
+    r'(?:(?:www|m|music)\.)?youtube\.com/(?:watch/?\?(?:[^#]*&)?v=|(?:shorts|embed|live|v)/)'
+    r'|(?:www\.)?youtube-nocookie\.com/embed/'
+    r'|youtu\.be/'
+    r')'
+    r'([A-Za-z0-9_-]{11})'
+    r'(?=$|[/?&#])',
+    re.IGNORECASE
+)
+
+# Playlists: youtube.com/playlist?list=ID ou watch?v=...&list=ID (ID no grupo 1)
+YOUTUBE_PLAYLIST_PATTERN = re.compile(
+    r'^(?:https?://)?(?:(?:www|m|music)\.)?youtube\.com/(?:playlist|watch)/?\?(?:[^#]*&)?list=([A-Za-z0-9_-]+)',
+    re.IGNORECASE
+)
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    """
+    Extrai o ID canônico (11 caracteres) de uma URL de vídeo do YouTube.
+    
+    É a chave de tudo que faz cache ou deduplicação: youtu.be/X,
+    youtube.com/watch?v=X&t=30, m.youtube.com/watch?v=X e /shorts/X
+    resultam no mesmo ID.
+    
+    Args:
+        url: URL do vídeo (watch, youtu.be, shorts, embed ou live)
+    
+    Returns:
+        str: ID do vídeo, ou None se a URL não apontar para um vídeo
+    """
+    match = YOUTUBE_URL_PATTERN.match(str(url).strip())
+    return match.group(1) if match else None
+
+
 def validate_youtube_url(url: str) -> bool:
-    """Valida se é uma URL válida do YouTube"""
-    url_str = str(url)
-    youtube_domains = ['youtube.com', 'youtu.be', 'www.youtube.com']
-    return any(domain in url_str for domain in youtube_domains)
+    """Valida se é uma URL de vídeo do YouTube (com ID extraível)"""
+    return extract_video_id(url) is not None
+
+
+def extract_playlist_id(url: str) -> Optional[str]:
+    """
+    Extrai o ID de uma playlist do YouTube.
+    
+    Args:
+        url: URL da playlist (ou de um vídeo aberto dentro dela)
+    
+    Returns:
+        str: ID da playlist, ou None se a URL não tiver uma
+    """
+    match = YOUTUBE_PLAYLIST_PATTERN.match(str(url).strip())
+    return match.group(1) if match else None
@@ -0,0 +1,80 @@
+"""
+Benchmark: tempo até o primeiro byte de um stream do yt-dlp.
+
+Compara a CLI iniciada a cada pedido (interpretador novo + import do yt_dlp)
+com um processo de reserva do WarmProcessPool, que já fez o import. Sem
+--url, o yt-dlp lê um arquivo local (file://), então só a inicialização é
+medida; com --url inclui a extração e a primeira resposta do YouTube.
+
+Uso:
+    python benchmarks/bench_warm_workers.py
+    python benchmarks/bench_warm_workers.py --runs 10
+    python benchmarks/bench_warm_workers.py --url https://youtu.be/dQw4w9WgXcQ --runs 3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import downloader
+from app.core.warm_workers import WarmProcessPool
+
+# Folga para o processo de reserva terminar o aquecimento antes do pedido
+WARMUP_SECONDS = 2.5
+
+
+async def first_byte(args, pool):
+    """Segundos até o primeiro chunk do stream"""
+    downloader.warm_pool = pool
+    started = time.perf_counter()
+    elapsed = None
+    async for _ in downloader.stream_pipeline([['yt-dlp', *args]], "bench"):
+        if elapsed is None:
+            elapsed = time.perf_counter() - started
+    return elapsed
+
+
+async def measure(label, args, pool, runs):
+    times = []
+    for _ in range(runs):
+        if pool.enabled:
+            # Reserva pronta e aquecida (import + extractors), como entre pedidos no servidor
+            pool.fill()
+            while pool.stats()["idle"] < pool.size:
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(WARMUP_SECONDS)
+        times.append(await first_byte(args, pool))
+    average = sum(times) / len(times) * 1000
+    print(f"{label:<28} média {average:8.1f} ms   mín {min(times) * 1000:8.1f} ms")
+    return average
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='streams por cenário')
+    parser.add_argument('--url', help='vídeo do YouTube (rede) em vez de arquivo local')
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix='.webm') as media:
+        media.write(os.urandom(256 * 1024))
+        media.flush()
+        if args.url:
+            ytdlp_args = ['-f', 'bestaudio', '--quiet', '--no-warnings', '-o', '-', args.url]
+        else:
+            ytdlp_args = ['--enable-file-urls', '--quiet', '--no-warnings', '-o', '-', f'file://{media.name}']
+
+        print(f"{args.runs} streams por cenário\n")
+        cold = await measure("CLI a cada stream", ytdlp_args, WarmProcessPool(0), args.runs)
+        pool = WarmProcessPool(1)
+        warm = await measure("processo de reserva", ytdlp_args, pool, args.runs)
+        await pool.close()
+
+    print(f"\nPrimeiro byte {cold - warm:.1f} ms mais cedo ({cold / warm:.1f}x)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Benchmark: custo por pedido de criar um YoutubeDL novo vs reaproveitar do pool.
+
+Mede só a preparação do yt-dlp (opções, extractors e checagem do ffmpeg),
+sem rede, para a instância de download ('fetch'): a conversão chama o
+ffmpeg direto, sem YoutubeDL. Com --url mede também a extração de metadados
+real, onde a instância reaproveitada mantém as conexões HTTP abertas.
+
+Uso:
+    python benchmarks/bench_ydl_pool.py
+    python benchmarks/bench_ydl_pool.py --runs 200
+    python benchmarks/bench_ydl_pool.py --url https://youtu.be/dQw4w9WgXcQ --runs 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+from app.core.ydl_pool import YoutubeDLPool
+
+FETCH_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'restrictfilenames': True,
+    'noplaylist': True,
+}
+
+# Atraso fixo que fetch_audio fazia antes de cada download
+REMOVED_SLEEP_SECONDS = 1.0
+
+
+def fresh(opts, work):
+    with yt_dlp.YoutubeDL(dict(opts)) as ydl:
+        work(ydl)
+
+
+def pooled(pool, key, opts, work):
+    with pool.session(key, opts, {'outtmpl': '/tmp/bench/%(title)s.%(ext)s'}) as ydl:
+        work(ydl)
+
+
+def measure(label, func, runs):
+    func()  # aquecimento (imports preguiçosos do yt-dlp)
+    started = time.perf_counter()
+    for _ in range(runs):
+        func()
+    per_call = (time.perf_counter() - started) / runs * 1000
+    print(f"{label:<34} {per_call:9.2f} ms/pedido")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=50, help='pedidos por cenário')
+    parser.add_argument('--url', help='mede também extract_info (rede)')
+    args = parser.parse_args()
+
+    runs = args.runs
+    if args.url:
+        work = lambda ydl: ydl.extract_info(args.url, download=False)
+    else:
+        work = lambda ydl: None
+
+    pool = YoutubeDLPool()
+    print(f"{runs} pedidos por cenário\n")
+    new = measure("fetch: YoutubeDL novo", lambda: fresh(FETCH_OPTS, work), runs)
+    reused = measure("fetch: pool", lambda: pooled(pool, 'fetch', FETCH_OPTS, work), runs)
+    print()
+
+    saved = new - reused
+    print(f"Economia de preparação por pedido (download): {saved:.2f} ms")
+    print(f"Economia total com o sleep removido: {saved + REMOVED_SLEEP_SECONDS * 1000:.2f} ms")
+    print(f"Pool: {pool.stats()}")
+    pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from apscheduler.schedulers.background import BackgroundScheduler
 
 from app.config import settings
+from app.core.warm_workers import warm_pool
+from app.core.ydl_pool import ydl_pool
 from app.routes.download import router as download_router
+from app.routes.stats import router as stats_router
+from app.routes.jobs import router as jobs_router
+from app.routes.batch import router as batch_router
+from app.services.cache_index import cache_index
 from app.services.cleanup import cleanup_old_files, cleanup_all_temp_files
+from app.services.registry import shared_registry
 
 def create_app() -> FastAPI:
     """Factory function para criar a aplicação FastAPI"""
@@ -22,11 +29,22 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
-        expose_headers=["Content-Disposition", "Accept-Ranges", "Content-Length"],
+        expose_headers=[
+            "Content-Disposition",
+            "Accept-Ranges",
+            "Content-Length",
+            "Content-Range",
+            "ETag",
+            "Last-Modified",
+            "Retry-After",
+        ],
     )
     
     # Registrar rotas
     app.include_router(download_router)
+    app.include_router(stats_router)
+    app.include_router(jobs_router)
+    app.include_router(batch_router)
     
     @app.get("/")
     def root():
@@ -41,9 +59,15 @@ def create_app() -> FastAPI:
     async def startup():
         """Executado ao iniciar a aplicação"""
         print("🚀 API iniciada")
+        # Índice do cache carregado em todos os workers antes do primeiro request
+        cache_index.load()
         cleanup_old_files()
         
+        # Processos yt-dlp de reserva: o primeiro stream já não paga o import
+        warm_pool.fill()
+        
         # Iniciar scheduler para limpeza periódica
+        # (todos os workers agendam; só o líder, via flock, executa a remoção)
         scheduler = BackgroundScheduler()
         scheduler.add_job(
             cleanup_old_files,
@@ -57,7 +81,14 @@ def create_app() -> FastAPI:
     async def shutdown():
         """Executado ao desligar a aplicação"""
         print("🛑 API desligada")
-        cleanup_all_temp_files()
+        ydl_pool.close()
+        await warm_pool.close()
+        if settings.CLEANUP_ON_SHUTDOWN:
+            cleanup_all_temp_files()
+        else:
+            # Mantém o cache aquecido para o próximo start (deploys, reinícios)
+            cache_index.close()
+            shared_registry.close()
     
     return app
 
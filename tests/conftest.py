@@ -9,6 +9,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from main import app
 from app.config import settings
+from app.services.registry import shared_registry
 
 @pytest.fixture
 def client():
@@ -27,7 +28,8 @@ def temp_dir_test(tmp_path):
     
     yield test_temp
     
-    # Restaurar e limpar
+    # Restaurar e limpar (escritas pendentes do registro vão antes do diretório)
+    shared_registry.close()
     settings.TEMP_DIR = original_temp
     if test_temp.exists():
         shutil.rmtree(test_temp)
@@ -38,7 +40,7 @@ def sample_urls():
     return {
         "valid_regular": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
         "valid_short": "https://youtu.be/dQw4w9WgXcQ",
-        "valid_youtube_short": "https://www.youtube.com/shorts/ABC123",
+        "valid_youtube_short": "https://www.youtube.com/shorts/ABC123def45",
         "invalid_youtube": "https://youtube.com/invalid",
         "invalid_url": "https://google.com/search?q=test",
         "malformed_url": "not-a-url",
@@ -1,3 +1,4 @@
+import json
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
@@ -7,6 +8,12 @@ app = create_app()
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def isolated_temp_dir(temp_dir_test):
+    """Cache, índice e registro compartilhado de cada teste fora do temp/ do projeto"""
+    yield temp_dir_test
+
+
 class TestRootEndpoint:
     """Testes para o endpoint raiz"""
     
@@ -64,7 +71,7 @@ class TestFormatsEndpoint:
             ]
         }
         
-        response = client.get("/api/formats?url=https://www.youtube.com/watch?v=test123")
+        response = client.get("/api/formats?url=https://www.youtube.com/watch?v=dQw4w9WgXcQ")
         assert response.status_code == 200
         
         data = response.json()
@@ -78,12 +85,84 @@ class TestFormatsEndpoint:
         """Deve retornar erro 500 quando a extração de metadados falha"""
         mock_extract.side_effect = Exception("Video not found")
         
-        response = client.get("/api/formats?url=https://www.youtube.com/watch?v=invalid")
+        response = client.get("/api/formats?url=https://www.youtube.com/watch?v=unavailabl1")
         assert response.status_code == 500
         data = response.json()
         assert "detail" in data
 
 
+class TestFormatsBulkEndpoint:
+    """Testes para o endpoint POST /api/formats/bulk"""
+    
+    METADATA = {
+        'title': 'Test Video',
+        'duration': 120,
+        'uploader': 'Test Channel',
+        'formats': [{'format_id': '18', 'ext': 'mp4', 'resolution': '360p', 'height': 360}]
+    }
+    
+    async def fake_extract(self, url):
+        if url.endswith("unavailabl1"):
+            raise Exception("Video not found")
+        if url.endswith("livestream1"):
+            return dict(self.METADATA, duration=None)
+        return self.METADATA
+    
+    def test_bulk_rejects_empty_or_too_many_urls(self):
+        """Deve retornar 422 sem URLs ou acima do limite"""
+        assert client.post("/api/formats/bulk", json={"urls": []}).status_code == 422
+        urls = ["https://youtu.be/dQw4w9WgXcQ"] * 51
+        assert client.post("/api/formats/bulk", json={"urls": urls}).status_code == 422
+    
+    def test_bulk_returns_partial_results_in_order(self):
+        """Deve responder 200 com metadados ou erro por item, na ordem do pedido"""
+        urls = [
+            "https://youtu.be/unavailabl1",
+            "https://google.com",
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        ]
+        with patch("app.services.youtube.extract_video_metadata", side_effect=self.fake_extract):
+            response = client.post("/api/formats/bulk", json={"urls": urls})
+        
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [item["url"] for item in results] == urls
+        assert [item["index"] for item in results] == [0, 1, 2]
+        assert results[0]["error"] == "Video not found"
+        assert results[1]["metadata"] is None and results[1]["error"]
+        assert results[2]["error"] is None
+        assert results[2]["metadata"]["title"] == "Test Video"
+        assert results[2]["metadata"]["formats"][0]["quality_label"] == "360p"
+    
+    def test_bulk_streams_ndjson(self):
+        """Com stream, deve responder uma linha JSON por vídeo"""
+        urls = ["https://youtu.be/dQw4w9WgXcQ", "https://youtu.be/unavailabl1"]
+        with patch("app.services.youtube.extract_video_metadata", side_effect=self.fake_extract):
+            response = client.post("/api/formats/bulk", json={"urls": urls, "stream": True})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        by_index = {item["index"]: item for item in lines}
+        assert sorted(by_index) == [0, 1]
+        assert by_index[0]["metadata"]["title"] == "Test Video"
+        assert by_index[1]["error"] == "Video not found"
+    
+    def test_bulk_invalid_metadata_is_item_error(self):
+        """Metadados fora do schema (ex: live sem duração) não derrubam a resposta"""
+        urls = ["https://youtu.be/livestream1", "https://youtu.be/dQw4w9WgXcQ"]
+        with patch("app.services.youtube.extract_video_metadata", side_effect=self.fake_extract):
+            response = client.post("/api/formats/bulk", json={"urls": urls})
+            streamed = client.post("/api/formats/bulk", json={"urls": urls, "stream": True})
+        
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert results[0]["metadata"] is None
+        assert "duration" in results[0]["error"]
+        assert results[1]["metadata"]["title"] == "Test Video"
+        assert len(streamed.text.splitlines()) == 2
+
+
 class TestDownloadStreamEndpoint:
     """Testes para o endpoint POST /api/download-stream"""
     
@@ -96,7 +175,7 @@ class TestDownloadStreamEndpoint:
         """Deve retornar erro 422 quando falta campo format_id"""
         response = client.post(
             "/api/download-stream",
-            json={"url": "https://www.youtube.com/watch?v=test123"}
+            json={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ"}
         )
         assert response.status_code == 422
     
@@ -112,7 +191,7 @@ class TestDownloadStreamEndpoint:
         assert response.status_code == 400
     
     @patch('app.routes.download.extract_video_metadata')
-    @patch('app.routes.download.stream_video')
+    @patch('app.routes.download.stream_youtube_video')
     def test_download_stream_accepts_valid_request(self, mock_stream, mock_extract):
         """Deve aceitar requisição válida e iniciar streaming"""
         # Mock metadados
@@ -129,13 +208,53 @@ class TestDownloadStreamEndpoint:
         response = client.post(
             "/api/download-stream",
             json={
-                "url": "https://www.youtube.com/watch?v=test123",
+                "url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
                 "format_id": "18"
             }
         )
         
         # Deve retornar streaming (200) ou erro de streaming
         assert response.status_code in [200, 500]
+    
+    @patch('app.routes.download.extract_video_metadata')
+    @patch('app.routes.download.stream_youtube_video')
+    def test_download_stream_resolves_selection_rule(self, mock_stream, mock_extract):
+        """A regra select escolhe o formato no servidor"""
+        mock_extract.return_value = {
+            'title': 'Test Video',
+            'formats': [
+                {'format_id': '249', 'ext': 'webm', 'vcodec': 'none', 'abr': 48, 'filesize': 1_000_000},
+                {'format_id': '251', 'ext': 'webm', 'vcodec': 'none', 'abr': 135, 'filesize': 3_000_000},
+            ]
+        }
+        mock_stream.return_value = iter([b'audio'])
+        
+        response = client.post(
+            "/api/download-stream",
+            json={
+                "url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+                "select": {"kind": "audio", "prefer": "smallest"}
+            }
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["x-format-id"] == "249"
+        assert mock_stream.call_args.args[1] == "249"
+    
+    @patch('app.routes.download.extract_video_metadata')
+    def test_download_stream_rejects_unsatisfiable_rule(self, mock_extract):
+        """Deve retornar 422 se nenhum formato atender à regra"""
+        mock_extract.return_value = {'title': 'Test Video', 'formats': []}
+        
+        response = client.post(
+            "/api/download-stream",
+            json={
+                "url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+                "select": {"kind": "video", "max_filesize": 1000}
+            }
+        )
+        
+        assert response.status_code == 422
 
 
 class TestDownloadEndpoint:
@@ -163,12 +282,119 @@ class TestDownloadEndpoint:
         
         response = client.post(
             "/api/download",
-            json={"url": "https://www.youtube.com/watch?v=test123"}
+            json={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ"}
         )
         
         assert response.status_code == 500
         data = response.json()
         assert "detail" in data
+    
+    def test_download_rejects_unknown_format(self):
+        """Deve retornar erro 422 para formato fora de mp3/m4a/opus"""
+        response = client.post(
+            "/api/download",
+            json={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "format": "flac"}
+        )
+        assert response.status_code == 422
+    
+    def test_passthrough_format_is_served_with_its_media_type(self, tmp_path):
+        """m4a deve chegar ao download e ser servido como audio/mp4"""
+        path = tmp_path / "audio.m4a"
+        path.write_bytes(b"dummy audio")
+        mock_download = AsyncMock(return_value=path)
+        
+        with patch("app.routes.download.download_youtube_audio", new=mock_download):
+            response = client.get(
+                "/api/download",
+                params={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "format": "m4a"}
+            )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "audio/mp4"
+        assert mock_download.call_args.kwargs["audio_format"] == "m4a"
+    
+    def test_clip_reaches_download(self, tmp_path):
+        """start/end chegam ao download como trecho"""
+        path = tmp_path / "audio.mp3"
+        path.write_bytes(b"dummy audio")
+        mock_download = AsyncMock(return_value=path)
+        
+        with patch("app.routes.download.download_youtube_audio", new=mock_download):
+            response = client.post(
+                "/api/download",
+                json={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "start": 30, "end": 60}
+            )
+        
+        assert response.status_code == 200
+        assert mock_download.call_args.kwargs["clip"] == (30.0, 60.0)
+    
+    def test_download_rejects_inverted_clip(self):
+        """Deve retornar erro 422 quando end não é maior que start"""
+        response = client.post(
+            "/api/download",
+            json={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "start": 60, "end": 30}
+        )
+        assert response.status_code == 422
+        
+        response = client.get(
+            "/api/download",
+            params={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "start": 60, "end": 30}
+        )
+        assert response.status_code == 422
+
+
+class TestBatchEndpoint:
+    """Testes para o endpoint POST /api/batch"""
+    
+    def test_batch_requires_urls_or_playlist(self):
+        """Deve retornar 422 sem urls nem playlist_url, ou com os dois"""
+        assert client.post("/api/batch", json={}).status_code == 422
+        response = client.post("/api/batch", json={
+            "urls": ["https://youtu.be/dQw4w9WgXcQ"],
+            "playlist_url": "https://www.youtube.com/playlist?list=PL123"
+        })
+        assert response.status_code == 422
+    
+    def test_batch_rejects_invalid_url(self):
+        """Deve retornar 400 se alguma URL não for vídeo do YouTube"""
+        response = client.post("/api/batch", json={
+            "urls": ["https://youtu.be/dQw4w9WgXcQ", "https://google.com"]
+        })
+        assert response.status_code == 400
+        assert "google.com" in response.json()["detail"]
+    
+    def test_batch_streams_zip(self):
+        """Deve responder com o ZIP gerado pelo serviço"""
+        async def fake_zip(urls, batch_id, audio_format="mp3"):
+            yield b"PK"
+        
+        with patch("app.routes.batch.stream_batch_zip", side_effect=fake_zip) as mock_zip:
+            response = client.post("/api/batch", json={
+                "urls": ["https://youtu.be/dQw4w9WgXcQ"], "format": "m4a"
+            })
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/zip"
+        assert response.content == b"PK"
+        assert mock_zip.call_args.args[0] == ["https://youtu.be/dQw4w9WgXcQ"]
+        assert mock_zip.call_args.args[2] == "m4a"
+    
+    def test_batch_expands_playlist(self):
+        """playlist_url é expandida em URLs de vídeo"""
+        urls = ["https://www.youtube.com/watch?v=dQw4w9WgXcQ"]
+        
+        async def fake_zip(urls, batch_id, audio_format="mp3"):
+            yield b"PK"
+        
+        with patch("app.routes.batch.expand_playlist", new=AsyncMock(return_value=urls)) as mock_expand, \
+             patch("app.routes.batch.stream_batch_zip", side_effect=fake_zip) as mock_zip:
+            response = client.post("/api/batch", json={
+                "playlist_url": "https://www.youtube.com/playlist?list=PL123"
+            })
+        
+        assert response.status_code == 200
+        assert mock_expand.call_args.args[0] == "https://www.youtube.com/playlist?list=PL123"
+        assert mock_zip.call_args.args[0] == urls
 
 
 class TestAPIDocumentation:
@@ -191,3 +417,229 @@ class TestAPIDocumentation:
         assert "/api/download-stream" in data["paths"]
         assert "/api/download" in data["paths"]
 
+
+class TestStatsEndpoint:
+    """Testes para o endpoint GET /api/stats"""
+    
+    def test_stats_returns_metadata_cache_counters(self):
+        """Deve retornar os contadores do cache de metadados"""
+        response = client.get("/api/stats")
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert "metadata_cache" in data
+        assert "hits" in data["metadata_cache"]
+        assert "misses" in data["metadata_cache"]
+
+
+class TestDownloadRangeRequests:
+    """Testes para retomada de downloads via Range (GET/POST /api/download)"""
+    
+    URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    
+    @pytest.fixture
+    def mp3_file(self, tmp_path):
+        path = tmp_path / "audio.mp3"
+        path.write_bytes(bytes(range(100)))
+        with patch("app.routes.download.download_youtube_audio", new=AsyncMock(return_value=path)):
+            yield path
+    
+    def test_full_download_has_validators(self, mp3_file):
+        """Resposta completa deve anunciar Range e trazer ETag/Last-Modified"""
+        response = client.get("/api/download", params={"url": self.URL})
+        
+        assert response.status_code == 200
+        assert response.headers["accept-ranges"] == "bytes"
+        assert "etag" in response.headers
+        assert "last-modified" in response.headers
+        assert len(response.content) == 100
+    
+    def test_single_range_returns_206(self, mp3_file):
+        """Range simples deve retornar apenas os bytes pedidos"""
+        response = client.get(
+            "/api/download",
+            params={"url": self.URL},
+            headers={"Range": "bytes=90-"}
+        )
+        
+        assert response.status_code == 206
+        assert response.headers["content-range"] == "bytes 90-99/100"
+        assert response.content == bytes(range(90, 100))
+    
+    def test_post_honors_range(self, mp3_file):
+        """POST /api/download também deve respeitar Range"""
+        response = client.post(
+            "/api/download",
+            json={"url": self.URL},
+            headers={"Range": "bytes=0-9"}
+        )
+        
+        assert response.status_code == 206
+        assert response.content == bytes(range(10))
+    
+    def test_multi_range_returns_multipart(self, mp3_file):
+        """Múltiplos ranges devem retornar multipart/byteranges"""
+        response = client.get(
+            "/api/download",
+            params={"url": self.URL},
+            headers={"Range": "bytes=0-9,50-59"}
+        )
+        
+        assert response.status_code == 206
+        assert response.headers["content-type"].startswith("multipart/byteranges")
+    
+    def test_if_range_with_stale_etag_returns_full_file(self, mp3_file):
+        """If-Range com ETag desatualizado deve retornar o arquivo inteiro"""
+        response = client.get(
+            "/api/download",
+            params={"url": self.URL},
+            headers={"Range": "bytes=90-", "If-Range": '"stale-etag"'}
+        )
+        
+        assert response.status_code == 200
+        assert len(response.content) == 100
+    
+    def test_if_range_with_current_etag_returns_206(self, mp3_file):
+        """If-Range com o ETag atual deve retomar do byte pedido"""
+        etag = client.get("/api/download", params={"url": self.URL}).headers["etag"]
+        response = client.get(
+            "/api/download",
+            params={"url": self.URL},
+            headers={"Range": "bytes=90-", "If-Range": etag}
+        )
+        
+        assert response.status_code == 206
+        assert response.content == bytes(range(90, 100))
+    
+    def test_unsatisfiable_range_returns_416(self, mp3_file):
+        """Range fora do arquivo deve retornar 416"""
+        response = client.get(
+            "/api/download",
+            params={"url": self.URL},
+            headers={"Range": "bytes=500-600"}
+        )
+        
+        assert response.status_code == 416
+    
+    def test_rejected_range_releases_pin(self, temp_dir_test):
+        """416/400 (sem background tasks) não podem deixar a entrada fixada"""
+        from app.services.cache_index import cache_index
+        entry = temp_dir_test / "dQw4w9WgXcQ_mp3_192"
+        entry.mkdir()
+        path = entry / "audio.mp3"
+        path.write_bytes(bytes(range(100)))
+        
+        with patch("app.routes.download.download_youtube_audio", new=AsyncMock(return_value=path)):
+            for header in ("bytes=500-600", "bytes=abc"):
+                response = client.get("/api/download", params={"url": self.URL}, headers={"Range": header})
+                assert response.status_code in (400, 416)
+        
+        with patch.object(cache_index, "max_bytes", -1):
+            assert cache_index.evict() == ["dQw4w9WgXcQ_mp3_192"]
+
+
+class TestAdmissionControl:
+    """Testes para respostas 429 quando o servidor está sem vagas"""
+    
+    def test_download_returns_429_with_retry_after(self):
+        """Sem vaga e sem fila, o download deve ser recusado com Retry-After"""
+        from app.services.admission import AdmissionController
+        full = AdmissionController(max_in_flight=0, max_queue=0, queue_timeout=1)
+        
+        with patch("app.routes.download.download_admission", full), \
+             patch("app.routes.download.audio_requires_work", return_value=True):
+            response = client.post(
+                "/api/download",
+                json={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ"}
+            )
+        
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+
+
+class TestClientDisconnect:
+    """Testes para o cancelamento quando o cliente desconecta"""
+    
+    def test_disconnect_cancels_pending_work(self):
+        """Desconexão do cliente deve cancelar o trabalho em andamento"""
+        import asyncio
+        from app.routes.download import _cancel_on_disconnect, ClientDisconnected
+        cancelled = []
+        
+        class DisconnectedRequest:
+            async def is_disconnected(self):
+                return True
+        
+        async def slow_download():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+        
+        async def run():
+            with pytest.raises(ClientDisconnected):
+                await _cancel_on_disconnect(DisconnectedRequest(), slow_download())
+            await asyncio.sleep(0)
+        
+        with patch("app.routes.download.settings.DISCONNECT_POLL_SECONDS", 0.01):
+            asyncio.run(run())
+        
+        assert cancelled == [1]
+    
+    def test_result_finished_during_disconnect_check_is_discarded(self):
+        """Resultado pronto enquanto a desconexão era verificada vai para on_discard"""
+        import asyncio
+        from app.routes.download import _cancel_on_disconnect, ClientDisconnected
+        discarded = []
+        
+        async def run():
+            ready = asyncio.Event()
+            
+            class DisconnectingRequest:
+                async def is_disconnected(self):
+                    # A vaga é concedida durante a verificação
+                    ready.set()
+                    await asyncio.sleep(0.01)
+                    return True
+            
+            async def acquire():
+                await ready.wait()
+                return "ticket"
+            
+            with pytest.raises(ClientDisconnected):
+                await _cancel_on_disconnect(DisconnectingRequest(), acquire(), on_discard=discarded.append)
+        
+        with patch("app.routes.download.settings.DISCONNECT_POLL_SECONDS", 0.01):
+            asyncio.run(run())
+        
+        assert discarded == ["ticket"]
+
+
+class TestJobsEndpoints:
+    """Testes para os endpoints /api/jobs"""
+    
+    def test_create_job_rejects_invalid_url(self):
+        """Deve retornar 400 para URL que não é do YouTube"""
+        response = client.post("/api/jobs", json={"url": "https://google.com"})
+        assert response.status_code == 400
+    
+    def test_unknown_job_returns_404(self):
+        """Job inexistente deve retornar 404"""
+        assert client.get("/api/jobs/naoexiste").status_code == 404
+        assert client.get("/api/jobs/naoexiste/file").status_code == 404
+    
+    def test_file_of_unfinished_job_returns_409(self):
+        """Arquivo de job não concluído deve retornar 409"""
+        from app.services.jobs import job_manager, Job
+        job = Job("https://youtu.be/dQw4w9WgXcQ")
+        job_manager._jobs[job.id] = job
+        
+        try:
+            response = client.get(f"/api/jobs/{job.id}")
+            assert response.status_code == 200
+            assert response.json()["state"] == "queued"
+            
+            assert client.get(f"/api/jobs/{job.id}/file").status_code == 409
+        finally:
+            del job_manager._jobs[job.id]
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from app.services.admission import AdmissionController, OverloadedError, release_when_done
+
+
+class TestAdmissionController:
+    """Testes para o controle de admissão"""
+    
+    def test_admits_up_to_max_in_flight(self):
+        """Deve admitir direto enquanto houver vaga"""
+        controller = AdmissionController(max_in_flight=2, max_queue=0, queue_timeout=1)
+        
+        async def run():
+            first = await controller.acquire()
+            second = await controller.acquire()
+            with pytest.raises(OverloadedError):
+                await controller.acquire()
+            first.release()
+            second.release()
+        
+        asyncio.run(run())
+        assert controller.in_flight == 0
+        assert controller.rejected == 1
+    
+    def test_queued_request_gets_released_slot(self):
+        """Pedido na fila deve receber a vaga liberada"""
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=1)
+        
+        async def run():
+            first = await controller.acquire()
+            waiting = asyncio.ensure_future(controller.acquire())
+            await asyncio.sleep(0.01)
+            assert controller.queued == 1
+            
+            first.release()
+            second = await waiting
+            assert controller.in_flight == 1
+            second.release()
+        
+        asyncio.run(run())
+        assert controller.in_flight == 0
+    
+    def test_queue_deadline_rejects(self):
+        """Pedido que espera além do prazo deve ser recusado"""
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.02)
+        
+        async def run():
+            ticket = await controller.acquire()
+            with pytest.raises(OverloadedError):
+                await controller.acquire()
+            assert controller.queued == 0
+            ticket.release()
+        
+        asyncio.run(run())
+        assert controller.in_flight == 0
+    
+    def test_retry_after_uses_recent_durations(self):
+        """Retry-After deve refletir a duração dos trabalhos recentes"""
+        controller = AdmissionController(max_in_flight=1, max_queue=0, queue_timeout=1)
+        controller._durations.extend([4.0, 6.0])
+        
+        assert controller.retry_after() == 5
+    
+    def test_release_when_done_frees_slot(self):
+        """A vaga de um stream deve ser liberada ao fim do stream"""
+        controller = AdmissionController(max_in_flight=1, max_queue=0, queue_timeout=1)
+        
+        async def chunks():
+            yield b'a'
+            yield b'b'
+        
+        async def run():
+            ticket = await controller.acquire()
+            data = b''
+            async for chunk in release_when_done(chunks(), ticket):
+                data += chunk
+            return data
+        
+        assert asyncio.run(run()) == b'ab'
+        assert controller.in_flight == 0
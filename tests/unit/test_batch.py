@@ -0,0 +1,94 @@
+import asyncio
+import io
+import zipfile
+from unittest.mock import patch
+from app.config import settings
+from app.services import batch
+from app.services.batch import stream_batch_zip, ERRORS_FILENAME
+
+URLS = [
+    "https://youtu.be/aaaaaaaaaaa",
+    "https://youtu.be/bbbbbbbbbbb",
+    "https://youtu.be/ccccccccccc",
+]
+
+
+def collect(urls, fake_download) -> bytes:
+    async def run():
+        chunks = []
+        async for chunk in stream_batch_zip(urls, "batch1"):
+            chunks.append(chunk)
+        return b''.join(chunks)
+    
+    with patch.object(batch, "download_youtube_audio", side_effect=fake_download), \
+         patch.object(batch, "audio_requires_work", return_value=False):
+        return asyncio.run(run())
+
+
+class TestStreamBatchZip:
+    """Testes para o ZIP do lote montado em stream"""
+    
+    def test_builds_valid_stored_zip(self, tmp_path):
+        """Cada faixa entra no ZIP, sem compressão, com a posição no nome"""
+        async def fake_download(url, video_id, audio_format="mp3"):
+            path = tmp_path / f"{url[-11:]}.mp3"
+            path.write_bytes(url.encode() * 5000)
+            return path
+        
+        data = collect(URLS, fake_download)
+        
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            assert sorted(archive.namelist()) == ["1_aaaaaaaaaaa.mp3", "2_bbbbbbbbbbb.mp3", "3_ccccccccccc.mp3"]
+            assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+            assert archive.read("2_bbbbbbbbbbb.mp3") == URLS[1].encode() * 5000
+            assert archive.testzip() is None
+    
+    def test_tracks_enter_in_completion_order(self, tmp_path):
+        """A faixa que termina primeiro vai primeiro, sem esperar as outras"""
+        async def fake_download(url, video_id, audio_format="mp3"):
+            # A primeira URL é a mais lenta
+            await asyncio.sleep(0.2 if url == URLS[0] else 0.01)
+            path = tmp_path / f"{url[-11:]}.mp3"
+            path.write_bytes(b"audio")
+            return path
+        
+        data = collect(URLS[:2], fake_download)
+        
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            assert archive.namelist() == ["2_bbbbbbbbbbb.mp3", "1_aaaaaaaaaaa.mp3"]
+    
+    def test_failures_are_listed_and_do_not_stop_the_batch(self, tmp_path):
+        """Falhas ficam em erros.txt; as outras faixas são entregues"""
+        async def fake_download(url, video_id, audio_format="mp3"):
+            if url == URLS[1]:
+                raise Exception("vídeo indisponível")
+            path = tmp_path / f"{url[-11:]}.mp3"
+            path.write_bytes(b"audio")
+            return path
+        
+        data = collect(URLS, fake_download)
+        
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            assert len(archive.namelist()) == 3
+            errors = archive.read(ERRORS_FILENAME).decode()
+        assert "2. https://youtu.be/bbbbbbbbbbb: vídeo indisponível" in errors
+    
+    def test_parallelism_is_limited_per_batch(self, tmp_path, monkeypatch):
+        """No máximo BATCH_PARALLELISM downloads do lote ao mesmo tempo"""
+        monkeypatch.setattr(settings, "BATCH_PARALLELISM", 2)
+        running = [0]
+        peak = [0]
+        
+        async def fake_download(url, video_id, audio_format="mp3"):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.02)
+            running[0] -= 1
+            path = tmp_path / f"{video_id}.mp3"
+            path.write_bytes(b"audio")
+            return path
+        
+        urls = [f"https://youtu.be/{i:011d}" for i in range(6)]
+        collect(urls, fake_download)
+        
+        assert peak[0] == 2
@@ -0,0 +1,635 @@
+import asyncio
+import threading
+import time
+import pytest
+from pathlib import Path
+import sys
+from unittest.mock import patch, AsyncMock
+from app.services import youtube
+from app.services.singleflight import FlightHooks, SingleFlight
+from app.utils.ttl_cache import TTLCache
+from app.services.cache import (
+    lookup_cached_audio,
+    create_staging_dir,
+    commit_staging_dir,
+    discard_staging_dir,
+    get_cache_dir,
+    pin_cached_file,
+)
+from app.services.cache_index import cache_index
+from app.services.registry import shared_registry
+
+
+class TestAudioCache:
+    """Testes para o cache de áudios convertidos"""
+    
+    def test_lookup_miss_returns_none(self, temp_dir_test):
+        """Deve retornar None quando a chave não existe"""
+        assert lookup_cached_audio("dQw4w9WgXcQ_mp3_192") is None
+    
+    def test_staging_dir_is_not_a_hit(self, temp_dir_test):
+        """Download em andamento (.part) não deve ser servido"""
+        staging = create_staging_dir("dQw4w9WgXcQ_mp3_192", "req1")
+        (staging / "audio.mp3").write_text("partial")
+        
+        assert lookup_cached_audio("dQw4w9WgXcQ_mp3_192") is None
+    
+    def test_commit_publishes_entry(self, temp_dir_test):
+        """Após o commit, o arquivo deve ser encontrado no cache"""
+        staging = create_staging_dir("dQw4w9WgXcQ_mp3_192", "req1")
+        (staging / "audio.mp3").write_text("dummy audio")
+        
+        commit_staging_dir(staging, "dQw4w9WgXcQ_mp3_192")
+        
+        cached = lookup_cached_audio("dQw4w9WgXcQ_mp3_192")
+        assert cached is not None
+        assert cached.name == "audio.mp3"
+        assert not staging.exists()
+    
+    def test_commit_keeps_existing_entry(self, temp_dir_test):
+        """Se a chave já foi publicada, a pasta temporária é descartada"""
+        first = create_staging_dir("dQw4w9WgXcQ_mp3_192", "req1")
+        (first / "first.mp3").write_text("first")
+        commit_staging_dir(first, "dQw4w9WgXcQ_mp3_192")
+        
+        second = create_staging_dir("dQw4w9WgXcQ_mp3_192", "req2")
+        (second / "second.mp3").write_text("second")
+        commit_staging_dir(second, "dQw4w9WgXcQ_mp3_192")
+        
+        assert not second.exists()
+        assert lookup_cached_audio("dQw4w9WgXcQ_mp3_192").name == "first.mp3"
+
+    
+    def test_staging_pins_leave_shared_registry(self, temp_dir_test):
+        """Commit e descarte liberam a fixação da pasta .part também entre workers"""
+        committed = create_staging_dir("dQw4w9WgXcQ_mp3_192", "req1")
+        (committed / "audio.mp3").write_text("dummy audio")
+        commit_staging_dir(committed, "dQw4w9WgXcQ_mp3_192")
+        discard_staging_dir(create_staging_dir("9bZkp7q19f0_mp3_192", "req2"))
+        
+        shared_registry.flush()
+        assert shared_registry._query("SELECT name, count FROM pins", ()) == []
+    
+    def test_commit_over_budget_only_schedules_cleanup(self, temp_dir_test):
+        """Acima do orçamento, o commit agenda a limpeza em vez de executá-la"""
+        staging = create_staging_dir("dQw4w9WgXcQ_mp3_192", "req1")
+        (staging / "audio.mp3").write_text("x" * 100)
+        
+        with patch.object(cache_index, "max_bytes", 10), \
+             patch("app.services.cache.cleanup_leader_held", return_value=True), \
+             patch("app.services.cache.request_cleanup") as request, \
+             patch("app.services.cleanup.cleanup_old_files") as cleanup:
+            commit_staging_dir(staging, "dQw4w9WgXcQ_mp3_192")
+        
+        request.assert_called_once_with()
+        cleanup.assert_not_called()
+        assert lookup_cached_audio("dQw4w9WgXcQ_mp3_192") is not None
+    
+    def test_commit_on_follower_does_not_schedule_cleanup(self, temp_dir_test):
+        """Workers que não são o líder não agendam limpeza (ela não removeria nada)"""
+        staging = create_staging_dir("dQw4w9WgXcQ_mp3_192", "req1")
+        (staging / "audio.mp3").write_text("x" * 100)
+        
+        with patch.object(cache_index, "max_bytes", 10), \
+             patch("app.services.cache.cleanup_leader_held", return_value=False), \
+             patch("app.services.cache.request_cleanup") as request:
+            commit_staging_dir(staging, "dQw4w9WgXcQ_mp3_192")
+        
+        request.assert_not_called()
+    
+    def test_hit_protects_entry_from_eviction(self, temp_dir_test):
+        """Uma entrada acessada há pouco deve sobreviver a uma mais fria"""
+        for key in ("hot_mp3_192", "cold_mp3_192"):
+            staging = create_staging_dir(key, "req1")
+            (staging / "audio.mp3").write_text("x" * 100)
+            commit_staging_dir(staging, key)
+        
+        # "hot" foi publicada primeiro, mas é servida depois de "cold"
+        cached = lookup_cached_audio("hot_mp3_192")
+        pin_cached_file(cached)()
+        
+        with patch.object(cache_index, "max_bytes", 150):
+            evicted = cache_index.evict()
+        
+        assert evicted == ["cold_mp3_192"]
+        assert lookup_cached_audio("hot_mp3_192") is not None
+
+
+class TestDownloadYoutubeAudioCache:
+    """Testes para o uso do cache em download_youtube_audio"""
+    
+    def test_cache_hit_skips_download(self, temp_dir_test):
+        """Um acerto no cache não deve chamar o yt-dlp"""
+        cache_dir = get_cache_dir("dQw4w9WgXcQ_mp3_192")
+        cache_dir.mkdir()
+        (cache_dir / "audio.mp3").write_text("dummy audio")
+        
+        with patch.object(youtube, "fetch_audio") as mock_download:
+            result = asyncio.run(youtube.download_youtube_audio(
+                "https://youtu.be/dQw4w9WgXcQ", "req1"
+            ))
+        
+        mock_download.assert_not_called()
+        assert result == cache_dir / "audio.mp3"
+    
+    def test_miss_downloads_once_and_caches(self, temp_dir_test):
+        """URLs diferentes do mesmo vídeo devem compartilhar a entrada"""
+        def fake_download(url, output_path, progress_hooks=None, audio_format="mp3", resolved_info=None, clip=None):
+            (Path(output_path) / "audio.mp3").write_text("dummy audio")
+            return {}
+        
+        with patch.object(youtube, "fetch_audio", side_effect=fake_download) as mock_download, \
+             patch.object(youtube, "convert_audio"):
+            first = asyncio.run(youtube.download_youtube_audio(
+                "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=30", "req1"
+            ))
+            second = asyncio.run(youtube.download_youtube_audio(
+                "https://youtu.be/dQw4w9WgXcQ", "req2"
+            ))
+        
+        assert mock_download.call_count == 1
+        assert first == second
+        assert first.parent.name == "dQw4w9WgXcQ_mp3_192"
+    
+    def test_passthrough_format_has_its_own_entry(self, temp_dir_test):
+        """m4a não reaproveita o MP3 em cache e fica em uma entrada própria"""
+        mp3_dir = get_cache_dir("dQw4w9WgXcQ_mp3_192")
+        mp3_dir.mkdir()
+        (mp3_dir / "audio.mp3").write_text("dummy audio")
+        
+        def fake_download(url, output_path, progress_hooks=None, audio_format="mp3", resolved_info=None, clip=None):
+            (Path(output_path) / f"audio.{audio_format}").write_text("dummy audio")
+            return {}
+        
+        with patch.object(youtube, "fetch_audio", side_effect=fake_download) as mock_download, \
+             patch.object(youtube, "convert_audio") as mock_convert:
+            result = asyncio.run(youtube.download_youtube_audio(
+                "https://youtu.be/dQw4w9WgXcQ", "req1", audio_format="m4a"
+            ))
+        
+        assert mock_download.call_args.args[3] == "m4a"
+        assert mock_convert.call_args.args[3] == "m4a"
+        assert result.parent.name == "dQw4w9WgXcQ_m4a_copy"
+        assert result.suffix == ".m4a"
+    
+    def test_clip_has_its_own_entry(self, temp_dir_test):
+        """Um trecho não reaproveita o áudio completo e fica em entrada própria"""
+        full_dir = get_cache_dir("dQw4w9WgXcQ_mp3_192")
+        full_dir.mkdir()
+        (full_dir / "audio.mp3").write_text("dummy audio")
+        
+        def fake_download(url, output_path, progress_hooks=None, audio_format="mp3", resolved_info=None, clip=None):
+            (Path(output_path) / "audio.mp3").write_text("clip")
+            return {}
+        
+        with patch.object(youtube, "fetch_audio", side_effect=fake_download) as mock_download, \
+             patch.object(youtube, "convert_audio"):
+            result = asyncio.run(youtube.download_youtube_audio(
+                "https://youtu.be/dQw4w9WgXcQ", "req1", clip=(30.0, 60.0)
+            ))
+        
+        assert mock_download.call_args.args[5] == (30.0, 60.0)
+        assert result.parent.name == "dQw4w9WgXcQ_mp3_192_clip30000-60000"
+    
+    def test_failed_download_leaves_no_entry(self, temp_dir_test):
+        """Falha no download não deve deixar lixo nem entrada no cache"""
+        with patch.object(youtube, "fetch_audio", side_effect=Exception("erro de rede")):
+            with pytest.raises(Exception):
+                asyncio.run(youtube.download_youtube_audio(
+                    "https://youtu.be/dQw4w9WgXcQ", "req1"
+                ))
+        
+        entries = [p for p in temp_dir_test.iterdir() if not p.name.startswith('.')]
+        assert entries == []
+
+
+class TestResolvedUrls:
+    """Testes para o cache de URLs de mídia já resolvidas"""
+    
+    @staticmethod
+    def info(expires_in: float, format_ids=("140", "137")) -> dict:
+        expire = int(time.time() + expires_in)
+        return {
+            'id': 'dQw4w9WgXcQ',
+            'webpage_url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+            'subtitles': {'en': [{'url': 'https://example.com/sub.vtt'}]},
+            'formats': [
+                {'format_id': fid, 'url': f'https://rr1.googlevideo.com/videoplayback?expire={expire}&itag={fid}'}
+                for fid in format_ids
+            ],
+        }
+    
+    def test_valid_urls_are_kept_until_expiry(self):
+        """O item vale até o expire menos a folga e perde campos grandes"""
+        cache = TTLCache(maxsize=4, ttl_seconds=0)
+        with patch.object(youtube, "resolved_cache", cache):
+            youtube.remember_resolved("dQw4w9WgXcQ", self.info(6 * 3600))
+            info = youtube.resolved_info("dQw4w9WgXcQ", "137+140")
+        
+        assert info is not None
+        assert 'subtitles' not in info
+        expires_at, _ = cache._data["dQw4w9WgXcQ"]
+        assert expires_at - time.monotonic() == pytest.approx(6 * 3600 - 1800, abs=5)
+    
+    def test_urls_about_to_expire_are_not_kept(self):
+        """URLs que expiram dentro da folga não entram no cache"""
+        with patch.object(youtube, "resolved_cache", TTLCache(maxsize=4, ttl_seconds=0)):
+            youtube.remember_resolved("dQw4w9WgXcQ", self.info(600))
+            assert youtube.resolved_info("dQw4w9WgXcQ") is None
+    
+    def test_missing_format_is_a_miss(self):
+        """Formato fora dos resolvidos exige nova extração"""
+        with patch.object(youtube, "resolved_cache", TTLCache(maxsize=4, ttl_seconds=0)):
+            youtube.remember_resolved("dQw4w9WgXcQ", self.info(6 * 3600, ("140",)))
+            assert youtube.resolved_info("dQw4w9WgXcQ", "140") is not None
+            assert youtube.resolved_info("dQw4w9WgXcQ", "137+140") is None
+    
+    def test_second_download_reuses_resolved_info(self, temp_dir_test):
+        """O info do primeiro download é repassado ao seguinte (outro formato)"""
+        def fake_download(url, output_path, progress_hooks=None, audio_format="mp3", resolved_info=None, clip=None):
+            (Path(output_path) / f"audio.{audio_format}").write_text("dummy audio")
+            return self.info(6 * 3600)
+        
+        with patch.object(youtube, "resolved_cache", TTLCache(maxsize=4, ttl_seconds=0)), \
+             patch.object(youtube, "fetch_audio", side_effect=fake_download) as mock_download, \
+             patch.object(youtube, "convert_audio"):
+            asyncio.run(youtube.download_youtube_audio("https://youtu.be/dQw4w9WgXcQ", "req1"))
+            asyncio.run(youtube.download_youtube_audio(
+                "https://youtu.be/dQw4w9WgXcQ", "req2", audio_format="m4a"
+            ))
+        
+        first, second = mock_download.call_args_list
+        assert first.args[4] is None
+        assert second.args[4]['id'] == 'dQw4w9WgXcQ'
+
+
+class TestSingleFlight:
+    """Testes para deduplicação de downloads concorrentes"""
+    
+    def test_concurrent_calls_share_one_execution(self):
+        """Chamadas simultâneas com a mesma chave executam uma vez só"""
+        flight = SingleFlight()
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+        
+        async def run():
+            return await asyncio.gather(*[flight.do("key", work) for _ in range(10)])
+        
+        results = asyncio.run(run())
+        
+        assert calls == [1]
+        assert results == ["result"] * 10
+        assert flight.in_flight() == 0
+    
+    def test_errors_are_shared_and_not_cached(self):
+        """Erros chegam a todos os waiters e a próxima chamada tenta de novo"""
+        flight = SingleFlight()
+        calls = []
+        
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("falhou")
+        
+        async def run():
+            return await asyncio.gather(
+                *[flight.do("key", failing) for _ in range(3)],
+                return_exceptions=True
+            )
+        
+        results = asyncio.run(run())
+        assert all(isinstance(r, ValueError) for r in results)
+        assert calls == [1]
+        
+        asyncio.run(run())
+        assert calls == [1, 1]
+    
+    def test_concurrent_downloads_of_same_video(self, temp_dir_test):
+        """Pedidos simultâneos do mesmo vídeo devem baixar uma vez só"""
+        def fake_download(url, output_path, progress_hooks=None, audio_format="mp3", resolved_info=None, clip=None):
+            time.sleep(0.05)
+            (Path(output_path) / "audio.mp3").write_text("dummy audio")
+            return {}
+        
+        async def run():
+            return await asyncio.gather(*[
+                youtube.download_youtube_audio("https://youtu.be/dQw4w9WgXcQ", f"req{i}")
+                for i in range(5)
+            ])
+        
+        with patch.object(youtube, "fetch_audio", side_effect=fake_download) as mock_download, \
+             patch.object(youtube, "convert_audio"):
+            results = asyncio.run(run())
+        
+        assert mock_download.call_count == 1
+        assert len(set(results)) == 1
+    
+    def test_joined_download_reports_progress_to_every_caller(self, temp_dir_test):
+        """Quem se junta a um download em andamento também recebe o progresso"""
+        first_events, second_events = [], []
+        joined = threading.Event()
+        
+        def fake_download(url, output_path, progress_hooks=None, audio_format="mp3", resolved_info=None, clip=None):
+            for hook in progress_hooks:
+                hook({'status': 'downloading', 'downloaded_bytes': 10})
+            assert joined.wait(2)
+            for hook in progress_hooks:
+                hook({'status': 'downloading', 'downloaded_bytes': 20})
+            (Path(output_path) / "audio.mp3").write_text("dummy audio")
+            return {}
+        
+        async def run():
+            first = asyncio.ensure_future(youtube.download_youtube_audio(
+                "https://youtu.be/dQw4w9WgXcQ", "req1", progress_hooks=[first_events.append]
+            ))
+            while not first_events:
+                await asyncio.sleep(0.01)
+            second = asyncio.ensure_future(youtube.download_youtube_audio(
+                "https://youtu.be/dQw4w9WgXcQ", "req2", progress_hooks=[second_events.append]
+            ))
+            await asyncio.sleep(0.01)
+            joined.set()
+            return await asyncio.gather(first, second)
+        
+        with patch.object(youtube, "fetch_audio", side_effect=fake_download) as mock_download, \
+             patch.object(youtube, "convert_audio"):
+            asyncio.run(run())
+        
+        assert mock_download.call_count == 1
+        assert [d['downloaded_bytes'] for d in first_events] == [10, 20]
+        # O último evento chega na hora em que o segundo se junta; depois, os seguintes
+        assert [d['downloaded_bytes'] for d in second_events] == [10, 20]
+
+
+    def test_abandoned_call_is_cancelled(self):
+        """Quando o único interessado desiste, a execução é cancelada"""
+        flight = SingleFlight()
+        cancelled = []
+        
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+        
+        async def run():
+            waiter = asyncio.ensure_future(flight.do("key", work))
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            await asyncio.sleep(0.01)
+        
+        asyncio.run(run())
+        assert cancelled == [1]
+        assert flight.in_flight() == 0
+    
+    def test_remaining_waiter_keeps_execution(self):
+        """Se outro pedido ainda espera, a execução continua até o fim"""
+        flight = SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.05)
+            return "result"
+        
+        async def run():
+            first = asyncio.ensure_future(flight.do("key", work))
+            second = asyncio.ensure_future(flight.do("key", work))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+        
+        assert asyncio.run(run()) == "result"
+
+
+class TestFlightHooks:
+    """Testes para o progresso compartilhado de uma execução"""
+    
+    def test_dispatches_to_attached_hooks_only(self):
+        """Eventos vão para quem está registrado na chave naquele momento"""
+        hooks = FlightHooks()
+        dispatch = hooks.dispatcher("key")
+        first, second = [], []
+        
+        with hooks.attach("key", [first.append]):
+            dispatch({'n': 1})
+            with hooks.attach("key", [second.append]):
+                dispatch({'n': 2})
+            dispatch({'n': 3})
+        dispatch({'n': 4})
+        
+        assert first == [{'n': 1}, {'n': 2}, {'n': 3}]
+        # Recebe o último evento ao se registrar, depois os novos
+        assert second == [{'n': 1}, {'n': 2}]
+    
+    def test_failing_hook_does_not_stop_others(self):
+        """Um hook com erro não impede os outros nem sobe para o download"""
+        hooks = FlightHooks()
+        received = []
+        
+        def broken(d):
+            raise RuntimeError("falhou")
+        
+        with hooks.attach("key", [broken, received.append]):
+            hooks.dispatcher("key")({'n': 1})
+        
+        assert received == [{'n': 1}]
+    
+    def test_forgets_key_after_last_caller(self):
+        """Sem registrados, o último evento é esquecido"""
+        hooks = FlightHooks()
+        received = []
+        
+        with hooks.attach("key", []):
+            hooks.dispatcher("key")({'n': 1})
+        with hooks.attach("key", [received.append]):
+            pass
+        
+        assert received == []
+
+
+class TestExtractMetadataMany:
+    """Testes para a extração de metadados em massa"""
+    
+    @staticmethod
+    def metadata(title):
+        return {"title": title, "uploader": "Canal", "duration": 120, "formats": []}
+    
+    def collect(self, urls, concurrency):
+        async def run():
+            return [item async for item in youtube.extract_metadata_many(urls, concurrency)]
+        return asyncio.run(run())
+    
+    def test_limits_concurrency(self):
+        """Não deve passar de concurrency extrações ao mesmo tempo"""
+        running = [0]
+        peak = [0]
+        
+        async def fake_extract(url):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+            return self.metadata(url)
+        
+        urls = [f"https://youtu.be/video{i:06d}" for i in range(6)]
+        with patch.object(youtube, "extract_video_metadata", side_effect=fake_extract):
+            results = self.collect(urls, 2)
+        
+        assert peak[0] == 2
+        assert sorted(index for index, _, _ in results) == list(range(6))
+        assert all(metadata.title == urls[index] for index, metadata, _ in results)
+    
+    def test_errors_are_per_item(self):
+        """Falhas e URLs inválidas viram erro do item, sem derrubar os outros"""
+        async def fake_extract(url):
+            if url.endswith("broken00001"):
+                raise Exception("Video unavailable")
+            if url.endswith("livestream1"):
+                # Live: o yt-dlp não informa a duração
+                return dict(self.metadata("live"), duration=None)
+            return self.metadata("ok")
+        
+        urls = [
+            "https://youtu.be/dQw4w9WgXcQ",
+            "https://google.com",
+            "https://youtu.be/broken00001",
+            "https://youtu.be/livestream1",
+        ]
+        with patch.object(youtube, "extract_video_metadata", side_effect=fake_extract) as mock_extract:
+            results = dict((index, (metadata, error)) for index, metadata, error in self.collect(urls, 4))
+        
+        assert results[0][0].title == "ok" and results[0][1] is None
+        assert results[1][0] is None and "inválida" in results[1][1]
+        assert results[2] == (None, "Video unavailable")
+        assert results[3] == (None, "Metadados incompletos: duration")
+        assert mock_extract.call_count == 3
+
+
+class TestDownloadCancellation:
+    """Testes para o cancelamento de downloads abandonados"""
+    
+    def test_cancel_stops_ytdlp_and_discards_staging(self, temp_dir_test):
+        """Cancelar o download interrompe o yt-dlp e não deixa pasta temporária"""
+        started = threading.Event()
+        stopped = threading.Event()
+        
+        def fake_download(url, output_path, progress_hooks=None, audio_format="mp3", resolved_info=None, clip=None):
+            (Path(output_path) / "audio.webm.part").write_text("partial")
+            started.set()
+            try:
+                # Simula o yt-dlp chamando os hooks a cada bloco
+                for _ in range(500):
+                    for hook in progress_hooks:
+                        hook({'status': 'downloading'})
+                    time.sleep(0.01)
+            finally:
+                stopped.set()
+            return {}
+        
+        async def run():
+            task = asyncio.ensure_future(
+                youtube.download_youtube_audio("https://youtu.be/dQw4w9WgXcQ", "req1")
+            )
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        
+        with patch.object(youtube, "fetch_audio", side_effect=fake_download), \
+             patch.object(youtube, "convert_audio") as mock_convert:
+            asyncio.run(run())
+            assert stopped.wait(2)
+        
+        mock_convert.assert_not_called()
+        entries = [p for p in temp_dir_test.iterdir() if not p.name.startswith('.')]
+        assert entries == []
+
+    
+    def test_cancel_waits_for_stage_before_discarding(self, temp_dir_test):
+        """A pasta temporária só é descartada depois que a thread da etapa sai"""
+        started = threading.Event()
+        finished = threading.Event()
+        
+        def fake_download(url, output_path, progress_hooks=None, audio_format="mp3", resolved_info=None, clip=None):
+            started.set()
+            # Etapa que demora a perceber o cancelamento e ainda grava na pasta
+            time.sleep(0.2)
+            # Como o yt-dlp, recria a pasta de saída se ela sumiu
+            Path(output_path).mkdir(parents=True, exist_ok=True)
+            (Path(output_path) / "audio.webm").write_text("late")
+            finished.set()
+            for hook in progress_hooks:
+                hook({'status': 'downloading'})
+            return {}
+        
+        async def run():
+            task = asyncio.ensure_future(
+                youtube.download_youtube_audio("https://youtu.be/dQw4w9WgXcQ", "req1")
+            )
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        
+        with patch.object(youtube, "fetch_audio", side_effect=fake_download), \
+             patch.object(youtube, "convert_audio"):
+            asyncio.run(run())
+        
+        assert finished.wait(2)
+        entries = [p for p in temp_dir_test.iterdir() if not p.name.startswith('.')]
+        assert entries == []
+
+
+class TestStreamYoutubeAudio:
+    """Testes para o pipeline MP3 com gravação no cache"""
+    
+    METADATA = {"title": "Minha Música", "uploader": "Canal", "duration": 10, "formats": []}
+    
+    def test_production_in_other_worker_uses_download(self, temp_dir_test):
+        """Com outro worker produzindo a chave, stream=true espera por ele (sem pipeline novo)"""
+        url = "https://youtu.be/dQw4w9WgXcQ"
+        assert youtube.should_stream_audio(url, True)
+        
+        with patch.object(youtube.shared_registry, "is_active", return_value=True):
+            assert not youtube.should_stream_audio(url, True)
+            assert not youtube.audio_requires_work(url)
+    
+    def run_stream(self, cmds):
+        async def run():
+            with patch.object(youtube, "extract_video_metadata", new=AsyncMock(return_value=self.METADATA)), \
+                 patch.object(youtube, "build_mp3_pipeline", return_value=cmds):
+                filename, chunks = await youtube.stream_youtube_audio("https://youtu.be/dQw4w9WgXcQ", "req1")
+                data = b''
+                async for chunk in chunks:
+                    data += chunk
+                return filename, data
+        return asyncio.run(run())
+    
+    def test_streams_and_publishes_to_cache(self, temp_dir_test):
+        """Os bytes enviados devem ser os mesmos gravados no cache"""
+        cmds = [[sys.executable, '-c', "import sys; sys.stdout.buffer.write(b'mp3' * 1000)"]]
+        
+        filename, data = self.run_stream(cmds)
+        
+        assert filename == "Minha_Música.mp3"
+        assert data == b'mp3' * 1000
+        cached = lookup_cached_audio("dQw4w9WgXcQ_mp3_192")
+        assert cached is not None
+        assert cached.read_bytes() == data
+    
+    def test_failed_stream_is_not_cached(self, temp_dir_test):
+        """Falha no pipeline não deve publicar arquivo parcial"""
+        cmds = [[sys.executable, '-c', "import sys; sys.stdout.buffer.write(b'partial'); sys.exit(1)"]]
+        
+        with pytest.raises(Exception):
+            self.run_stream(cmds)
+        
+        assert lookup_cached_audio("dQw4w9WgXcQ_mp3_192") is None
+        entries = [p for p in temp_dir_test.iterdir() if not p.name.startswith('.')]
+        assert entries == []
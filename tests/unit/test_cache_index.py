@@ -0,0 +1,162 @@
+import os
+import time
+from app.services.cache_index import CacheIndex
+
+
+def make_entry(root, name, size, age=0):
+    """Cria uma pasta de entrada com um arquivo de size bytes e mtime de age segundos atrás"""
+    folder = root / name
+    folder.mkdir()
+    (folder / "audio.mp3").write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(folder, (mtime, mtime))
+    return folder
+
+
+class TestCacheIndex:
+    """Testes para o índice LRU com orçamento em disco"""
+    
+    def test_rebuild_reads_existing_entries(self, temp_dir_test):
+        """A primeira chamada deve indexar as pastas existentes (exceto as internas)"""
+        make_entry(temp_dir_test, "a", 100)
+        make_entry(temp_dir_test, "b", 50)
+        (temp_dir_test / ".locks").mkdir()
+        
+        stats = CacheIndex(max_bytes=1000, ttl_seconds=60).stats()
+        
+        assert stats["entries"] == 2
+        assert stats["bytes"] == 150
+    
+    def test_evicts_least_recently_used_over_budget(self, temp_dir_test):
+        """Acima do orçamento, remove as entradas com acesso mais antigo"""
+        old = make_entry(temp_dir_test, "old", 100, age=30)
+        hot = make_entry(temp_dir_test, "hot", 100, age=20)
+        new = make_entry(temp_dir_test, "new", 100, age=10)
+        index = CacheIndex(max_bytes=250, ttl_seconds=3600)
+        
+        # Acesso recente tira "old" do início da fila
+        index.touch("old")
+        
+        assert index.evict() == ["hot"]
+        assert old.exists() and new.exists()
+        assert not hot.exists()
+        assert index.stats()["bytes"] == 200
+    
+    def test_evicts_expired_entries(self, temp_dir_test):
+        """Entradas sem acesso há mais que o TTL são removidas mesmo dentro do orçamento"""
+        expired = make_entry(temp_dir_test, "expired", 10, age=120)
+        recent = make_entry(temp_dir_test, "recent", 10)
+        index = CacheIndex(max_bytes=1000, ttl_seconds=60)
+        
+        assert index.evict() == ["expired"]
+        assert not expired.exists()
+        assert recent.exists()
+    
+    def test_pinned_entries_are_never_evicted(self, temp_dir_test):
+        """Entradas sendo gravadas ou servidas não são removidas"""
+        serving = make_entry(temp_dir_test, "serving", 100, age=120)
+        index = CacheIndex(max_bytes=10, ttl_seconds=60)
+        
+        index.pin("serving")
+        assert index.evict() == []
+        assert serving.exists()
+        
+        index.unpin("serving")
+        assert index.evict() == ["serving"]
+    
+    def test_unpin_updates_size(self, temp_dir_test):
+        """Ao fim da gravação o tamanho da entrada é atualizado"""
+        index = CacheIndex(max_bytes=1000, ttl_seconds=60)
+        folder = temp_dir_test / "writing"
+        folder.mkdir()
+        index.pin("writing")
+        (folder / "audio.mp3").write_bytes(b"x" * 300)
+        
+        index.unpin("writing")
+        
+        assert index.stats()["bytes"] == 300
+
+
+class TestCacheManifest:
+    """Testes para a persistência do índice entre reinícios"""
+    
+    def test_entries_survive_restart(self, temp_dir_test):
+        """Entradas publicadas e seus acessos são recarregados do manifesto"""
+        make_entry(temp_dir_test, "dQw4w9WgXcQ_mp3_192", 100)
+        first = CacheIndex(max_bytes=1000, ttl_seconds=60)
+        first.add("dQw4w9WgXcQ_mp3_192")
+        first.touch("dQw4w9WgXcQ_mp3_192")
+        first.close()
+        
+        second = CacheIndex(max_bytes=1000, ttl_seconds=60)
+        
+        assert second.stats()["entries"] == 1
+        assert second.stats()["bytes"] == 100
+        assert second.evict() == []
+    
+    def test_corrupt_entry_is_dropped(self, temp_dir_test):
+        """Entrada cujo tamanho não confere com o manifesto é descartada"""
+        folder = make_entry(temp_dir_test, "dQw4w9WgXcQ_mp3_192", 100)
+        first = CacheIndex(max_bytes=1000, ttl_seconds=60)
+        first.add("dQw4w9WgXcQ_mp3_192")
+        first.close()
+        
+        (folder / "audio.mp3").write_bytes(b"x" * 10)
+        second = CacheIndex(max_bytes=1000, ttl_seconds=60)
+        
+        assert second.stats()["entries"] == 0
+        assert not folder.exists()
+    
+    def test_abandoned_partial_is_dropped(self, temp_dir_test):
+        """Downloads .part sem escrita recente são descartados; os ativos ficam"""
+        abandoned = make_entry(temp_dir_test, "a_mp3_192.req1.part", 10, age=600)
+        os.utime(abandoned / "audio.mp3", (time.time() - 600, time.time() - 600))
+        active = make_entry(temp_dir_test, "b_mp3_192.req2.part", 10)
+        
+        CacheIndex(max_bytes=1000, ttl_seconds=60).stats()
+        
+        assert not abandoned.exists()
+        assert active.exists()
+    
+    def test_invalid_manifest_is_recreated(self, temp_dir_test):
+        """Um manifesto ilegível não impede a inicialização"""
+        from app.config import settings
+        (temp_dir_test / settings.CACHE_MANIFEST_FILENAME).write_bytes(b"lixo" * 100)
+        make_entry(temp_dir_test, "recent", 10)
+        
+        index = CacheIndex(max_bytes=1000, ttl_seconds=60)
+        index.add("recent")
+        
+        assert index.stats()["entries"] == 1
+    
+    def test_writes_do_not_wait_for_sqlite_lock(self, temp_dir_test):
+        """Com o manifesto travado por outro worker, publicar não bloqueia"""
+        import sqlite3
+        from app.config import settings
+        make_entry(temp_dir_test, "dQw4w9WgXcQ_mp3_192", 100)
+        index = CacheIndex(max_bytes=1000, ttl_seconds=60)
+        index.load()
+        
+        other = sqlite3.connect(str(temp_dir_test / settings.CACHE_MANIFEST_FILENAME))
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            started = time.monotonic()
+            index.add("dQw4w9WgXcQ_mp3_192")
+            index.remove("dQw4w9WgXcQ_mp3_192")
+            assert time.monotonic() - started < 1
+        finally:
+            other.rollback()
+            other.close()
+        index.close()
+    
+    def test_load_builds_index_once(self, temp_dir_test):
+        """Depois de load() (inicialização), as operações não varrem o diretório"""
+        from unittest.mock import patch
+        make_entry(temp_dir_test, "a", 100)
+        index = CacheIndex(max_bytes=1000, ttl_seconds=60)
+        index.load()
+        
+        with patch.object(index, "_scan", side_effect=AssertionError("varredura no caminho quente")):
+            index.touch("a")
+            assert index.stats()["entries"] == 1
+        index.close()
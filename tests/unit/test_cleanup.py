@@ -2,7 +2,8 @@ import pytest
 from pathlib import Path
 from datetime import datetime
 import time
-from app.services.cleanup import cleanup_old_files, cleanup_all_temp_files
+from app.services import cleanup
+from app.services.cleanup import cleanup_old_files, cleanup_all_temp_files, request_cleanup
 from app.config import settings
 
 
@@ -58,6 +59,51 @@ class TestCleanupOldFiles:
         finally:
             settings.TEMP_DIR = original_temp
     
+    def test_does_not_remove_internal_folders(self, tmp_path):
+        """Não deve remover pastas internas como .locks"""
+        locks_folder = tmp_path / ".locks"
+        locks_folder.mkdir()
+        
+        old_time = datetime.now().timestamp() - (settings.FILE_TTL_SECONDS + 100)
+        import os
+        os.utime(locks_folder, (old_time, old_time))
+        
+        original_temp = settings.TEMP_DIR
+        settings.TEMP_DIR = tmp_path
+        
+        try:
+            cleanup_old_files()
+            
+            assert locks_folder.exists(), "Pasta de locks não deveria ser deletada"
+        finally:
+            settings.TEMP_DIR = original_temp
+    
+    def test_only_leader_removes_files(self, tmp_path):
+        """Com outro worker como líder, a limpeza não remove nada"""
+        from app.core.locks import FileLock
+        old_folder = tmp_path / "old_video_folder"
+        old_folder.mkdir()
+        old_time = datetime.now().timestamp() - (settings.FILE_TTL_SECONDS + 100)
+        import os
+        os.utime(old_folder, (old_time, old_time))
+        
+        original_temp = settings.TEMP_DIR
+        settings.TEMP_DIR = tmp_path
+        other_leader = FileLock(tmp_path / settings.LOCKS_DIRNAME / settings.CLEANUP_LEADER_LOCK)
+        other_leader.acquire()
+        
+        try:
+            cleanup_old_files()
+            assert old_folder.exists(), "Só o líder deveria limpar"
+            
+            # Líder encerrado: o próximo worker assume
+            other_leader.release()
+            cleanup_old_files()
+            assert not old_folder.exists()
+        finally:
+            other_leader.release()
+            settings.TEMP_DIR = original_temp
+    
     def test_handles_empty_temp_dir(self, tmp_path):
         """Deve lidar corretamente com diretório vazio"""
         original_temp = settings.TEMP_DIR
@@ -83,6 +129,49 @@ class TestCleanupOldFiles:
             settings.TEMP_DIR = original_temp
 
 
+class TestRequestCleanup:
+    """Testes para a limpeza agendada fora do event loop"""
+    
+    def test_runs_cleanup_in_another_thread(self):
+        """A limpeza roda em uma thread separada de quem a pediu"""
+        import threading
+        from unittest.mock import patch
+        done = threading.Event()
+        threads = []
+        
+        def fake_cleanup():
+            threads.append(threading.current_thread())
+            done.set()
+        
+        with patch.object(cleanup, "cleanup_old_files", fake_cleanup):
+            request_cleanup()
+            assert done.wait(timeout=5)
+        
+        assert threads[0] is not threading.current_thread()
+    
+    def test_coalesces_requests_while_running(self):
+        """Pedidos durante uma limpeza em andamento não disparam outra"""
+        import threading
+        from unittest.mock import patch
+        release = threading.Event()
+        calls = []
+        
+        def slow_cleanup():
+            calls.append(1)
+            release.wait(timeout=5)
+        
+        with patch.object(cleanup, "cleanup_old_files", slow_cleanup):
+            request_cleanup()
+            request_cleanup()
+            request_cleanup()
+            release.set()
+            # A thread libera o lock ao terminar
+            assert cleanup._cleanup_running.acquire(timeout=5)
+            cleanup._cleanup_running.release()
+        
+        assert calls == [1]
+
+
 class TestCleanupAllTempFiles:
     """Testes para limpeza total de arquivos temporários"""
     
@@ -0,0 +1,403 @@
+import asyncio
+import os
+import sys
+import threading
+import pytest
+import yt_dlp
+from unittest.mock import patch
+from app.core.downloader import (
+    stream_process,
+    stream_pipeline,
+    build_mp3_pipeline,
+    build_mux_pipeline,
+    extra_input,
+    stream_video,
+    cancel_hook,
+    fetch_audio,
+    convert_audio,
+    build_convert_command,
+    run_ffmpeg,
+    build_tags,
+    write_tags,
+)
+from app.core.ydl_pool import YoutubeDLPool
+
+
+def python_cmd(code: str) -> list:
+    """Comando que executa um trecho de Python em um processo filho"""
+    return [sys.executable, '-c', code]
+
+
+async def collect(cmd: list) -> bytes:
+    chunks = []
+    async for chunk in stream_process(cmd, "test"):
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+async def collect_nothing():
+    """Iterador assíncrono vazio (stream sem chunks)"""
+    return
+    yield
+
+
+class TestStreamProcess:
+    """Testes para o motor de streaming assíncrono"""
+    
+    def test_streams_stdout(self):
+        """Deve entregar todo o stdout do processo"""
+        code = "import sys; sys.stdout.buffer.write(b'x' * 200000)"
+        data = asyncio.run(collect(python_cmd(code)))
+        assert data == b'x' * 200000
+    
+    def test_verbose_stderr_does_not_deadlock(self):
+        """stderr volumoso deve ser drenado em paralelo"""
+        code = (
+            "import sys\n"
+            "sys.stderr.write('progresso ' * 200000)\n"
+            "sys.stderr.flush()\n"
+            "sys.stdout.buffer.write(b'ok')\n"
+        )
+        data = asyncio.run(asyncio.wait_for(collect(python_cmd(code)), timeout=10))
+        assert data == b'ok'
+    
+    def test_nonzero_exit_raises_with_stderr(self):
+        """Código de saída != 0 deve gerar exceção com o final do stderr"""
+        code = "import sys; sys.stderr.write('falha no download'); sys.exit(3)"
+        with pytest.raises(Exception, match="falha no download"):
+            asyncio.run(collect(python_cmd(code)))
+    
+    def test_consumer_stop_kills_process(self):
+        """Se o consumidor parar (desconexão), o processo deve ser morto"""
+        code = (
+            "import os, sys, time\n"
+            "sys.stdout.buffer.write(str(os.getpid()).encode())\n"
+            "sys.stdout.flush()\n"
+            "time.sleep(60)\n"
+        )
+        
+        async def run():
+            stream = stream_process(python_cmd(code), "test")
+            pid = int(await stream.__anext__())
+            await stream.aclose()
+            
+            for _ in range(100):
+                try:
+                    os.kill(pid, 0)
+                except ProcessLookupError:
+                    return True
+                await asyncio.sleep(0.05)
+            return False
+        
+        assert asyncio.run(run()), "Processo filho deveria ter sido encerrado"
+
+
+class TestStreamPipeline:
+    """Testes para cadeias de processos (yt-dlp | ffmpeg)"""
+    
+    def test_pipes_stdout_into_next_stdin(self):
+        """A saída do primeiro processo deve alimentar o segundo"""
+        producer = python_cmd("import sys; sys.stdout.buffer.write(b'audio' * 50000)")
+        transformer = python_cmd("import sys; sys.stdout.buffer.write(sys.stdin.buffer.read().upper())")
+        
+        async def run():
+            chunks = []
+            async for chunk in stream_pipeline([producer, transformer], "test"):
+                chunks.append(chunk)
+            return b''.join(chunks)
+        
+        assert asyncio.run(run()) == b'AUDIO' * 50000
+    
+    def test_failure_in_first_process_raises(self):
+        """Falha em qualquer etapa deve gerar exceção"""
+        producer = python_cmd("import sys; sys.stderr.write('video indisponivel'); sys.exit(1)")
+        transformer = python_cmd("import sys; sys.stdout.buffer.write(sys.stdin.buffer.read())")
+        
+        async def run():
+            async for _ in stream_pipeline([producer, transformer], "test"):
+                pass
+        
+        with pytest.raises(Exception, match="video indisponivel"):
+            asyncio.run(run())
+    
+    # Lê o stdin (vídeo) e a entrada extra (áudio) ao mesmo tempo, como o ffmpeg
+    MUXER = (
+        "import os, sys, threading\n"
+        "fd = int(sys.argv[1].split(':')[1])\n"
+        "extra = []\n"
+        "t = threading.Thread(target=lambda: extra.append(os.fdopen(fd, 'rb').read()))\n"
+        "t.start()\n"
+        "video = sys.stdin.buffer.read()\n"
+        "t.join()\n"
+        "sys.stdout.buffer.write(video + extra[0])\n"
+    )
+    
+    def test_extra_input_reaches_last_command(self):
+        """A saída de extra_inputs chega ao último comando como pipe:<fd>"""
+        video = python_cmd("import sys; sys.stdout.buffer.write(b'v' * 200000)")
+        audio = python_cmd("import sys; sys.stdout.buffer.write(b'a' * 200000)")
+        muxer = [*python_cmd(self.MUXER), extra_input(0)]
+        
+        async def run():
+            chunks = []
+            async for chunk in stream_pipeline([video, muxer], "test", extra_inputs=[audio]):
+                chunks.append(chunk)
+            return b''.join(chunks)
+        
+        assert asyncio.run(run()) == b'v' * 200000 + b'a' * 200000
+    
+    def test_failure_in_extra_input_raises(self):
+        """Falha na entrada extra também gera exceção"""
+        video = python_cmd("import sys; sys.stdout.buffer.write(b'v')")
+        audio = python_cmd("import sys; sys.stderr.write('audio 403'); sys.exit(1)")
+        muxer = [*python_cmd(self.MUXER), extra_input(0)]
+        
+        async def run():
+            async for _ in stream_pipeline([video, muxer], "test", extra_inputs=[audio]):
+                pass
+        
+        with pytest.raises(Exception, match="audio 403"):
+            asyncio.run(run())
+
+
+class TestBuildMp3Pipeline:
+    """Testes para a montagem do comando yt-dlp | ffmpeg"""
+    
+    def test_builds_ytdlp_and_ffmpeg_commands(self):
+        """Deve gerar yt-dlp para stdout e ffmpeg lendo de stdin"""
+        ytdlp_cmd, ffmpeg_cmd = build_mp3_pipeline("https://youtu.be/dQw4w9WgXcQ", 128)
+        
+        assert ytdlp_cmd[0] == 'yt-dlp'
+        assert ytdlp_cmd[-2:] == ['-', "https://youtu.be/dQw4w9WgXcQ"]
+        assert ffmpeg_cmd[0] == 'ffmpeg'
+        assert 'pipe:0' in ffmpeg_cmd
+        assert '128k' in ffmpeg_cmd
+        assert ffmpeg_cmd[-1] == 'pipe:1'
+    
+    def test_resolved_info_replaces_url(self):
+        """Com info resolvido, o yt-dlp carrega o JSON em vez de extrair a página"""
+        ytdlp_cmd, _ = build_mp3_pipeline("https://youtu.be/dQw4w9WgXcQ", 128, info_path="/tmp/info.json")
+        
+        assert ytdlp_cmd[-2:] == ['--load-info-json', '/tmp/info.json']
+        assert "https://youtu.be/dQw4w9WgXcQ" not in ytdlp_cmd
+    
+    def test_includes_id3_metadata(self):
+        """Tags devem ser gravadas na mesma passada do ffmpeg"""
+        _, ffmpeg_cmd = build_mp3_pipeline("https://youtu.be/dQw4w9WgXcQ", metadata={'title': 'Música'})
+        assert 'title=Música' in ffmpeg_cmd
+
+
+class TestMuxPipeline:
+    """Testes para o mux de IDs combinados em MP4 fragmentado"""
+    
+    def test_builds_parallel_downloads_and_fragmented_mp4(self):
+        """Vídeo no stdin do ffmpeg, áudio como segunda entrada"""
+        (video_cmd, ffmpeg_cmd), (audio_cmd,) = build_mux_pipeline("https://youtu.be/dQw4w9WgXcQ", "137", "140")
+        
+        assert video_cmd[video_cmd.index('-f') + 1] == '137'
+        assert audio_cmd[audio_cmd.index('-f') + 1] == '140'
+        assert ffmpeg_cmd[ffmpeg_cmd.index('-i') + 1] == 'pipe:0'
+        assert extra_input(0) in ffmpeg_cmd
+        assert 'frag_keyframe+empty_moov' in ffmpeg_cmd[ffmpeg_cmd.index('-movflags') + 1]
+        assert ffmpeg_cmd[-1] == 'pipe:1'
+    
+    def test_clip_downloads_only_the_section(self):
+        """Trecho: cada yt-dlp baixa só o intervalo e o ffmpeg reempacota"""
+        (ytdlp_cmd, ffmpeg_cmd), extra_inputs = build_mux_pipeline(
+            "https://youtu.be/dQw4w9WgXcQ", "251", clip=(30.0, 60.0)
+        )
+        
+        assert extra_inputs == []
+        assert ytdlp_cmd[ytdlp_cmd.index('--download-sections') + 1] == '*30-60'
+        assert ffmpeg_cmd[ffmpeg_cmd.index('-map') + 1] == '0'
+    
+    def test_stream_video_muxes_combined_ids(self):
+        """stream_video usa o mux para '137+140' e o yt-dlp direto para um só ID"""
+        async def run(format_id):
+            async for _ in stream_video("https://youtu.be/dQw4w9WgXcQ", format_id, "test"):
+                pass
+        
+        with patch('app.core.downloader.stream_pipeline') as mock_pipeline, \
+             patch('app.core.downloader.stream_process') as mock_process:
+            mock_pipeline.return_value = collect_nothing()
+            mock_process.return_value = collect_nothing()
+            asyncio.run(run("137+140"))
+            asyncio.run(run("18"))
+        
+        cmds = mock_pipeline.call_args.args[0]
+        assert cmds[1][0] == 'ffmpeg'
+        assert len(mock_pipeline.call_args.kwargs['extra_inputs']) == 1
+        assert mock_process.call_args.args[0][:3] == ['yt-dlp', '-f', '18']
+
+
+class TestCancelHook:
+    """Testes para a interrupção do yt-dlp via hook"""
+    
+    def test_passes_until_cancelled(self):
+        """Sem cancelamento o hook não interfere; depois levanta DownloadCancelled"""
+        event = threading.Event()
+        hook = cancel_hook(event)
+        
+        hook({'status': 'downloading'})
+        event.set()
+        
+        with pytest.raises(yt_dlp.utils.DownloadCancelled):
+            hook({'status': 'downloading'})
+
+
+class TestConvertAudio:
+    """Testes para a conversão com tags na mesma passada do ffmpeg"""
+    
+    INFO = {
+        'filepath': '/tmp/audio.webm',
+        'ext': 'webm',
+        'acodec': 'opus',
+        'title': 'Música',
+        'uploader': 'Canal',
+        'upload_date': '20091025',
+    }
+    
+    def test_mp3_tags_in_conversion_pass(self):
+        """As tags vão nos argumentos da própria conversão"""
+        cmd, output = build_convert_command(self.INFO, 192, 'mp3', build_tags(self.INFO))
+        
+        assert output == '/tmp/audio.mp3'
+        assert cmd[-1] == output
+        assert cmd[cmd.index('-c:a') + 1] == 'libmp3lame'
+        assert 'title=Música' in cmd
+        assert 'artist=Canal' in cmd
+    
+    def test_passthrough_copies_matching_codec(self):
+        """opus de fonte opus é copiado; m4a de fonte opus é reencodado"""
+        cmd, output = build_convert_command(self.INFO, 192, 'opus', {})
+        assert cmd[cmd.index('-c:a') + 1] == 'copy'
+        assert output == '/tmp/audio.opus'
+        
+        cmd, _ = build_convert_command(self.INFO, 192, 'm4a', {})
+        assert cmd[cmd.index('-c:a') + 1] == 'aac'
+    
+    def test_replaces_source_and_reports_progress(self, tmp_path):
+        """Após converter, info aponta para o arquivo final e o original some"""
+        source = tmp_path / "audio.webm"
+        source.write_bytes(b"webm")
+        info = dict(self.INFO, filepath=str(source))
+        events = []
+        
+        with patch('app.core.downloader.run_ffmpeg') as mock_run:
+            convert_audio(info, 192, [lambda d: events.append(d['status'])])
+        
+        assert mock_run.call_args.args[0][-1] == str(tmp_path / "audio.mp3")
+        assert info['filepath'] == str(tmp_path / "audio.mp3")
+        assert not source.exists()
+        assert events == ['started', 'finished']
+    
+    def test_passthrough_already_in_container_only_writes_tags(self):
+        """m4a de fonte m4a não passa pelo ffmpeg"""
+        info = dict(self.INFO, filepath='/tmp/audio.m4a', ext='m4a')
+        with patch('app.core.downloader.write_tags') as mock_write, \
+             patch('app.core.downloader.run_ffmpeg') as mock_run:
+            convert_audio(info, 192, audio_format='m4a')
+        
+        mock_run.assert_not_called()
+        mock_write.assert_called_once()
+        assert mock_write.call_args.args[1]['title'] == 'Música'
+
+
+class TestRunFfmpeg:
+    """Testes para a execução interrompível do ffmpeg"""
+    
+    def test_nonzero_exit_raises_with_stderr(self):
+        """Código de saída diferente de zero vira exceção com o stderr"""
+        with pytest.raises(Exception, match="boom"):
+            run_ffmpeg(python_cmd("import sys; sys.stderr.write('boom'); sys.exit(1)"))
+    
+    def test_cancel_kills_process(self, tmp_path):
+        """cancel_event encerra o processo antes de ele terminar"""
+        marker = tmp_path / "done"
+        event = threading.Event()
+        threading.Timer(0.1, event.set).start()
+        
+        with pytest.raises(yt_dlp.utils.DownloadCancelled):
+            run_ffmpeg(python_cmd(f"import time; time.sleep(5); open({str(marker)!r}, 'w')"), event, 0.05)
+        
+        assert not marker.exists()
+
+
+class TestFetchAudio:
+    """Testes para fetch_audio: URLs já resolvidas e trechos"""
+    
+    RESOLVED = {'id': 'dQw4w9WgXcQ', 'webpage_url': 'https://youtu.be/dQw4w9WgXcQ', 'formats': []}
+    
+    def run_fetch(self, process_error=None):
+        with patch.object(yt_dlp, 'YoutubeDL') as mock_ydl, \
+             patch('app.core.downloader.ydl_pool', YoutubeDLPool()):
+            ydl = mock_ydl.return_value
+            ydl.params = {}
+            downloads = [{'filepath': '/tmp/out/audio.webm'}]
+            ydl.process_ie_result.return_value = {'from': 'resolved', 'requested_downloads': downloads}
+            ydl.process_ie_result.side_effect = process_error
+            ydl.extract_info.return_value = {'from': 'extraction', 'requested_downloads': downloads}
+            info = fetch_audio("https://youtu.be/dQw4w9WgXcQ", "/tmp/out", resolved_info=self.RESOLVED)
+        return ydl, info['from']
+    
+    def test_skips_extraction(self):
+        """URLs válidas: baixa direto, sem extrair a página"""
+        ydl, info = self.run_fetch()
+        
+        assert info == 'resolved'
+        ydl.extract_info.assert_not_called()
+        # O info em cache não é modificado pelo processamento
+        assert ydl.process_ie_result.call_args.args[0] is not self.RESOLVED
+    
+    def test_forbidden_falls_back_to_extraction(self):
+        """403 (URL expirada/recusada): extrai de novo"""
+        error = yt_dlp.utils.DownloadError("ERROR: unable to download video data: HTTP Error 403: Forbidden")
+        ydl, info = self.run_fetch(error)
+        
+        assert info == 'extraction'
+        ydl.extract_info.assert_called_once()
+    
+    def test_clip_sets_download_ranges(self):
+        """Trecho: o YoutubeDL recebe download_ranges só nesta chamada"""
+        seen = {}
+        with patch.object(yt_dlp, 'YoutubeDL') as mock_ydl, \
+             patch('app.core.downloader.ydl_pool', YoutubeDLPool()):
+            ydl = mock_ydl.return_value
+            ydl.params = {}
+            
+            def extract(*args, **kwargs):
+                seen.update(ydl.params)
+                return {'requested_downloads': [{'filepath': '/tmp/out/audio.webm'}]}
+            
+            ydl.extract_info.side_effect = extract
+            fetch_audio("https://youtu.be/dQw4w9WgXcQ", "/tmp/out", clip=(30.0, None))
+        
+        ranges = list(seen['download_ranges']({}, None))
+        assert ranges == [{'start_time': 30.0, 'end_time': float('inf')}]
+        assert 'download_ranges' not in ydl.params
+    
+    def test_other_errors_are_raised(self):
+        """Outras falhas não disparam nova extração"""
+        with pytest.raises(yt_dlp.utils.DownloadError):
+            self.run_fetch(yt_dlp.utils.DownloadError("ERROR: disco cheio"))
+
+
+class TestBuildTags:
+    """Testes para a montagem das tags a partir do info do yt-dlp"""
+    
+    def test_prefers_specific_fields(self):
+        """artist/track têm prioridade sobre uploader/title"""
+        tags = build_tags({'title': 'Vídeo', 'track': 'Faixa', 'uploader': 'Canal', 'artists': ['A', 'B']})
+        assert tags['title'] == 'Faixa'
+        assert tags['artist'] == 'A, B'
+    
+    def test_skips_missing_fields(self):
+        """Campos ausentes ou vazios não viram tags"""
+        assert build_tags({'title': 'Vídeo', 'album': ''}) == {'title': 'Vídeo'}
+    
+    def test_write_tags_ignores_unknown_files(self, tmp_path):
+        """Arquivo que o mutagen não reconhece fica intacto"""
+        path = tmp_path / "audio.bin"
+        path.write_bytes(b"not audio")
+        write_tags(str(path), {'title': 'Vídeo'})
+        assert path.read_bytes() == b"not audio"
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+from app.core.executors import StageExecutor
+
+
+class TestStageExecutor:
+    """Testes para os pools dedicados por etapa"""
+    
+    def test_returns_function_result(self):
+        """Deve retornar o resultado da função"""
+        executor = StageExecutor("test", 2)
+        assert asyncio.run(executor.run(lambda a, b: a + b, 2, 3)) == 5
+        assert executor.stats()["completed"] == 1
+    
+    def test_limits_concurrency(self):
+        """Não deve executar mais tarefas que max_workers ao mesmo tempo"""
+        executor = StageExecutor("test", 2)
+        lock = threading.Lock()
+        current = [0]
+        peak = [0]
+        
+        def work():
+            with lock:
+                current[0] += 1
+                peak[0] = max(peak[0], current[0])
+            time.sleep(0.02)
+            with lock:
+                current[0] -= 1
+        
+        async def run():
+            await asyncio.gather(*[executor.run(work) for _ in range(6)])
+        
+        asyncio.run(run())
+        
+        assert peak[0] == 2
+        stats = executor.stats()
+        assert stats["queued"] == 0
+        assert stats["running"] == 0
+        assert stats["max_wait_ms"] > 0
+    
+    def test_reports_queue_depth(self):
+        """Tarefas aguardando thread devem aparecer como queued"""
+        executor = StageExecutor("test", 1)
+        release = threading.Event()
+        
+        async def run():
+            tasks = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            stats = executor.stats()
+            release.set()
+            await asyncio.gather(*tasks)
+            return stats
+        
+        stats = asyncio.run(run())
+        assert stats["running"] == 1
+        assert stats["queued"] == 2
+    
+    def test_cancelled_while_queued_is_not_counted(self):
+        """Cancelar uma tarefa na fila deve liberar o contador"""
+        executor = StageExecutor("test", 1)
+        release = threading.Event()
+        
+        async def run():
+            blocker = asyncio.ensure_future(executor.run(release.wait))
+            queued = asyncio.ensure_future(executor.run(lambda: None))
+            await asyncio.sleep(0.02)
+            queued.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            await blocker
+        
+        asyncio.run(run())
+        assert executor.stats()["queued"] == 0
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from app.services.fanout import FanOut
+
+
+async def read_all(chunks) -> bytes:
+    data = b''
+    async for chunk in chunks:
+        data += chunk
+    return data
+
+
+class TestFanOut:
+    """Testes para o compartilhamento de produções em andamento"""
+    
+    def test_late_reader_gets_everything_from_start(self, tmp_path):
+        """Leitor que chega no meio deve receber os bytes desde o início"""
+        fanout = FanOut()
+        productions = []
+        
+        async def produce(growing):
+            productions.append(1)
+            for i in range(5):
+                growing.append(bytes([i]) * 10)
+                await asyncio.sleep(0.01)
+        
+        async def run():
+            first = fanout.subscribe("key", lambda: tmp_path / "out", produce)
+            first_task = asyncio.ensure_future(read_all(first))
+            await asyncio.sleep(0.025)
+            
+            assert fanout.is_active("key")
+            second = fanout.subscribe("key", lambda: tmp_path / "other", produce)
+            return await asyncio.gather(first_task, read_all(second))
+        
+        first, second = asyncio.run(run())
+        
+        expected = b''.join(bytes([i]) * 10 for i in range(5))
+        assert productions == [1]
+        assert first == second == expected
+        assert not (tmp_path / "other").exists()
+        assert fanout.active_count() == 0
+    
+    def test_producer_cancelled_when_all_readers_leave(self, tmp_path):
+        """Produtor deve ser cancelado quando não restar leitor"""
+        fanout = FanOut()
+        cancelled = []
+        
+        async def produce(growing):
+            try:
+                while True:
+                    growing.append(b'x')
+                    await asyncio.sleep(0.01)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+        
+        async def run():
+            chunks = fanout.subscribe("key", lambda: tmp_path / "out", produce)
+            await chunks.__anext__()
+            await chunks.aclose()
+            await asyncio.sleep(0.05)
+        
+        asyncio.run(run())
+        
+        assert cancelled == [1]
+        assert fanout.active_count() == 0
+    
+    def test_producer_error_reaches_readers(self, tmp_path):
+        """Erro do produtor deve chegar a todos os leitores"""
+        fanout = FanOut()
+        
+        async def produce(growing):
+            growing.append(b'partial')
+            await asyncio.sleep(0.01)
+            raise ValueError("yt-dlp falhou")
+        
+        async def run():
+            chunks = fanout.subscribe("key", lambda: tmp_path / "out", produce)
+            return await read_all(chunks)
+        
+        with pytest.raises(Exception, match="yt-dlp falhou"):
+            asyncio.run(run())
+    
+    def test_reader_survives_file_rename(self, tmp_path):
+        """Publicar (renomear) o arquivo não deve interromper leitores"""
+        fanout = FanOut()
+        
+        async def produce(growing):
+            growing.append(b'abc')
+            await asyncio.sleep(0.01)
+            growing.append(b'def')
+            growing.path.rename(tmp_path / "published")
+        
+        async def run():
+            chunks = fanout.subscribe("key", lambda: tmp_path / "out", produce)
+            return await read_all(chunks)
+        
+        assert asyncio.run(run()) == b'abcdef'
+        assert (tmp_path / "published").read_bytes() == b'abcdef'
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+from app.schemas.download import FormatSelector
+from app.services import youtube
+from app.services.formats import estimate_filesize, select_format
+
+FORMATS = [
+    {'format_id': '160+251', 'height': 144, 'vcodec': 'avc1', 'abr': 130, 'filesize': 3_000_000},
+    {'format_id': '136+251', 'height': 720, 'vcodec': 'avc1', 'abr': 130, 'filesize': 40_000_000},
+    {'format_id': '137+251', 'height': 1080, 'vcodec': 'avc1', 'abr': 130, 'filesize': 90_000_000},
+    {'format_id': '249', 'height': None, 'vcodec': 'none', 'abr': 48, 'filesize': 1_200_000},
+    {'format_id': '140', 'height': None, 'vcodec': 'none', 'abr': 129, 'filesize': 3_400_000},
+    {'format_id': '251', 'height': None, 'vcodec': 'none', 'abr': 135, 'filesize': 3_300_000},
+]
+
+
+class TestSelectFormat:
+    """Testes para a escolha de formato por regra"""
+    
+    def test_smallest_audio_with_min_bitrate(self):
+        """Menor áudio com pelo menos 128 kbps"""
+        selector = FormatSelector(kind="audio", min_abr=128, prefer="smallest")
+        assert select_format(FORMATS, selector)['format_id'] == '251'
+    
+    def test_best_video_under_size(self):
+        """Melhor vídeo que caiba em 50 MB"""
+        selector = FormatSelector(kind="video", max_filesize=50_000_000)
+        assert select_format(FORMATS, selector)['format_id'] == '136+251'
+    
+    def test_unknown_size_is_skipped_with_size_limit(self):
+        """Com limite de tamanho, formato sem tamanho não é escolhido"""
+        formats = [dict(FORMATS[2], filesize=None), FORMATS[0]]
+        selector = FormatSelector(kind="video", max_filesize=50_000_000)
+        assert select_format(formats, selector)['format_id'] == '160+251'
+    
+    def test_no_match_returns_none(self):
+        """Nenhum formato atende: None"""
+        selector = FormatSelector(kind="audio", min_abr=320)
+        assert select_format(FORMATS, selector) is None
+
+
+class TestEstimateFilesize:
+    """Testes para a estimativa de tamanho dos formatos"""
+    
+    def test_prefers_exact_then_approx(self):
+        assert estimate_filesize({'filesize': 10, 'filesize_approx': 20}, 60) == 10
+        assert estimate_filesize({'filesize_approx': 20}, 60) == 20
+    
+    def test_estimates_from_bitrate(self):
+        """128 kbps por 60 s = 960 KB"""
+        assert estimate_filesize({'tbr': 128}, 60) == 960_000
+        assert estimate_filesize({'tbr': 128}, None) is None
+
+
+class TestAudioOnlyFormats:
+    """Testes para a listagem de formatos só de áudio em /api/formats"""
+    
+    INFO = {
+        'title': 'Vídeo',
+        'duration': 60,
+        'uploader': 'Canal',
+        'formats': [
+            {'format_id': '137', 'vcodec': 'avc1', 'acodec': 'none', 'height': 1080, 'ext': 'mp4', 'tbr': 4000},
+            {'format_id': '249', 'vcodec': 'none', 'acodec': 'opus', 'abr': 48, 'ext': 'webm'},
+            {'format_id': '251', 'vcodec': 'none', 'acodec': 'opus', 'abr': 135, 'ext': 'webm'},
+        ],
+    }
+    
+    def test_lists_every_audio_only_format(self):
+        """Além das combinações, cada áudio aparece sozinho, por bitrate"""
+        pool = MagicMock()
+        pool.session.return_value.__enter__.return_value.extract_info.return_value = self.INFO
+        with patch.object(youtube, "ydl_pool", pool):
+            metadata = asyncio.run(youtube._extract_video_metadata("https://youtu.be/dQw4w9WgXcQ"))
+        
+        ids = [fmt['format_id'] for fmt in metadata['formats']]
+        assert ids == ['137+251', '249', '251']
+        opus_48 = metadata['formats'][1]
+        assert opus_48['vcodec'] == 'none'
+        assert opus_48['filesize'] == pytest.approx(48 * 1000 / 8 * 60)
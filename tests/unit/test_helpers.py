@@ -4,7 +4,12 @@ from app.utils.helpers import (
     sanitize_filename,
     format_duration,
     format_filesize,
-    generate_video_id
+    generate_video_id,
+    extract_video_id,
+    build_cache_key,
+    parse_url_expiry,
+    clip_range,
+    clip_suffix
 )
 
 
@@ -233,3 +238,80 @@ class TestGenerateVideoId:
         assert video_id is not None
         pattern = r"^\d+_[a-f0-9]{8}$"
         assert re.match(pattern, video_id)
+
+
+class TestExtractVideoId:
+    """Testes para extração do ID canônico do vídeo"""
+    
+    def test_watch_url(self):
+        """Deve extrair ID de URL watch"""
+        assert extract_video_id("https://www.youtube.com/watch?v=dQw4w9WgXcQ") == "dQw4w9WgXcQ"
+    
+    def test_watch_url_with_extra_parameters(self):
+        """Parâmetros extras não devem alterar o ID"""
+        url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=30&list=ABC"
+        assert extract_video_id(url) == "dQw4w9WgXcQ"
+    
+    def test_short_url(self):
+        """Deve extrair ID de URL youtu.be"""
+        assert extract_video_id("https://youtu.be/dQw4w9WgXcQ?t=10") == "dQw4w9WgXcQ"
+    
+    def test_mobile_and_shorts_urls(self):
+        """Deve extrair ID de m.youtube.com e /shorts/"""
+        assert extract_video_id("https://m.youtube.com/watch?v=dQw4w9WgXcQ") == "dQw4w9WgXcQ"
+        assert extract_video_id("https://www.youtube.com/shorts/dQw4w9WgXcQ") == "dQw4w9WgXcQ"
+    
+    def test_non_video_url(self):
+        """Deve retornar None para URLs sem vídeo"""
+        assert extract_video_id("https://youtube.com/invalid") is None
+        assert extract_video_id("https://google.com/watch?v=dQw4w9WgXcQ") is None
+        assert extract_video_id("not-a-url") is None
+
+
+class TestBuildCacheKey:
+    """Testes para geração da chave de cache"""
+    
+    def test_combines_id_codec_and_bitrate(self):
+        """Deve combinar ID, codec e bitrate"""
+        assert build_cache_key("dQw4w9WgXcQ", "mp3", 192) == "dQw4w9WgXcQ_mp3_192"
+    
+    def test_different_bitrates_generate_different_keys(self):
+        """Bitrates diferentes devem gerar chaves diferentes"""
+        assert build_cache_key("dQw4w9WgXcQ", "mp3", 128) != build_cache_key("dQw4w9WgXcQ", "mp3", 192)
+
+
+class TestParseUrlExpiry:
+    """Testes para a leitura do expire= das URLs de mídia"""
+    
+    def test_query_parameter(self):
+        """URLs do googlevideo trazem expire na query"""
+        url = "https://rr1---sn-abc.googlevideo.com/videoplayback?expire=1760000000&itag=140"
+        assert parse_url_expiry(url) == 1760000000.0
+    
+    def test_path_segment(self):
+        """Manifests DASH/HLS trazem /expire/<epoch>/ no caminho"""
+        url = "https://manifest.googlevideo.com/api/manifest/hls_playlist/expire/1760000000/ei/abc/index.m3u8"
+        assert parse_url_expiry(url) == 1760000000.0
+    
+    def test_missing_or_invalid(self):
+        """Sem expire (ou inválido) retorna None"""
+        assert parse_url_expiry("https://example.com/audio.webm") is None
+        assert parse_url_expiry("https://example.com/a?expire=amanha") is None
+
+
+class TestClipRange:
+    """Testes para trechos (start/end) de um pedido"""
+    
+    def test_whole_video_is_none(self):
+        """Sem start/end (ou start 0 sem end) não há trecho"""
+        assert clip_range(None, None) is None
+        assert clip_range(0, None) is None
+    
+    def test_normalizes_missing_start(self):
+        assert clip_range(None, 30) == (0.0, 30)
+        assert clip_range(90, None) == (90, None)
+    
+    def test_suffix_in_milliseconds(self):
+        """Sufixo da chave de cache, estável para frações de segundo"""
+        assert clip_suffix((30, 60.5)) == "clip30000-60500"
+        assert clip_suffix((90, None)) == "clip90000-end"
@@ -0,0 +1,83 @@
+import asyncio
+import json
+from pathlib import Path
+from unittest.mock import patch
+from app.services import jobs
+from app.services.jobs import JobManager, JOB_DONE, JOB_ERROR, JOB_CONVERTING
+
+
+def fake_download(file_path: Path, fail: bool = False):
+    """Simula download_youtube_audio chamando os hooks do yt-dlp"""
+    async def download(url, video_id, progress_hooks=None, postprocessor_hooks=None):
+        for hook in progress_hooks:
+            hook({'status': 'downloading', 'downloaded_bytes': 50, 'total_bytes': 100, 'eta': 1, 'speed': 10.0})
+        await asyncio.sleep(0.01)
+        for hook in postprocessor_hooks:
+            hook({'status': 'started', 'postprocessor': 'ExtractAudio'})
+        await asyncio.sleep(0.01)
+        if fail:
+            raise Exception("vídeo indisponível")
+        return file_path
+    return download
+
+
+class TestJobManager:
+    """Testes para os jobs assíncronos"""
+    
+    def test_job_reports_progress_and_finishes(self, tmp_path, temp_dir_test):
+        """O job deve passar por download e conversão até concluir"""
+        mp3 = tmp_path / "audio.mp3"
+        mp3.write_bytes(b"mp3")
+        manager = JobManager()
+        
+        async def run():
+            job = manager.create("https://youtu.be/dQw4w9WgXcQ")
+            states = []
+            while not job.finished:
+                await job.wait_for_change(1)
+                states.append((job.state, job.percent))
+            return job, states
+        
+        with patch.object(jobs, "download_youtube_audio", side_effect=fake_download(mp3)), \
+             patch.object(jobs, "audio_requires_work", return_value=False):
+            job, states = asyncio.run(run())
+        
+        assert job.state == JOB_DONE
+        assert ("downloading", 50.0) in states
+        assert any(state == JOB_CONVERTING for state, _ in states)
+        assert job.to_dict()["file_url"] == f"/api/jobs/{job.id}/file"
+    
+    def test_failed_job_reports_error(self, tmp_path, temp_dir_test):
+        """Falhas devem ficar registradas no job"""
+        manager = JobManager()
+        
+        async def run():
+            job = manager.create("https://youtu.be/dQw4w9WgXcQ")
+            await job.task
+            return job
+        
+        with patch.object(jobs, "download_youtube_audio", side_effect=fake_download(tmp_path, fail=True)), \
+             patch.object(jobs, "audio_requires_work", return_value=False):
+            job = asyncio.run(run())
+        
+        assert job.state == JOB_ERROR
+        assert "indisponível" in job.error
+    
+    def test_sse_events_end_with_final_state(self, tmp_path, temp_dir_test):
+        """O stream SSE deve terminar com o evento final do job"""
+        mp3 = tmp_path / "audio.mp3"
+        mp3.write_bytes(b"mp3")
+        manager = JobManager()
+        
+        async def run():
+            job = manager.create("https://youtu.be/dQw4w9WgXcQ")
+            return [event async for event in manager.events(job)]
+        
+        with patch.object(jobs, "download_youtube_audio", side_effect=fake_download(mp3)), \
+             patch.object(jobs, "audio_requires_work", return_value=False):
+            events = asyncio.run(run())
+        
+        assert events[0].startswith("event: progress")
+        assert events[-1].startswith("event: done")
+        data = json.loads(events[-1].split("data: ", 1)[1])
+        assert data["state"] == JOB_DONE
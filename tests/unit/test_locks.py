@@ -0,0 +1,51 @@
+import threading
+from app.core.locks import FileLock
+
+
+class TestFileLock:
+    """Testes para o lock entre processos baseado em flock"""
+    
+    def test_exclusive(self, tmp_path):
+        """Um segundo dono não obtém o lock enquanto o primeiro o detém"""
+        first = FileLock(tmp_path / "key.lock")
+        second = FileLock(tmp_path / "key.lock")
+        
+        first.acquire()
+        assert not second.try_acquire()
+        first.release()
+        assert second.try_acquire()
+        second.release()
+    
+    def test_remove_on_release_deletes_file(self, tmp_path):
+        """Locks por chave não devem deixar arquivos para trás"""
+        lock = FileLock(tmp_path / "key.lock", remove_on_release=True)
+        lock.acquire()
+        lock.release()
+        
+        assert not (tmp_path / "key.lock").exists()
+    
+    def test_waiter_on_removed_file_retries(self, tmp_path):
+        """Quem esperava no arquivo apagado obtém o lock no arquivo atual"""
+        path = tmp_path / "key.lock"
+        holder = FileLock(path, remove_on_release=True)
+        waiter = FileLock(path, remove_on_release=True)
+        holder.acquire()
+        
+        acquired = threading.Event()
+        
+        def wait():
+            waiter.acquire()
+            acquired.set()
+        
+        thread = threading.Thread(target=wait)
+        thread.start()
+        assert not acquired.wait(0.1)
+        holder.release()
+        thread.join(2)
+        
+        assert acquired.is_set()
+        assert path.exists()
+        # O arquivo atual é o do waiter: um terceiro continua de fora
+        assert not FileLock(path).try_acquire()
+        waiter.release()
+        assert not path.exists()
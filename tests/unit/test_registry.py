@@ -0,0 +1,111 @@
+import json
+import sqlite3
+import subprocess
+import sys
+import time
+from app.config import settings
+from app.services.registry import SharedRegistry
+from app.services.jobs import JobManager, JOB_ERROR, JOB_DOWNLOADING
+
+
+def dead_pid() -> int:
+    """PID de um processo que já terminou"""
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
+
+
+class TestSharedRegistry:
+    """Testes para o estado compartilhado entre workers"""
+    
+    def test_inflight_register_and_unregister(self, temp_dir_test):
+        """Produções registradas ficam visíveis até serem removidas"""
+        registry = SharedRegistry()
+        registry.register("dQw4w9WgXcQ_mp3_192", "download")
+        registry.flush()
+        
+        assert registry.is_active("dQw4w9WgXcQ_mp3_192")
+        assert registry.active_count() == 1
+        
+        registry.unregister("dQw4w9WgXcQ_mp3_192")
+        registry.flush()
+        assert not registry.is_active("dQw4w9WgXcQ_mp3_192")
+    
+    def test_rows_from_dead_workers_are_ignored(self, temp_dir_test):
+        """Registros de um worker que morreu não contam e são purgados"""
+        registry = SharedRegistry()
+        pid = dead_pid()
+        registry._execute(
+            "INSERT INTO inflight (key, pid, kind, started_at) VALUES (?, ?, ?, ?)",
+            ("dQw4w9WgXcQ_mp3_192", pid, "download", 0)
+        )
+        registry._execute("INSERT INTO pins (name, pid, count) VALUES (?, ?, 1)", ("entry", pid))
+        registry.flush()
+        
+        assert not registry.is_active("dQw4w9WgXcQ_mp3_192")
+        assert registry.pinned_by_others() == set()
+        
+        registry.purge_dead()
+        registry.flush()
+        assert registry._query("SELECT * FROM inflight", ()) == []
+    
+    def test_pins_from_other_workers(self, temp_dir_test):
+        """Fixações de outro worker vivo devem ser respeitadas"""
+        registry = SharedRegistry()
+        registry.pin("mine")
+        proc = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(5)'])
+        try:
+            registry._execute("INSERT INTO pins (name, pid, count) VALUES (?, ?, 1)", ("theirs", proc.pid))
+            registry.flush()
+            assert registry.pinned_by_others() == {"theirs"}
+        finally:
+            proc.kill()
+            proc.wait()
+    
+    def test_job_visible_from_other_worker(self, temp_dir_test):
+        """Um job publicado por outro worker pode ser consultado"""
+        data = {"id": "abc123", "url": "https://youtu.be/dQw4w9WgXcQ", "state": JOB_DOWNLOADING, "percent": 40.0}
+        registry = SharedRegistry()
+        proc = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(5)'])
+        try:
+            registry._execute(
+                "INSERT INTO jobs (id, pid, data, file_path, updated_at) VALUES (?, ?, ?, ?, ?)",
+                ("abc123", proc.pid, json.dumps(data), None, 0)
+            )
+            registry.flush()
+            job = JobManager().get("abc123")
+        finally:
+            proc.kill()
+            proc.wait()
+        
+        assert job.state == JOB_DOWNLOADING
+        assert job.percent == 40.0
+    
+    def test_job_of_dead_worker_reports_error(self, temp_dir_test):
+        """Job em andamento de um worker que morreu aparece como erro"""
+        registry = SharedRegistry()
+        registry.save_job("abc123", {"id": "abc123", "url": "https://youtu.be/x", "state": JOB_DOWNLOADING}, None)
+        registry._execute("UPDATE jobs SET pid = ?", (dead_pid(),))
+        registry.flush()
+        
+        job = JobManager().get("abc123")
+        
+        assert job.state == JOB_ERROR
+    
+    def test_writes_do_not_wait_for_sqlite_lock(self, temp_dir_test):
+        """Com o banco travado por outro worker, a escrita não bloqueia quem chama"""
+        registry = SharedRegistry()
+        registry.is_active("warm-up")  # Cria o banco e as tabelas
+        other = sqlite3.connect(str(temp_dir_test / settings.SHARED_STATE_FILENAME))
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            started = time.monotonic()
+            registry.pin("entry")
+            assert time.monotonic() - started < 0.5
+        finally:
+            other.rollback()
+            other.close()
+        
+        registry.flush()
+        assert registry._query("SELECT name, count FROM pins", ()) == [("entry", 1)]
+        registry.close()
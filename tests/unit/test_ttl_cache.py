@@ -0,0 +1,79 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import patch, AsyncMock
+from app.services import youtube
+from app.utils.ttl_cache import TTLCache
+
+
+class TestTTLCache:
+    """Testes para o cache com TTL e LRU"""
+    
+    def test_get_returns_stored_value(self):
+        """Deve retornar o valor armazenado"""
+        cache = TTLCache(maxsize=2, ttl_seconds=60)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+    
+    def test_expired_items_are_misses(self):
+        """Itens expirados devem ser tratados como ausentes"""
+        cache = TTLCache(maxsize=2, ttl_seconds=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        
+        assert cache.get("a") is None
+        assert len(cache) == 0
+    
+    def test_evicts_least_recently_used(self):
+        """Deve descartar o item usado há mais tempo"""
+        cache = TTLCache(maxsize=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" passa a ser o menos usado
+        cache.set("c", 3)
+        
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+    
+    def test_counts_hits_and_misses(self):
+        """Deve contar hits e misses"""
+        cache = TTLCache(maxsize=2, ttl_seconds=60)
+        cache.get("a")
+        cache.set("a", 1)
+        cache.get("a")
+        
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+
+class TestExtractVideoMetadataCache:
+    """Testes para o cache de extract_video_metadata"""
+    
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        youtube.metadata_cache.clear()
+        yield
+        youtube.metadata_cache.clear()
+    
+    def test_same_video_extracted_once(self):
+        """URLs diferentes do mesmo vídeo devem reaproveitar os metadados"""
+        metadata = {"title": "Video", "duration": 10, "uploader": "Canal", "formats": []}
+        
+        with patch.object(youtube, "_extract_video_metadata", new=AsyncMock(return_value=metadata)) as mock_extract:
+            first = asyncio.run(youtube.extract_video_metadata("https://www.youtube.com/watch?v=dQw4w9WgXcQ"))
+            second = asyncio.run(youtube.extract_video_metadata("https://youtu.be/dQw4w9WgXcQ?t=5"))
+        
+        assert mock_extract.await_count == 1
+        assert first == second == metadata
+    
+    def test_errors_are_not_cached(self):
+        """Falhas na extração não devem ficar em cache"""
+        with patch.object(youtube, "_extract_video_metadata", new=AsyncMock(side_effect=Exception("erro"))) as mock_extract:
+            for _ in range(2):
+                with pytest.raises(Exception):
+                    asyncio.run(youtube.extract_video_metadata("https://youtu.be/dQw4w9WgXcQ"))
+        
+        assert mock_extract.await_count == 2
@@ -1,5 +1,5 @@
 import pytest
-from app.utils.validators import validate_youtube_url
+from app.utils.validators import extract_playlist_id, validate_youtube_url
 
 
 class TestValidateYoutubeUrl:
@@ -17,7 +17,7 @@ class TestValidateYoutubeUrl:
     
     def test_valid_youtube_shorts_url(self):
         """Deve validar URL do YouTube Shorts"""
-        url = "https://www.youtube.com/shorts/ABC123def456"
+        url = "https://www.youtube.com/shorts/ABC123def45"
         assert validate_youtube_url(url) is True
     
     def test_valid_youtube_no_www(self):
@@ -49,3 +49,43 @@ class TestValidateYoutubeUrl:
         """Deve validar YouTube com parâmetros adicionais"""
         url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10s&list=ABC"
         assert validate_youtube_url(url) is True
+    
+    def test_valid_mobile_url(self):
+        """Deve validar URL do YouTube mobile"""
+        url = "https://m.youtube.com/watch?v=dQw4w9WgXcQ"
+        assert validate_youtube_url(url) is True
+    
+    def test_valid_video_parameter_not_first(self):
+        """Deve validar watch com v= depois de outros parâmetros"""
+        url = "https://www.youtube.com/watch?feature=share&v=dQw4w9WgXcQ"
+        assert validate_youtube_url(url) is True
+    
+    def test_invalid_lookalike_domain(self):
+        """Deve rejeitar domínios parecidos (docs/ERRORS.md)"""
+        assert validate_youtube_url("https://www.yyoutube.com/watch?v=dQw4w9WgXcQ") is False
+        assert validate_youtube_url("https://youtube.com.evil.com/watch?v=dQw4w9WgXcQ") is False
+    
+    def test_invalid_youtube_non_video_urls(self):
+        """Deve rejeitar URLs do YouTube que não apontam para um vídeo"""
+        assert validate_youtube_url("https://youtube.com/invalid") is False
+        assert validate_youtube_url("https://www.youtube.com/@canal") is False
+        assert validate_youtube_url("https://www.youtube.com/watch?list=PL123") is False
+    
+    def test_invalid_video_id_length(self):
+        """Deve rejeitar IDs que não têm 11 caracteres"""
+        assert validate_youtube_url("https://youtu.be/abc123") is False
+        assert validate_youtube_url("https://www.youtube.com/shorts/ABC123def456") is False
+
+
+class TestExtractPlaylistId:
+    """Testes para o ID de playlists (download em lote)"""
+    
+    def test_playlist_and_watch_urls(self):
+        """Deve extrair o list= de /playlist e de um vídeo dentro da playlist"""
+        assert extract_playlist_id("https://www.youtube.com/playlist?list=PL123abc") == "PL123abc"
+        assert extract_playlist_id("https://youtube.com/watch?v=dQw4w9WgXcQ&list=PL123abc&index=2") == "PL123abc"
+    
+    def test_urls_without_playlist(self):
+        """Deve retornar None sem list= ou fora do YouTube"""
+        assert extract_playlist_id("https://youtu.be/dQw4w9WgXcQ") is None
+        assert extract_playlist_id("https://google.com/playlist?list=PL123abc") is None
@@ -0,0 +1,80 @@
+import asyncio
+import sys
+import pytest
+from unittest.mock import patch
+from app.core import downloader
+from app.core.warm_workers import WarmProcessPool
+
+
+async def collect(cmds, pool):
+    with patch.object(downloader, 'warm_pool', pool):
+        chunks = [chunk async for chunk in downloader.stream_pipeline(cmds, "test")]
+    return b''.join(chunks)
+
+
+async def wait_idle(pool, count=1):
+    pool.fill()
+    while pool.stats()["idle"] < count:
+        await asyncio.sleep(0.01)
+
+
+class TestWarmProcessPool:
+    """Testes para os processos yt-dlp pré-aquecidos"""
+    
+    def test_ytdlp_stage_uses_warm_process(self):
+        """Comando yt-dlp deve rodar em um processo da reserva"""
+        pool = WarmProcessPool(1)
+        
+        async def run():
+            await wait_idle(pool)
+            output = await collect([['yt-dlp', '--version']], pool)
+            await pool.close()
+            return output
+        
+        output = asyncio.run(run())
+        
+        assert output.strip()
+        assert pool.warm_starts == 1
+        assert pool.cold_starts == 0
+    
+    def test_warm_process_feeds_next_stage(self):
+        """O stdout do processo aquecido vira o stdin do próximo comando"""
+        pool = WarmProcessPool(1)
+        count = [sys.executable, '-c', 'import sys; print(len(sys.stdin.buffer.read().split()))']
+        
+        async def run():
+            await wait_idle(pool)
+            output = await collect([['yt-dlp', '--version'], count], pool)
+            await pool.close()
+            return output
+        
+        assert asyncio.run(run()) == b'1\n'
+    
+    def test_empty_reserve_starts_cold_and_refills(self):
+        """Sem reserva pronta o pedido inicia um processo na hora e repõe a reserva"""
+        pool = WarmProcessPool(1)
+        
+        async def run():
+            await collect([['yt-dlp', '--version']], pool)
+            await wait_idle(pool)
+            stats = pool.stats()
+            await pool.close()
+            return stats
+        
+        stats = asyncio.run(run())
+        
+        assert stats["cold_starts"] == 1
+        assert stats["idle"] == 1
+    
+    def test_failure_exit_code_is_reported(self):
+        """Erro do yt-dlp no processo aquecido chega ao consumidor"""
+        pool = WarmProcessPool(1)
+        
+        async def run():
+            try:
+                await collect([['yt-dlp', '--opcao-inexistente']], pool)
+            finally:
+                await pool.close()
+        
+        with pytest.raises(Exception, match="yt-dlp falhou com código"):
+            asyncio.run(run())
@@ -0,0 +1,96 @@
+import threading
+from app.core.ydl_pool import YoutubeDLPool
+
+
+class TestYoutubeDLPool:
+    """Testes para o reaproveitamento de instâncias do yt-dlp"""
+    
+    OPTS = {'quiet': True, 'outtmpl': '%(id)s.%(ext)s'}
+    
+    def test_reuses_instance_per_thread_and_key(self):
+        """Mesma thread e perfil recebem a mesma instância"""
+        pool = YoutubeDLPool()
+        with pool.session('fetch', self.OPTS) as first:
+            pass
+        with pool.session('fetch', self.OPTS) as second:
+            pass
+        with pool.session('metadata', self.OPTS) as other:
+            pass
+        
+        assert first is second
+        assert other is not first
+        assert pool.stats() == {"instances": 2, "created": 2, "reused": 1}
+        pool.close()
+    
+    def test_threads_get_their_own_instance(self):
+        """YoutubeDL não é thread-safe: cada thread tem a sua"""
+        pool = YoutubeDLPool()
+        seen = []
+        
+        def use():
+            with pool.session('fetch', self.OPTS) as ydl:
+                seen.append(ydl)
+        
+        threads = [threading.Thread(target=use) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert seen[0] is not seen[1]
+        pool.close()
+    
+    def test_call_params_are_restored(self):
+        """Parâmetros da chamada valem só durante a sessão"""
+        pool = YoutubeDLPool()
+        with pool.session('fetch', self.OPTS, {'outtmpl': '/tmp/x/%(title)s.%(ext)s', 'format': 'bestaudio'}) as ydl:
+            assert ydl.params['outtmpl']['default'] == '/tmp/x/%(title)s.%(ext)s'
+            assert ydl.params['format'] == 'bestaudio'
+        
+        assert ydl.params['outtmpl']['default'] == '%(id)s.%(ext)s'
+        assert 'format' not in ydl.params
+        pool.close()
+    
+    def test_call_format_selects_format(self):
+        """'format' da chamada deve mudar o formato escolhido, e só nela"""
+        pool = YoutubeDLPool()
+        info = {
+            'id': 'dQw4w9WgXcQ',
+            'title': 'Test',
+            'extractor': 'youtube',
+            'extractor_key': 'Youtube',
+            'webpage_url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+            'formats': [
+                {'format_id': '140', 'url': 'https://example.com/a', 'ext': 'm4a',
+                 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'abr': 128},
+                {'format_id': '251', 'url': 'https://example.com/o', 'ext': 'webm',
+                 'vcodec': 'none', 'acodec': 'opus', 'abr': 160},
+                {'format_id': '137', 'url': 'https://example.com/v', 'ext': 'mp4',
+                 'vcodec': 'avc1', 'acodec': 'none', 'height': 1080},
+            ],
+        }
+        
+        def selected(params=None):
+            with pool.session('fetch', self.OPTS, params) as ydl:
+                result = ydl.process_ie_result(dict(info, formats=[dict(f) for f in info['formats']]), download=False)
+            return result['format_id']
+        
+        assert selected({'format': 'bestaudio/best'}) == '251'
+        assert selected({'format': 'bestaudio[ext=m4a]/bestaudio/best'}) == '140'
+        assert selected() == '137+251'
+        pool.close()
+    
+    def test_hooks_only_reach_current_call(self):
+        """Hooks de uma chamada não vazam para a próxima"""
+        pool = YoutubeDLPool()
+        calls = []
+        
+        with pool.session('fetch', self.OPTS, progress_hooks=[calls.append]) as ydl:
+            for hook in ydl._progress_hooks:
+                hook({'status': 'downloading'})
+        with pool.session('fetch', self.OPTS) as ydl:
+            for hook in ydl._progress_hooks:
+                hook({'status': 'downloading'})
+        
+        assert calls == [{'status': 'downloading'}]
+        pool.close()